@@ -2,6 +2,8 @@ from . import utilsDataman
 import numpy as np
 import os
 
+from Pose2Sim.common import trc_rows
+
 def TRC2numpy(pathFile, markers,rotation=None):
     # rotation is a dict, eg. {'y':90} with axis, angle for rotation
     
@@ -23,46 +25,37 @@ def TRC2numpy(pathFile, markers,rotation=None):
 
 def numpy2TRC(f, data, headers, fc=50.0, t_start=0.0, units="m"):
     
-    header_mapping = {}
-    for count, header in enumerate(headers):
-        header_mapping[count+1] = header 
-        
+    num_frames=data.shape[0]
+    num_markers=len(headers)
+    
+    header = []
+
     # Line 1.
-    f.write('PathFileType  4\t(X/Y/Z) %s\n' % os.getcwd())
+    header.append('PathFileType  4\t(X/Y/Z) %s\n' % os.getcwd())
     
     # Line 2.
-    f.write('DataRate\tCameraRate\tNumFrames\tNumMarkers\t'
+    header.append('DataRate\tCameraRate\tNumFrames\tNumMarkers\t'
                 'Units\tOrigDataRate\tOrigDataStartFrame\tOrigNumFrames\n')
     
-    num_frames=data.shape[0]
-    num_markers=len(header_mapping.keys())
-    
     # Line 3.
-    f.write('%.1f\t%.1f\t%i\t%i\t%s\t%.1f\t%i\t%i\n' % (
+    header.append('%.1f\t%.1f\t%i\t%i\t%s\t%.1f\t%i\t%i\n' % (
             fc, fc, num_frames,
             num_markers, units, fc,
             1, num_frames))
     
     # Line 4.
-    f.write("Frame#\tTime\t")
-    for key in sorted(header_mapping.keys()):
-        f.write("%s\t\t\t" % format(header_mapping[key]))
+    header.append("Frame#\tTime\t" + "".join("%s\t\t\t" % format(h) for h in headers))
 
     # Line 5.
-    f.write("\n\t\t")
-    for imark in np.arange(num_markers) + 1:
-        f.write('X%i\tY%s\tZ%s\t' % (imark, imark, imark))
-    f.write('\n')
+    header.append("\n\t\t" + "".join('X%i\tY%s\tZ%s\t' % (imark, imark, imark)
+            for imark in np.arange(num_markers) + 1) + '\n')
     
     # Line 6.
-    f.write('\n')
-
-    for frame in range(data.shape[0]):
-        f.write("{}\t{:.8f}\t".format(frame+1,(frame)/fc+t_start)) # opensim frame labeling is 1 indexed
+    header.append('\n')
 
-        for key in sorted(header_mapping.keys()):
-            f.write("{:.5f}\t{:.5f}\t{:.5f}\t".format(data[frame,0+(key-1)*3], data[frame,1+(key-1)*3], data[frame,2+(key-1)*3]))
-        f.write("\n")
+    f.writelines(header)
+    frames = np.arange(num_frames) + 1 # opensim frame labeling is 1 indexed
+    f.writelines(trc_rows(frames, (frames-1)/fc+t_start, data[:,:3*num_markers], float_format='%.8f'))
 
 def getOpenPoseMarkerNames():
     
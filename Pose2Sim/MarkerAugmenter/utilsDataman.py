@@ -5,7 +5,9 @@ import warnings
 from scipy.spatial.transform import Rotation as R
 
 import numpy as np
-from numpy.lib.recfunctions import append_fields
+from numpy.lib.recfunctions import append_fields, structured_to_unstructured, unstructured_to_structured
+
+from Pose2Sim.common import read_trc_array, write_trc_array
 
 class TRCFile(object):
     """A plain-text file format for storing motion capture marker trajectories.
@@ -46,18 +48,14 @@ class TRCFile(object):
                 setattr(self, k, v)
 
     def read_from_file(self, fpath):
-        # Read the header lines / metadata.
-        # ---------------------------------
+        # Read the header lines / metadata, and the data at once.
+        # --------------------------------------------------------
+        Q, frames, times, self.marker_names, header = read_trc_array(fpath)
         # Split by any whitespace.
         # TODO may cause issues with paths that have spaces in them.
-        f = open(fpath)
         # These are lists of each entry on the first few lines.
-        first_line = f.readline().split()
-        # Skip the 2nd line.
-        f.readline()
-        third_line = f.readline().split()
-        fourth_line = f.readline().split()
-        f.close()
+        first_line = header[0].split()
+        third_line = header[2].split()
 
         # First line.
         if len(first_line) > 3:
@@ -76,9 +74,6 @@ class TRCFile(object):
         self.orig_num_frames = int(third_line[7])
 
         # Marker names.
-        # The first and second column names are 'Frame#' and 'Time'.
-        self.marker_names = fourth_line[2:]
-
         len_marker_names = len(self.marker_names)
         if len_marker_names != self.num_markers:
             warnings.warn('Header entry NumMarkers, %i, does not '
@@ -87,8 +82,8 @@ class TRCFile(object):
                         self.num_markers, len_marker_names))
             self.num_markers = len_marker_names
 
-        # Load the actual data.
-        # ---------------------
+        # Store the data in a structured array.
+        # -------------------------------------
         col_names = ['frame_num', 'time']
         # This naming convention comes from OpenSim's Inverse Kinematics tool,
         # when it writes model marker locations.
@@ -96,9 +91,9 @@ class TRCFile(object):
             col_names += [mark + '_tx', mark + '_ty', mark + '_tz']
         dtype = {'names': col_names,
                 'formats': ['int'] + ['float64'] * (3 * self.num_markers + 1)}
-        usecols = [i for i in range(3 * self.num_markers + 1 + 1)]
-        self.data = np.genfromtxt(fpath, delimiter='\t', skip_header=5, dtype=dtype,
-                               usecols=usecols, filling_values=np.nan)
+        self.data = unstructured_to_structured(
+                np.column_stack([frames, times, Q.reshape(len(Q), -1)]),
+                dtype=np.dtype(dtype))
         self.time = self.data['time']
 
         # Check the number of rows.
@@ -188,47 +183,37 @@ class TRCFile(object):
             Valid file path to which this TRCFile is saved.
 
         """
-        f = open(fpath, 'w')
+        header = []
 
         # Line 1.
-        f.write('PathFileType  4\t(X/Y/Z) %s\n' % os.path.split(fpath)[0])
+        header.append('PathFileType  4\t(X/Y/Z) %s\n' % os.path.split(fpath)[0])
 
         # Line 2.
-        f.write('DataRate\tCameraRate\tNumFrames\tNumMarkers\t'
+        header.append('DataRate\tCameraRate\tNumFrames\tNumMarkers\t'
                 'Units\tOrigDataRate\tOrigDataStartFrame\tOrigNumFrames\n')
 
         # Line 3.
-        f.write('%.1f\t%.1f\t%i\t%i\t%s\t%.1f\t%i\t%i\n' % (
+        header.append('%.1f\t%.1f\t%i\t%i\t%s\t%.1f\t%i\t%i\n' % (
             self.data_rate, self.camera_rate, self.num_frames,
             self.num_markers, self.units, self.orig_data_rate,
             self.orig_data_start_frame, self.orig_num_frames))
 
         # Line 4.
-        f.write('Frame#\tTime\t')
-        for imark in range(self.num_markers):
-            f.write('%s\t\t\t' % self.marker_names[imark])
-        f.write('\n')
+        header.append('Frame#\tTime\t' + ''.join(
+            '%s\t\t\t' % mark for mark in self.marker_names) + '\n')
 
         # Line 5.
-        f.write('\t\t')
-        for imark in np.arange(self.num_markers) + 1:
-            f.write('X%i\tY%s\tZ%s\t' % (imark, imark, imark))
-        f.write('\n')
+        header.append('\t\t' + ''.join('X%i\tY%s\tZ%s\t' % (imark, imark, imark)
+            for imark in np.arange(self.num_markers) + 1) + '\n')
 
         # Line 6.
-        f.write('\n')
+        header.append('\n')
 
         # Data.
-        for iframe in range(self.num_frames):
-            f.write('%i' % (iframe + 1))
-            f.write('\t%.7f' % self.time[iframe])
-            for mark in self.marker_names:
-                idxs = [mark + '_tx', mark + '_ty', mark + '_tz']
-                f.write('\t%.7f\t%.7f\t%.7f' % tuple(
-                    self.data[coln][iframe] for coln in idxs))
-            f.write('\n')
-
-        f.close()
+        idxs = [mark + comp for mark in self.marker_names for comp in ['_tx', '_ty', '_tz']]
+        coords = structured_to_unstructured(self.data[idxs], dtype='float64')
+        write_trc_array(fpath, header, np.arange(self.num_frames) + 1,
+                self.time, coords, float_format='%.7f')
 
     def add_noise(self, noise_width):
         """ add random noise to each component of the marker trajectory
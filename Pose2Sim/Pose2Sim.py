@@ -208,13 +208,15 @@ class Pose2SimPipeline:
         logging.info(f'\nCalibration took {elapsed:.2f} seconds.\n')
 
     def poseEstimation(self):
-        from Pose2Sim.poseEstimation import estimate_pose_all
+        from Pose2Sim.poseEstimation import estimate_pose_all, PoseSessionCache
+        pose_session_cache = PoseSessionCache() # models are only loaded once for all trials
         for config_dict in self.config_dicts:
             self._log_step_header("Pose estimation", config_dict)
             start = time.time()
-            estimate_pose_all(config_dict)
+            estimate_pose_all(config_dict, pose_session_cache=pose_session_cache)
             elapsed = time.time() - start
             logging.info(f'\nPose estimation took {time.strftime("%Hh%Mm%Ss", time.gmtime(elapsed))}.\n')
+        pose_session_cache.clear()
 
     def synchronization(self):
         from Pose2Sim.synchronization import synchronize_cams_all
@@ -251,13 +253,17 @@ class Pose2SimPipeline:
             logging.info('\n')
 
     def markerAugmentation(self):
-        from Pose2Sim.markerAugmentation import augment_markers_all
-        for config_dict in self.config_dicts:
-            self._log_step_header("Augmentation process", config_dict)
-            start = time.time()
-            augment_markers_all(config_dict)
-            elapsed = time.time() - start
-            logging.info(f'\nMarker augmentation took {time.strftime("%Hh%Mm%Ss", time.gmtime(elapsed))}.\n')
+        from Pose2Sim.markerAugmentation import augment_markers_all, AugmenterModelCache
+        augmenter_model_cache = AugmenterModelCache() # models are only loaded once for all trials
+        try:
+            for config_dict in self.config_dicts:
+                self._log_step_header("Augmentation process", config_dict)
+                start = time.time()
+                augment_markers_all(config_dict, augmenter_model_cache=augmenter_model_cache)
+                elapsed = time.time() - start
+                logging.info(f'\nMarker augmentation took {time.strftime("%Hh%Mm%Ss", time.gmtime(elapsed))}.\n')
+        finally:
+            augmenter_model_cache.clear()
 
     def kinematics(self):
         from Pose2Sim.kinematics import kinematics_all
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+'''
+    ##################################################
+    ## Benchmark pose estimation throughput         ##
+    ##################################################
+
+    Measures the speed of the code surrounding pose inference, with RTMLib
+    replaced by a deterministic fake pose tracker. Runs on CPU, no model download needed.
+
+    Synthetic videos and image folders are created in a temporary directory,
+    for each requested resolution and number of persons.
+    Frames per second are reported separately for:
+    - decode_video: reading frames with cv2.VideoCapture
+    - decode_images: reading an image folder with ImageFolderLoader
+    - track_sports2d: sort_people_sports2d
+    - track_deepsort: sort_people_deepsort (skipped if DeepSort cannot be initialized)
+    - write_openpose, write_jsonl, write_npz: saving keypoints and scores
+    - draw_overlay: drawing bounding boxes, keypoints, and skeletons
+    - process_video, process_images: the full loops, with the fake tracker
+
+    Usage:
+        from Pose2Sim.Utilities import bench_pose_estimation; bench_pose_estimation.bench_pose_estimation_func(resolutions=['640x480', '1920x1080'], persons=[1, 4])
+        OR python -m bench_pose_estimation
+        OR python -m bench_pose_estimation -r 640x480 1280x720 1920x1080 -p 1 4 -n 100 -s track_sports2d draw_overlay
+'''
+
+
+## INIT
+import os
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import cv2
+from anytree import PreOrderIter
+
+from Pose2Sim.common import sort_people_sports2d, sort_people_deepsort, BulkPoseWriter, \
+    draw_bounding_box, draw_keypts, draw_skel, colors, thickness
+from Pose2Sim.poseEstimation import save_to_openpose, process_video, process_images, ImageFolderLoader
+from Pose2Sim.skeletons import HALPE_26
+
+
+## AUTHORSHIP INFORMATION
+__author__ = "David Pagnon"
+__copyright__ = "Copyright 2021, Pose2Sim"
+__credits__ = ["David Pagnon"]
+__license__ = "BSD 3-Clause License"
+__version__ = "0.9.4"
+__maintainer__ = "David Pagnon"
+__email__ = "contact@david-pagnon.com"
+__status__ = "Development"
+
+
+## CONSTANTS
+STAGES = ['decode_video', 'decode_images', 'track_sports2d', 'track_deepsort', 'write_openpose', 'write_jsonl', 'write_npz', 'draw_overlay', 'process_video', 'process_images']
+DEEPSORT_PARAMS = {'max_age':30, 'n_init':3, 'nms_max_overlap':0.8, 'max_cosine_distance':0.3, 'nn_budget':200, 'max_iou_distance':0.8, 'embedder_gpu': False}
+
+
+## CLASSES
+class FakePoseTracker():
+    '''
+    Stands for an RTMLib PoseTracker: returns deterministic keypoints and scores
+    for nb_persons walking across the frame, without running any model.
+
+    USAGE:
+    fake_tracker = FakePoseTracker(nb_persons=2, nb_keypoints=26)
+    keypoints, scores = fake_tracker(frame)
+    '''
+
+    def __init__(self, nb_persons=1, nb_keypoints=26, seed=0):
+        rng = np.random.default_rng(seed)
+        self.nb_persons = nb_persons
+        self.body_offsets = rng.uniform(-0.5, 0.5, (nb_keypoints, 2)) * [0.4, 1] # person shape, relative to its height
+        self.phases = rng.uniform(0, 2*np.pi, nb_persons)
+        self.scores = rng.uniform(0.3, 1, (nb_persons, nb_keypoints))
+        self.reset()
+
+    def reset(self):
+        self.frame_cnt = 0
+
+    def __call__(self, frame):
+        H, W = frame.shape[:2]
+        t = self.frame_cnt / 30
+        self.frame_cnt += 1
+        centers_x = W * (0.5 + 0.35 * np.sin(t + self.phases))
+        centers_y = H * (0.5 + 0.05 * np.cos(2*t + self.phases))
+        centers = np.stack([centers_x, centers_y], axis=-1)[:, None, :] # (P, 1, 2)
+        keypoints = centers + self.body_offsets[None] * H * 0.4
+        # reverse person order every other frame, so that tracking has some work to do
+        if self.frame_cnt % 2:
+            return keypoints[::-1].copy(), self.scores[::-1].copy()
+        return keypoints, self.scores.copy()
+
+
+## FUNCTIONS
+def make_synthetic_video(video_path, width, height, nb_frames, fps=30):
+    '''
+    Write a video of moving gradients and noise
+
+    INPUTS:
+    - video_path: str. Path of the output .mp4 video
+    - width, height: int. Frame size
+    - nb_frames: int. Number of frames
+    - fps: int. Frame rate
+    '''
+
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    gradient = np.add.outer(np.arange(height), np.arange(width)).astype(np.uint8)
+    for f in range(nb_frames):
+        frame = np.stack([gradient + f, gradient[::-1] + 2*f, rng.integers(0, 255, (height, width), dtype=np.uint8)], axis=-1)
+        out.write(frame)
+    out.release()
+
+
+def make_synthetic_images(image_dir, width, height, nb_frames):
+    '''
+    Write a folder of png images with the same content as make_synthetic_video
+    '''
+
+    os.makedirs(image_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    gradient = np.add.outer(np.arange(height), np.arange(width)).astype(np.uint8)
+    for f in range(nb_frames):
+        frame = np.stack([gradient + f, gradient[::-1] + 2*f, rng.integers(0, 255, (height, width), dtype=np.uint8)], axis=-1)
+        cv2.imwrite(os.path.join(image_dir, f'img_{f}.png'), frame)
+
+
+def time_fps(func, nb_frames):
+    '''
+    Run func once and return the number of frames it processed per second
+    '''
+
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return nb_frames / elapsed if elapsed > 0 else float('inf')
+
+
+def draw_overlay(frame, keypoints, scores, pose_model):
+    '''
+    Same Sports2D drawing as in process_video
+    '''
+
+    valid_X, valid_Y, valid_scores = [], [], []
+    for person_keypoints, person_scores in zip(keypoints, scores):
+        valid_X.append(person_keypoints[:, 0])
+        valid_Y.append(person_keypoints[:, 1])
+        valid_scores.append(person_scores)
+    img_show = frame.copy()
+    img_show = draw_bounding_box(img_show, valid_X, valid_Y, colors=colors, fontSize=2, thickness=thickness)
+    img_show = draw_keypts(img_show, valid_X, valid_Y, valid_scores, cmap_str='RdYlGn')
+    img_show = draw_skel(img_show, valid_X, valid_Y, pose_model)
+    return img_show
+
+
+def bench_stage(stage, work_dir, video_path, image_dir, frames, poses, nb_persons, pose_model):
+    '''
+    Measure the throughput of one stage
+
+    INPUTS:
+    - stage: str. One of STAGES
+    - work_dir: str. Temporary directory for outputs
+    - video_path, image_dir: str. Synthetic inputs
+    - frames: list of arrays. Decoded frames
+    - poses: list of (keypoints, scores). Fake tracker outputs for each frame
+    - nb_persons: int. Number of persons in the fake tracker
+    - pose_model: anytree skeleton used for drawing
+
+    OUTPUT:
+    - fps: float. Frames per second, or None if the stage could not be run
+    '''
+
+    nb_frames = len(frames)
+
+    if stage == 'decode_video':
+        def run():
+            cap = cv2.VideoCapture(video_path)
+            while cap.read()[0]: pass
+            cap.release()
+
+    elif stage == 'decode_images':
+        def run():
+            for _ in ImageFolderLoader(image_dir, '.png'): pass
+
+    elif stage == 'track_sports2d':
+        def run():
+            prev_keypoints = poses[0][0]
+            for keypoints, scores in poses:
+                prev_keypoints, _, _ = sort_people_sports2d(prev_keypoints, keypoints, scores=scores)
+
+    elif stage == 'track_deepsort':
+        try:
+            from deep_sort_realtime.deepsort_tracker import DeepSort
+            deepsort_tracker = DeepSort(**DEEPSORT_PARAMS)
+        except Exception as e:
+            print(f'    track_deepsort skipped: {e}')
+            return None
+        def run():
+            for f, (frame, (keypoints, scores)) in enumerate(zip(frames, poses)):
+                sort_people_deepsort(keypoints, scores, deepsort_tracker, frame, f+1)
+
+    elif stage == 'write_openpose':
+        json_dir = os.path.join(work_dir, 'openpose_json')
+        def run():
+            for f, (keypoints, scores) in enumerate(poses):
+                save_to_openpose(os.path.join(json_dir, f'cam01_{f:06d}.json'), keypoints, scores)
+
+    elif stage in ('write_jsonl', 'write_npz'):
+        output_format = stage.split('_')[1]
+        def run():
+            bulk_writer = BulkPoseWriter(os.path.join(work_dir, f'cam01_json.{output_format}'), output_format)
+            for f, (keypoints, scores) in enumerate(poses):
+                bulk_writer.write(f, keypoints, scores)
+            bulk_writer.close()
+
+    elif stage == 'draw_overlay':
+        def run():
+            for frame, (keypoints, scores) in zip(frames, poses):
+                draw_overlay(frame, keypoints, scores, pose_model)
+
+    elif stage == 'process_video':
+        def run():
+            process_video(video_path, FakePoseTracker(nb_persons), pose_model, ['openpose'], False, False, False, [], nb_persons>1, 'sports2d', None)
+
+    elif stage == 'process_images':
+        def run():
+            process_images(image_dir, '.png', FakePoseTracker(nb_persons), pose_model, ['openpose'], 30, False, False, False, [], nb_persons>1, 'sports2d', None)
+
+    else:
+        raise ValueError(f'Unknown stage {stage}. Must be one of {STAGES}.')
+
+    return time_fps(run, nb_frames)
+
+
+def bench_pose_estimation_func(**args):
+    '''
+    Benchmark the throughput of pose estimation I/O, tracking, and drawing,
+    with a fake pose tracker instead of RTMLib models.
+
+    Usage:
+        from Pose2Sim.Utilities import bench_pose_estimation; bench_pose_estimation.bench_pose_estimation_func(resolutions=['640x480', '1920x1080'], persons=[1, 4])
+        OR python -m bench_pose_estimation
+        OR python -m bench_pose_estimation -r 640x480 1280x720 1920x1080 -p 1 4 -n 100 -s track_sports2d draw_overlay
+
+    INPUTS:
+    - resolutions: list of str. Frame sizes as 'WIDTHxHEIGHT'
+    - persons: list of int. Numbers of persons returned by the fake tracker
+    - nb_frames: int. Number of frames of each synthetic video
+    - stages: list of str. Stages to benchmark, all of them by default
+
+    OUTPUT:
+    - results: list of dict with keys resolution, persons, stage, fps
+    - prints a table of frames per second
+    '''
+
+    resolutions = args.get('resolutions') or ['640x480', '1280x720', '1920x1080']
+    persons = [int(p) for p in (args.get('persons') or [1, 4])]
+    nb_frames = int(args.get('nb_frames') or 100)
+    stages = args.get('stages') or STAGES
+    pose_model = HALPE_26
+    nb_keypoints = max(node.id for node in PreOrderIter(pose_model) if node.id is not None) + 1
+
+    results = []
+    for resolution in resolutions:
+        width, height = [int(s) for s in resolution.lower().split('x')]
+        work_dir = tempfile.mkdtemp(prefix='pose2sim_bench_')
+        try:
+            video_path = os.path.join(work_dir, 'videos', 'cam01.mp4')
+            image_dir = os.path.join(work_dir, 'videos', 'cam02')
+            os.makedirs(os.path.dirname(video_path))
+            make_synthetic_video(video_path, width, height, nb_frames)
+            make_synthetic_images(image_dir, width, height, nb_frames)
+            frames = []
+            cap = cv2.VideoCapture(video_path)
+            success, frame = cap.read()
+            while success:
+                frames.append(frame)
+                success, frame = cap.read()
+            cap.release()
+
+            for nb_persons in persons:
+                fake_tracker = FakePoseTracker(nb_persons, nb_keypoints)
+                poses = [fake_tracker(frame) for frame in frames]
+                print(f'\n{resolution}, {nb_persons} person(s), {len(frames)} frames:')
+                for stage in stages:
+                    if stage.startswith('decode') and nb_persons != persons[0]:
+                        continue # decoding does not depend on the number of persons
+                    stage_dir = os.path.join(work_dir, f'{stage}_{nb_persons}')
+                    os.makedirs(stage_dir, exist_ok=True)
+                    fps = bench_stage(stage, stage_dir, video_path, image_dir, frames, poses, nb_persons, pose_model)
+                    shutil.rmtree(os.path.join(work_dir, 'pose'), ignore_errors=True)
+                    if fps is not None:
+                        print(f'    {stage:<16} {fps:10.1f} frames/s')
+                        results.append({'resolution': resolution, 'persons': nb_persons, 'stage': stage, 'fps': fps})
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--resolutions', nargs='+', required=False, help='frame sizes as WIDTHxHEIGHT. Default: 640x480 1280x720 1920x1080')
+    parser.add_argument('-p', '--persons', nargs='+', required=False, help='numbers of persons. Default: 1 4')
+    parser.add_argument('-n', '--nb_frames', required=False, help='number of frames per synthetic video. Default: 100')
+    parser.add_argument('-s', '--stages', nargs='+', required=False, help=f'stages to benchmark among {STAGES}. Default: all')
+    args = vars(parser.parse_args())
+
+    bench_pose_estimation_func(**args)
@@ -22,6 +22,8 @@ import c3d
 import numpy as np
 import argparse
 
+from Pose2Sim.common import write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -103,21 +105,20 @@ def c3d_to_trc_func(*args):
     header2_str1 = 'Frame#\tTime\t' + '\t\t\t'.join([item.strip() for item in labels_markers]) + '\t\t'
     header2_str2 = '\t\t'+'\t'.join(['X{i}\tY{i}\tZ{i}'.format(i=i+1) for i in range(int(header1['NumMarkers']))])
     
-    header_trc = '\n'.join([header0_str, header1_str1, header1_str2, header2_str1, header2_str2])
-    
-    with open(trc_path, 'w') as trc_o:
-        trc_o.write(header_trc+'\n')
+    header_trc = [line+'\n' for line in [header0_str, header1_str1, header1_str2, header2_str1, header2_str2]]
     
     # trc data
-        index_data_markers = np.sort(np.concatenate([np.array(index_labels_markers)*3, np.array(index_labels_markers)*3+1, np.array(index_labels_markers)*3+2]))
-        t0 = int(float(header_c3d['first_frame'])) / int(float(header_c3d['frame_rate']))
-        tf = int(float(header_c3d['last_frame'])) / int(float(header_c3d['frame_rate']))
-        trc_time = np.linspace(t0, tf, num=(int(header_c3d['last_frame']) - int(header_c3d['first_frame']) + 1))
-        for n, (i, points, _) in enumerate(list(reader.read_frames())):
-            c3d_line = np.concatenate([item[:3] for item in points])*unit_scale
-            c3d_line_markers = c3d_line[index_data_markers]
-            trc_line = '{i}\t{t}\t'.format(i=i, t=trc_time[n]) + '\t'.join(map(str,c3d_line_markers))
-            trc_o.write(trc_line+'\n')
+    index_data_markers = np.sort(np.concatenate([np.array(index_labels_markers)*3, np.array(index_labels_markers)*3+1, np.array(index_labels_markers)*3+2]))
+    t0 = int(float(header_c3d['first_frame'])) / int(float(header_c3d['frame_rate']))
+    tf = int(float(header_c3d['last_frame'])) / int(float(header_c3d['frame_rate']))
+    trc_time = np.linspace(t0, tf, num=(int(header_c3d['last_frame']) - int(header_c3d['first_frame']) + 1))
+    trc_frames, trc_data = [], []
+    for i, points, _ in reader.read_frames():
+        c3d_line = np.concatenate([item[:3] for item in points])*unit_scale
+        trc_frames.append(i)
+        trc_data.append(c3d_line[index_data_markers])
+    
+    write_trc_array(trc_path, header_trc, np.array(trc_frames), trc_time[:len(trc_frames)], np.array(trc_data))
 
     print(f'Converted c3d file to {trc_path}')
     
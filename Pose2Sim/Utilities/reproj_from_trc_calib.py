@@ -37,6 +37,8 @@ import hashlib
 from copy import deepcopy
 import argparse
 
+from Pose2Sim.common import read_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -190,17 +192,17 @@ def df_from_trc(trc_path):
     Retrieve header and data from trc path.
     '''
 
+    Q, frames, times, labels, header_lines = read_trc_array(trc_path)
+
     # DataRate	CameraRate	NumFrames	NumMarkers	Units	OrigDataRate	OrigDataStartFrame	OrigNumFrames
-    df_header = pd.read_csv(trc_path, sep="\t", skiprows=1, header=None, nrows=2, encoding="ISO-8859-1")
-    header = dict(zip(df_header.iloc[0].tolist(), df_header.iloc[1].tolist()))
+    header = dict(zip(header_lines[1].strip().split('\t'), header_lines[2].strip().split('\t')))
     
     # Label1_X  Label1_Y    Label1_Z    Label2_X    Label2_Y
-    df_lab = pd.read_csv(trc_path, sep="\t", skiprows=3, nrows=1)
-    labels = df_lab.columns.tolist()[2:-1:3]
     labels_XYZ = np.array([[labels[i]+'_X', labels[i]+'_Y', labels[i]+'_Z'] for i in range(len(labels))], dtype='object').flatten()
-    labels_FTXYZ = np.concatenate((['Frame#','Time'], labels_XYZ))
     
-    data = pd.read_csv(trc_path, sep="\t", skiprows=5, index_col=False, header=None, names=labels_FTXYZ)
+    data = pd.DataFrame(Q.reshape(len(Q), -1), columns=labels_XYZ)
+    data.insert(0, 'Frame#', frames)
+    data.insert(1, 'Time', times)
     
     return header, data
 
@@ -28,6 +28,10 @@
     Testing det_frequency 1 and 10.
     Testing synchronization with all markers or only ['RWrist'].
     Testing with and without marker augmentation.
+    Testing vectorized filters against per-column references, with and without gaps.
+    Testing trc reading and writing, and the invalidation of their binary sidecar.
+    Testing jsonl and npz pose files against OpenPose json files.
+    Testing the synchronization cross-correlation against shifted Pearson correlations.
     
     N.B.: Calibration from scene dimensions is not tested, as it requires the 
     user to click points on the image. 
@@ -38,15 +42,35 @@
     python tests.py
         OR
     from Pose2Sim.Utilities.tests import TestWorkflow; TestWorkflow.test_workflow(mock_input='no')
+    Filter checks only (no demo data needed):
+    python tests.py TestFiltering
+    Trc input/output checks only:
+    python tests.py TestTrcIO
+    Bulk pose file checks only:
+    python tests.py TestPoseBulk
+    Synchronization correlation checks only:
+    python tests.py TestSyncCorrelation
 '''
 
 ## INIT
 import os
+import json
+import tempfile
 import toml
 from unittest.mock import patch
 import unittest
+import numpy as np
+import pandas as pd
+from scipy import signal
+from scipy.ndimage import gaussian_filter1d
+from statsmodels.nonparametric.smoothers_lowess import lowess
 
 from Pose2Sim import Pose2Sim
+from Pose2Sim.common import read_trc_array, write_trc_array, trc_cache_path, \
+                            BulkPoseWriter, read_pose_json, list_json_files
+from Pose2Sim.poseEstimation import save_to_openpose
+from Pose2Sim.synchronization import normalized_cross_corr, parabolic_peak
+from Pose2Sim.filtering import filter_array, kalman_filter, kalman_smoother_batch, loess_smoother_batch
 
 
 ## AUTHORSHIP INFORMATION
@@ -184,5 +208,389 @@ class TestWorkflow(unittest.TestCase):
         Pose2Sim.runAll(do_synchronization=False)
 
 
+class TestFiltering(unittest.TestCase):
+    '''
+    Regression checks of the vectorized filters against per-column references,
+    on synthetic coordinates with and without gaps (nan or zeros).
+    '''
+
+    frame_rate = 30
+    filter_params = {
+        'kalman': {'trust_ratio': 100, 'smooth': True},
+        'butterworth': {'order': 4, 'cut_off_frequency': 6},
+        'butterworth_on_speed': {'order': 4, 'cut_off_frequency': 6},
+        'gaussian': {'sigma_kernel': 2},
+        'LOESS': {'nb_values_used': 10},
+        'median': {'kernel_size': 5},
+        'one_euro': {'min_cutoff': 3, 'beta': 5, 'd_cutoff': 1},
+        }
+
+    def synthetic_coords(self, gaps):
+        '''
+        Coordinates of shape (frames, markers, 3).
+        With gaps: nan on x only (the whole marker is then missing), zeros on all coordinates,
+        and a valid segment too short to be filtered.
+        '''
+
+        rng = np.random.default_rng(0)
+        t = np.arange(120) / self.frame_rate
+        Q = np.sin(2*np.pi*t[:,np.newaxis,np.newaxis] * rng.uniform(0.5, 3, (1,4,3))) + 0.05*rng.standard_normal((120,4,3)) + 2
+        if gaps:
+            Q[20:30, 0, 0] = np.nan
+            Q[50:53, 1, :] = 0
+            Q[3:, 2, :] = np.nan
+        return Q
+
+    def filter_column_reference(self, col, valid, filter_type, filter_params):
+        '''
+        Filter one column alone, segment by segment of valid frames, with scipy, statsmodels, 
+        or a plain loop. Missing frames and segments too short to be filtered are left unchanged.
+        '''
+
+        col_filt = col.copy()
+        edges = np.diff(np.r_[0, valid.astype(int), 0])
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            seg = col[start:end]
+            if filter_type == 'kalman':
+                col_filt[start:end] = kalman_filter(seg, self.frame_rate, 20, 20*filter_params['trust_ratio'], nb_dimensions=1, smooth=filter_params['smooth'])[:,0]
+            elif filter_type in ('butterworth', 'butterworth_on_speed'):
+                b, a = signal.butter(int(filter_params['order']/2), filter_params['cut_off_frequency']/(self.frame_rate/2), 'low', analog=False)
+                padlen = 3 * max(len(a), len(b))
+                if filter_type == 'butterworth':
+                    if len(seg) > padlen:
+                        col_filt[start:end] = signal.filtfilt(b, a, seg)
+                elif len(seg) >= 2:
+                    seg_diff = np.diff(seg, prepend=np.nan)
+                    seg_diff[0] = seg_diff[1]/2
+                    if len(seg) > padlen:
+                        seg_diff = signal.filtfilt(b, a, seg_diff)
+                    col_filt[start:end] = np.cumsum(seg_diff) + seg[0]
+            elif filter_type == 'gaussian':
+                col_filt[start:end] = gaussian_filter1d(seg, filter_params['sigma_kernel'])
+            elif filter_type == 'LOESS':
+                if len(seg) > filter_params['nb_values_used']:
+                    col_filt[start:end] = lowess(seg, np.arange(len(seg)), is_sorted=True, frac=filter_params['nb_values_used']/len(seg), it=0)[:,1]
+            elif filter_type == 'median':
+                if len(seg) >= filter_params['kernel_size']:
+                    col_filt[start:end] = signal.medfilt(seg, kernel_size=filter_params['kernel_size'])
+            elif filter_type == 'one_euro':
+                alpha = lambda cutoff: 1 / (1 + self.frame_rate / (2*np.pi*cutoff))
+                x, dx = seg[0], 0
+                for i, value in enumerate(seg):
+                    dx = dx + alpha(filter_params['d_cutoff']) * ((value - x)*self.frame_rate - dx)
+                    x = x + alpha(filter_params['min_cutoff'] + filter_params['beta']*abs(dx)) * (value - x)
+                    col_filt[start+i] = x
+        return col_filt
+
+    def test_filter_array(self):
+        '''
+        filter_array gives the same output as filtering each column separately, for each filter type.
+        A marker is missing on a frame if any of its coordinates is nan or zero: 
+        its x, y, z coordinates are then filtered on the same segments.
+        '''
+
+        for gaps in (False, True):
+            Q = self.synthetic_coords(gaps)
+            valid = np.all(~np.isnan(Q) & (Q != 0), axis=2)
+            for filter_type, filter_params in self.filter_params.items():
+                with self.subTest(filter_type=filter_type, gaps=gaps):
+                    Q_filt = filter_array(Q, filter_type, self.frame_rate, **filter_params)
+                    Q_ref = np.empty_like(Q)
+                    for m in range(Q.shape[1]):
+                        for c in range(3):
+                            Q_ref[:,m,c] = self.filter_column_reference(Q[:,m,c], valid[:,m], filter_type, filter_params)
+                    np.testing.assert_allclose(Q_filt, Q_ref, rtol=0, atol=1e-9, equal_nan=True)
+                    self.assertFalse(np.allclose(Q_filt[:,3], Q[:,3])) # gap-free marker is filtered
+
+
+    def test_kalman_smoother_batch(self):
+        '''
+        Kalman filter and RTS smoother on a fixed series, against reference values 
+        (time-varying gains identical to filterpy KalmanFilter.batch_filter and rts_smoother).
+        '''
+
+        t = np.arange(20) / self.frame_rate
+        Z = np.sin(2*np.pi*t) + 0.1*np.cos(17*np.arange(20))
+        frames = [0, 1, 2, 5, 10, 19]
+        expected = {
+            (True, False): [0.269613437546, 0.282040196535, 0.301869488315, 0.393711861998, 0.462175986831, -0.643570627879],
+            (True, True): [0.412571748683, 0.477152366484, 0.540695359702, 0.697912240917, 0.683195462888, -0.793774728056],
+            (False, False): [0.102584342985, 0.108825589472, 0.121510238148, 0.269498660385, 1.020171365657, -0.643570627879],
+            (False, True): [0.101736821448, 0.131687491774, 0.205931365076, 0.704960702879, 1.141342346216, -0.793774728056],
+            }
+        for (smooth, steady_state), values in expected.items():
+            with self.subTest(smooth=smooth, steady_state=steady_state):
+                Z_filt = kalman_smoother_batch(np.column_stack([Z, 2*Z]), self.frame_rate, 20, 200, smooth=smooth, steady_state=steady_state)
+                np.testing.assert_allclose(Z_filt[frames,0], values, rtol=0, atol=1e-10)
+                np.testing.assert_allclose(Z_filt[:,1], 2*Z_filt[:,0], rtol=0, atol=1e-10) # series are independent
+
+    def test_loess_smoother_batch(self):
+        '''
+        Vectorized LOESS against statsmodels lowess without robustness iterations,
+        including windows sliding at both ends, odd and even windows, the whole series as a window, 
+        and windows of 2 frames, where fewer than two neighbors have a weight and values are kept.
+        '''
+
+        rng = np.random.default_rng(0)
+        for nb_frames, nb_values_used in [(30, 5), (31, 6), (50, 13), (12, 11), (40, 40), (20, 2), (25, 3)]:
+            with self.subTest(nb_frames=nb_frames, nb_values_used=nb_values_used):
+                Y = np.sin(np.arange(nb_frames)/4)[:,np.newaxis] + 0.1*rng.standard_normal((nb_frames, 2))
+                Y_filt = loess_smoother_batch(Y, nb_values_used)
+                for col in range(Y.shape[1]):
+                    Y_ref = lowess(Y[:,col], np.arange(nb_frames), is_sorted=True, frac=nb_values_used/nb_frames, it=0)[:,1]
+                    np.testing.assert_allclose(Y_filt[:,col], Y_ref, rtol=0, atol=1e-10)
+
+
+class TestTrcIO(unittest.TestCase):
+    '''
+    Round trips through write_trc_array and read_trc_array, 
+    and checks that the <name>.trc.npy sidecar is only used for the file it was written for.
+    '''
+
+    markers = ['Hip', 'RKnee', 'LKnee']
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.trc_path = os.path.join(self.tmp_dir.name, 'test.trc')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def trc_header(self, nb_frames):
+        '''
+        The 5 header lines of a trc file, with their line breaks.
+        '''
+
+        return ['PathFileType\t4\t(X/Y/Z)\ttest.trc\n',
+                'DataRate\tCameraRate\tNumFrames\tNumMarkers\tUnits\tOrigDataRate\tOrigDataStartFrame\tOrigNumFrames\n',
+                '\t'.join(map(str, [30, 30, nb_frames, len(self.markers), 'm', 30, 0, nb_frames])) + '\n',
+                'Frame#\tTime\t' + '\t\t\t'.join(self.markers) + '\t\t\n',
+                '\t\t' + '\t'.join([f'X{i+1}\tY{i+1}\tZ{i+1}' for i in range(len(self.markers))]) + '\n']
+
+    def synthetic_trc(self, nb_frames=40, seed=0):
+        '''
+        Frames, times, and coordinates of shape (frames, markers, 3) with nan gaps: 
+        a whole marker missing on a few frames, and a single missing coordinate.
+        '''
+
+        rng = np.random.default_rng(seed)
+        frames = np.arange(nb_frames) + 1
+        Q = rng.uniform(-2, 2, (nb_frames, len(self.markers), 3))
+        Q[5:9, 1, :] = np.nan
+        Q[12, 2, 0] = np.nan
+        return frames, frames/30, Q
+
+    def test_round_trip(self):
+        '''
+        Coordinates, gaps, frames, times, header, and marker names survive a write and a read, 
+        with integer frames read as integers and non-integer frames kept as floats.
+        '''
+
+        frames, times, Q = self.synthetic_trc()
+        for frames_written in (frames, frames + 0.5):
+            with self.subTest(integer_frames=frames_written is frames):
+                header = self.trc_header(len(Q))
+                write_trc_array(self.trc_path, header, frames_written, times, Q)
+                Q_read, frames_read, times_read, markers, header_read = read_trc_array(self.trc_path, cache=False)
+                np.testing.assert_allclose(Q_read, Q, rtol=1e-9, atol=0, equal_nan=True)
+                np.testing.assert_allclose(times_read, times, rtol=1e-9, atol=0)
+                np.testing.assert_array_equal(frames_read, frames_written)
+                self.assertEqual(frames_read.dtype.kind, 'i' if frames_written is frames else 'f')
+                self.assertEqual(markers, self.markers)
+                self.assertEqual(header_read, header)
+
+    def test_cache_hit(self):
+        '''
+        The first read writes the sidecar, the next ones (loaded or memory-mapped) use it without parsing the trc file.
+        '''
+
+        frames, times, Q = self.synthetic_trc()
+        write_trc_array(self.trc_path, self.trc_header(len(Q)), frames, times, Q)
+        self.assertFalse(os.path.exists(trc_cache_path(self.trc_path)))
+        Q_parsed, frames_parsed, times_parsed, _, _ = read_trc_array(self.trc_path)
+        self.assertTrue(os.path.exists(trc_cache_path(self.trc_path)))
+
+        for mmap in (False, True):
+            with self.subTest(mmap=mmap), patch('pandas.read_csv', side_effect=AssertionError('trc file parsed again')):
+                Q_cached, frames_cached, times_cached, _, _ = read_trc_array(self.trc_path, mmap=mmap)
+                np.testing.assert_array_equal(Q_cached, Q_parsed)
+                np.testing.assert_array_equal(frames_cached, frames_parsed)
+                np.testing.assert_array_equal(times_cached, times_parsed)
+                self.assertEqual(frames_cached.dtype, frames_parsed.dtype)
+
+    def test_cache_invalidation(self):
+        '''
+        The sidecar is removed when the trc file is written again with write_trc_array, 
+        and ignored when another tool rewrites the trc file with the same shape, 
+        be it with a new modification time, or with the old one preserved (cp -p, rsync -t).
+        '''
+
+        frames, times, Q = self.synthetic_trc()
+        header = self.trc_header(len(Q))
+        write_trc_array(self.trc_path, header, frames, times, Q)
+        read_trc_array(self.trc_path)
+        write_trc_array(self.trc_path, header, frames, times, Q + 1)
+        self.assertFalse(os.path.exists(trc_cache_path(self.trc_path)))
+        np.testing.assert_allclose(read_trc_array(self.trc_path)[0], Q + 1, rtol=1e-9, atol=0, equal_nan=True)
+
+        for keep_mtime in (False, True):
+            with self.subTest(keep_mtime=keep_mtime):
+                trc_stat = os.stat(self.trc_path)
+                Q_new = self.synthetic_trc(seed=1 + keep_mtime)[2]
+                Q_new = Q_new if keep_mtime else Q_new.round(3) # different file size from the previous version
+                other_path = os.path.join(self.tmp_dir.name, 'other.trc')
+                write_trc_array(other_path, header, frames, times, Q_new)
+                with open(other_path) as other_trc, open(self.trc_path, 'w') as trc_o:
+                    trc_o.write(other_trc.read())
+                if keep_mtime:
+                    os.utime(self.trc_path, ns=(trc_stat.st_atime_ns, trc_stat.st_mtime_ns))
+                else:
+                    os.utime(self.trc_path, ns=(trc_stat.st_atime_ns, trc_stat.st_mtime_ns + 10**9))
+                self.assertTrue(os.path.exists(trc_cache_path(self.trc_path)))
+                self.assertNotEqual(os.stat(self.trc_path).st_size, trc_stat.st_size)
+                np.testing.assert_allclose(read_trc_array(self.trc_path)[0], Q_new, rtol=1e-9, atol=0, equal_nan=True)
+
+
+class TestPoseBulk(unittest.TestCase):
+    '''
+    Poses written with BulkPoseWriter ('jsonl' and 'npz') and read back with list_json_files and read_pose_json
+    are the same as the OpenPose json files written by save_to_openpose.
+    '''
+
+    nb_keypoints = 5
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def synthetic_poses(self, nb_persons_per_frame, seed=0):
+        '''
+        (keypoints, scores) per frame, with keypoints of shape (persons, keypoints, 2) and scores of shape (persons, keypoints).
+        Values are multiples of 1/8, exact in float32 as in npz files.
+        '''
+
+        rng = np.random.default_rng(seed)
+        return [(rng.integers(0, 8*1920, (n, self.nb_keypoints, 2)) / 8, rng.integers(0, 8, (n, self.nb_keypoints)) / 8)
+                for n in nb_persons_per_frame]
+
+    def write_poses(self, poses, output_format, flush_every=2):
+        '''
+        Write poses to a bulk file standing for the cam01_json directory, and return the path of this directory.
+        '''
+
+        json_dir = os.path.join(self.tmp_dir.name, output_format, 'cam01_json')
+        writer = BulkPoseWriter(f'{json_dir}.{output_format}', output_format, flush_every=flush_every)
+        for frame_idx, (keypoints, scores) in enumerate(poses):
+            writer.write(frame_idx, keypoints, scores)
+        writer.close()
+        return json_dir
+
+    def test_round_trip(self):
+        '''
+        Frames with 0, 1, and 2 persons, over several flushed chunks.
+        '''
+
+        poses = self.synthetic_poses([1, 0, 2, 2, 0, 1, 2])
+        openpose_dir = os.path.join(self.tmp_dir.name, 'openpose', 'cam01_json')
+        for frame_idx, (keypoints, scores) in enumerate(poses):
+            save_to_openpose(os.path.join(openpose_dir, f'cam01_{frame_idx:06d}.json'), keypoints, scores)
+
+        for output_format in ('jsonl', 'npz'):
+            with self.subTest(output_format=output_format):
+                json_dir = self.write_poses(poses, output_format)
+                self.assertFalse(os.path.isdir(json_dir))
+                self.assertEqual(sorted(list_json_files(json_dir)), sorted(os.listdir(openpose_dir)))
+                for json_file in os.listdir(openpose_dir):
+                    with open(os.path.join(openpose_dir, json_file)) as js_f:
+                        self.assertEqual(read_pose_json(os.path.join(json_dir, json_file)), json.load(js_f))
+
+    def test_rewrite(self):
+        '''
+        A bulk file rewritten in the same process is read again, 
+        even if its modification time is unchanged (coarse file system timestamps).
+        '''
+
+        for output_format in ('jsonl', 'npz'):
+            with self.subTest(output_format=output_format):
+                json_dir = self.write_poses(self.synthetic_poses([1, 1, 1]), output_format)
+                bulk_path = f'{json_dir}.{output_format}'
+                self.assertEqual(len(read_pose_json(os.path.join(json_dir, 'cam01_000000.json'))['people']), 1)
+                bulk_stat = os.stat(bulk_path)
+
+                self.write_poses(self.synthetic_poses([2, 0, 1, 1], seed=1), output_format)
+                os.utime(bulk_path, ns=(bulk_stat.st_atime_ns, bulk_stat.st_mtime_ns))
+                self.assertEqual(len(list_json_files(json_dir)), 4)
+                self.assertEqual(len(read_pose_json(os.path.join(json_dir, 'cam01_000000.json'))['people']), 2)
+
+
+class TestSyncCorrelation(unittest.TestCase):
+    '''
+    FFT cross-correlation of synchronization against a Pearson correlation computed lag by lag, 
+    and sub-frame refinement of its peak, on a pair of series with a known lag and nan gaps.
+    '''
+
+    lags = np.arange(-20, 21)
+
+    def synthetic_pair(self, lag, nb_frames=200):
+        '''
+        camx(t) = f(t) and camy(t) = f(t + lag) for a smooth signal f, 
+        so that camx best correlates with camy shifted by lag frames. Nan gaps in both.
+        '''
+
+        rng = np.random.default_rng(0)
+        freqs, phases = rng.uniform(0.02, 0.15, 6), rng.uniform(0, 2*np.pi, 6)
+        f = lambda t: np.sum(np.sin(2*np.pi*freqs*t[:,np.newaxis] + phases), axis=1)
+        t = np.arange(nb_frames, dtype=float)
+        x, y = f(t), f(t + lag)
+        x[30:40] = np.nan
+        y[100:104] = np.nan
+        y[150] = np.nan
+        return pd.Series(x), pd.Series(y)
+
+    def shifted_pearson(self, x, y, lag):
+        '''
+        Pearson correlation between x[i] and y[i-lag], over the frames where both are valid.
+        '''
+
+        y_shifted = np.full(len(y), np.nan)
+        if lag >= 0:
+            y_shifted[lag:] = y[:len(y)-lag]
+        else:
+            y_shifted[:lag] = y[-lag:]
+        valid = ~np.isnan(x) & ~np.isnan(y_shifted)
+        return np.corrcoef(x[valid], y_shifted[valid])[0,1]
+
+    def test_normalized_cross_corr(self):
+        '''
+        Same correlation as the lag by lag reference, with its maximum at the known lag.
+        '''
+
+        for lag in (7, -4):
+            with self.subTest(lag=lag):
+                camx, camy = self.synthetic_pair(lag)
+                pearson_r = normalized_cross_corr(camx, camy, self.lags)
+                pearson_r_ref = [self.shifted_pearson(camx.to_numpy(), camy.to_numpy(), l) for l in self.lags]
+                np.testing.assert_allclose(pearson_r, pearson_r_ref, rtol=0, atol=1e-9)
+                self.assertEqual(self.lags[np.nanargmax(pearson_r)], lag)
+
+    def test_parabolic_peak(self):
+        '''
+        Exact on a parabola, and recovers a fractional lag from the correlation peak.
+        '''
+
+        delta, peak_value = parabolic_peak(1 - (self.lags - 3.3)**2, np.argmax(-(self.lags - 3.3)**2))
+        self.assertAlmostEqual(delta, 0.3, places=10)
+        self.assertAlmostEqual(peak_value, 1, places=10)
+
+        for lag in (7.3, -4.6):
+            with self.subTest(lag=lag):
+                pearson_r = normalized_cross_corr(*self.synthetic_pair(lag), self.lags)
+                peak_id = np.nanargmax(pearson_r)
+                delta, _ = parabolic_peak(pearson_r, peak_id)
+                self.assertAlmostEqual(self.lags[peak_id] + delta, lag, delta=0.02)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -17,10 +17,10 @@
 
 
 ## INIT
-import pandas as pd
-import numpy as np
 import argparse
 
+from Pose2Sim.common import read_trc_array, write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -54,28 +54,16 @@ def trc_Zup_to_Yup_func(*args):
         trc_path = args[0] # invoked as a function
         trc_yup_path = trc_path.replace('.trc', '_Yup.trc')
 
-    # header
-    with open(trc_path, 'r') as trc_file:
-        header = [next(trc_file) for line in range(5)]
-
-    # data
-    trc_df = pd.read_csv(trc_path, sep="\t", skiprows=4)
-    frames_col, time_col = trc_df.iloc[:,0], trc_df.iloc[:,1]
-    Q_coord = trc_df.drop(trc_df.columns[[0, 1]], axis=1)
+    # header and data
+    Q_coord, frames_col, time_col, _, header = read_trc_array(trc_path)
 
     # Y->Z, Z->Y
-    cols = list(Q_coord.columns)
-    # cols = np.array([[cols[i*3+1],cols[i*3+2],cols[i*3]] for i in range(int(len(cols)/3))]).flatten() # X->Y, Y->Z, Z->X
-    cols = np.array([[cols[i*3],cols[i*3+2],cols[i*3+1]] for i in range(int(len(cols)/3))]).flatten() # Y->Z, Z->-Y
-    Q_Yup = Q_coord[cols]
-    # Q_Yup.iloc[:,2::3] = - Q_Yup.iloc[:,2::3]
+    # Q_Yup = Q_coord[:,:,[1,2,0]] # X->Y, Y->Z, Z->X
+    Q_Yup = Q_coord[:,:,[0,2,1]] # Y->Z, Z->-Y
+    # Q_Yup[:,:,1] = - Q_Yup[:,:,1]
 
     # write file
-    with open(trc_yup_path, 'w') as trc_o:
-        [trc_o.write(line) for line in header]
-        Q_Yup.insert(0, 'Frame#', frames_col)
-        Q_Yup.insert(1, 'Time', time_col)
-        Q_Yup.to_csv(trc_o, sep='\t', index=False, header=None, lineterminator='\n')
+    write_trc_array(trc_yup_path, header, frames_col, time_col, Q_Yup)
     
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
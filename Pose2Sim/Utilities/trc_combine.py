@@ -25,6 +25,8 @@ import pandas as pd
 import numpy as np
 import argparse
 
+from Pose2Sim.common import read_trc_array, write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -50,17 +52,17 @@ def df_from_trc(trc_path):
     data: pandas dataframe of data
     '''
 
+    Q, frames, times, labels, header_lines = read_trc_array(trc_path)
+
     # DataRate	CameraRate	NumFrames	NumMarkers	Units	OrigDataRate	OrigDataStartFrame	OrigNumFrames
-    df_header = pd.read_csv(trc_path, sep="\t", skiprows=1, header=None, nrows=2, encoding="ISO-8859-1")
-    header = dict(zip(df_header.iloc[0].tolist(), df_header.iloc[1].tolist()))
+    header = dict(zip(header_lines[1].strip().split('\t'), header_lines[2].strip().split('\t')))
     
     # Label1_X  Label1_Y    Label1_Z    Label2_X    Label2_Y
-    df_lab = pd.read_csv(trc_path, sep="\t", skiprows=3, nrows=1)
-    labels = df_lab.columns.tolist()[2:-1:3]
     labels_XYZ = np.array([[labels[i]+'_X', labels[i]+'_Y', labels[i]+'_Z'] for i in range(len(labels))], dtype='object').flatten()
-    labels_FTXYZ = np.concatenate((['Frame#','Time'], labels_XYZ))
     
-    data = pd.read_csv(trc_path, sep="\t", skiprows=5, index_col=False, header=None, names=labels_FTXYZ)
+    data = pd.DataFrame(Q.reshape(len(Q), -1), columns=labels_XYZ)
+    data.insert(0, 'Frame#', frames)
+    data.insert(1, 'Time', times)
     
     return header, data
 
@@ -117,11 +119,9 @@ def trc_from_header_data(Header, Data, combined_path):
     header2_str1 = 'Frame#\tTime\t' + '\t\t\t'.join([item.strip() for item in labels_markers]) + '\t\t'
     header2_str2 = '\t\t'+'\t'.join(['X{i}\tY{i}\tZ{i}'.format(i=i+1) for i in range(int(Header['NumMarkers']))])
 
-    header_trc = '\n'.join([header0_str, header1_str1, header1_str2, header2_str1, header2_str2])
+    header_trc = [line+'\n' for line in [header0_str, header1_str1, header1_str2, header2_str1, header2_str2]]
 
-    with open(combined_path, 'w') as trc_o:
-        trc_o.write(header_trc+'\n')
-        Data.to_csv(trc_o, sep='\t', index=False, header=None, lineterminator='\n')
+    write_trc_array(combined_path, header_trc, Data.iloc[:,0].to_numpy(), Data.iloc[:,1].to_numpy(), Data.iloc[:,2:].to_numpy())
         
 
 def trc_combine_func(*args):
@@ -17,10 +17,12 @@
 
 
 ## INIT
-import pandas as pd
+import numpy as np
 import re
 import argparse
 
+from Pose2Sim.common import read_trc_array, write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -56,9 +58,8 @@ def trc_desample_func(*args):
         f_out = int(args[1])
         trc_desampled_path = trc_path.replace('.trc', f'_{f_out}fps.trc')
     
-    # header
-    with open(trc_path, 'r') as trc_file:
-        header = [next(trc_file) for line in range(5)]
+    # header and data
+    Q, frames, times, _, header = read_trc_array(trc_path)
     params_in = re.split('\t|\n', header[2])[:-1]
     params_in = [int(p) if i not in [3,4] else p for i,p in enumerate(params_in)]
     f_in = params_in[0]
@@ -66,15 +67,12 @@ def trc_desample_func(*args):
     params_out = [str(p) for i,p in enumerate(params_out)]
     header[2] = '\t'.join(params_out) + '\n'
     
-    # data
-    Q = pd.read_csv(trc_path, sep="\t", skiprows=4)
-    Q = Q.iloc[::int(f_in/f_out),:]
-    Q.iloc[:,0] = range(len(Q))
+    # desample
+    Q, times = Q[::int(f_in/f_out)], times[::int(f_in/f_out)]
+    frames = np.arange(len(Q))
     
     # write trc
-    with open(trc_desampled_path, 'w') as trc_o:
-        [trc_o.write(line) for line in header]
-        Q.to_csv(trc_o, sep='\t', index=False, header=None, lineterminator='\n')
+    write_trc_array(trc_desampled_path, header, frames, times, Q)
     
 
 if __name__ == '__main__':
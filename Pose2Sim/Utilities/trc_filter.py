@@ -37,11 +37,12 @@ mpl.rc('figure', max_open_warning=0)
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from PyQt5.QtWidgets import QMainWindow, QApplication, QWidget, QTabWidget, QVBoxLayout
-from scipy import signal
-from scipy.ndimage import gaussian_filter1d
-from statsmodels.nonparametric.smoothers_lowess import lowess
+import numpy as np
 import argparse
 
+from Pose2Sim.common import read_trc_array, write_trc_array
+from Pose2Sim.filtering import filter_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -108,113 +109,31 @@ class plotWindow():
 
 
 ## FUNCTIONS
-def butterworth_filter_1d(col, **args):
-    '''
-    1D Zero-phase Butterworth filter (dual pass)
-
-    INPUT:
-    - col: Pandas dataframe column
-    - args: dictionary of pass_type, order, cut_off_frequency, frame_rate
-
-    OUTPUT
-    - col_filtered: Filtered pandas dataframe column
-    '''
-
-    butterworth_filter_type = args.get('pass_type')
-    butterworth_filter_order = int(args.get('order'))
-    butterworth_filter_cutoff = int(args.get('cut_off_frequency'))    
-    frame_rate = int(args.get('frame_rate'))
-
-    b, a = signal.butter(butterworth_filter_order/2, butterworth_filter_cutoff/(frame_rate/2), butterworth_filter_type, analog = False) 
-    col_filtered = signal.filtfilt(b, a, col)
-    
-    return col_filtered
-
-
-def butterworth_on_speed_filter_1d(col, **args):
-    '''
-    1D zero-phase Butterworth filter (dual pass) on derivative
-
-    INPUT:
-    - col: Pandas dataframe column
-    - args: dictionary of pass_type, order, cut_off_frequency, frame_rate
-
-    OUTPUT
-    - col_filtered: Filtered pandas dataframe column
-    '''
-
-    butter_speed_filter_type = args.get('pass_type')
-    butter_speed_filter_order = int(args.get('order'))
-    butter_speed_filter_cutoff = int(args.get('cut_off_frequency'))
-    frame_rate = int(args.get('frame_rate'))
-
-    b, a = signal.butter(butter_speed_filter_order/2, butter_speed_filter_cutoff/(frame_rate/2), butter_speed_filter_type, analog = False)
-    
-    col_diff = col.diff()   # derivative
-    col_diff = col_diff.fillna(col_diff.iloc[1]/2) # set first value correctly instead of nan
-    col_diff_filt = signal.filtfilt(b, a, col_diff) # filter derivative
-    col_filtered = col_diff_filt.cumsum() + col.iloc[0] # integrate filtered derivative
-    
-    return col_filtered
-
-
-def gaussian_filter_1d(col, **args):
-    '''
-    1D Gaussian filter
-
-    INPUT:
-    - col: Pandas dataframe column
-    - args: dictionary with kernel value
-
-    OUTPUT
-    - col_filtered: Filtered pandas dataframe column
+def filter_params_from_args(**args):
     '''
-
-    gaussian_filter_sigma_kernel = int(args.get('kernel'))
-
-    col_filtered = gaussian_filter1d(col, gaussian_filter_sigma_kernel)
-
-    return col_filtered
-    
-
-def loess_filter_1d(col, **args):
-    '''
-    1D LOWESS filter (Locally Weighted Scatterplot Smoothing)
+    Translate the arguments of trc_filter_func into the parameters 
+    of the Pose2Sim.filtering engine
 
     INPUT:
-    - col: Pandas dataframe column
-    - args: dictionary with nb_values_used: window used for smoothing 
-    NB: frac = nb_values_used * frames_number
-
-    OUTPUT
-    - col_filtered: Filtered pandas dataframe column
-    '''
-
-    loess_filter_nb_values = int(args.get('kernel'))
-
-    col_filtered = lowess(col, col.index, is_sorted=True, frac=loess_filter_nb_values/len(col), it=0)[:,1]
+    - args: dictionary with type, pass_type, order, cut_off_frequency, kernel
 
-    return col_filtered
-    
-
-def median_filter_1d(col, **args):
+    OUTPUT:
+    - filter_type: 'butterworth', 'butterworth_on_speed', 'gaussian', 'LOESS', or 'median'
+    - filter_params: dict of keyword arguments of the filter function
     '''
-    1D median filter
 
-    INPUT:
-    - col: Pandas dataframe column
-    - args: dictionary with "kernel" size
-    
-    OUTPUT
-    - col_filtered: Filtered pandas dataframe column
-    '''
-    
-    median_filter_kernel_size = args.get('kernel')
-    
-    col_filtered = signal.medfilt(col, kernel_size=median_filter_kernel_size)
+    filter_type = args.get('type').strip(', ')
+    if filter_type in ('butterworth', 'butterworth_on_speed'):
+        pass_type = args.get('pass_type') or 'low'
+        return filter_type, {'order': int(args.get('order')), 'cut_off_frequency': int(args.get('cut_off_frequency')), 'pass_type': pass_type}
+    elif filter_type == 'gaussian':
+        return filter_type, {'sigma_kernel': int(args.get('kernel'))}
+    elif filter_type in ('loess', 'lowess', 'LOESS'):
+        return 'LOESS', {'nb_values_used': int(args.get('kernel'))}
+    elif filter_type == 'median':
+        return filter_type, {'kernel_size': int(args.get('kernel'))}
+    raise ValueError(f'Unknown filter type: {filter_type}')
 
-    return col_filtered
-    
 
 def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names):
     '''
@@ -262,7 +181,8 @@ def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names):
 
 def filter1d(col, **args):
     '''
-    Choose filter type and filter column
+    Choose filter type and filter column.
+    Prefer Pose2Sim.filtering.filter_array to filter all columns at once.
 
     INPUT:
     - col: Pandas dataframe column
@@ -273,20 +193,8 @@ def filter1d(col, **args):
     - col_filtered: Filtered pandas dataframe column
     '''
 
-    # Choose filter
-    filter_type = args.get('type')
-    
-    filter_mapping = {
-        'butterworth': butterworth_filter_1d, 
-        'butterworth_on_speed': butterworth_on_speed_filter_1d, 
-        'gaussian': gaussian_filter_1d, 
-        'loess': loess_filter_1d, 
-        'median': median_filter_1d
-        }
-    filter_fun = filter_mapping[filter_type]
-    
-    # Filter column
-    col_filtered = filter_fun(col, **args)
+    filter_type, filter_params = filter_params_from_args(**args)
+    col_filtered = filter_array(col.to_numpy()[:, np.newaxis], filter_type, int(args.get('frame_rate')), **filter_params)[:, 0]
 
     return col_filtered
 
@@ -312,35 +220,25 @@ def trc_filter_func(**args):
         python -m trc_filter -i input_trc_file -t gaussian, -k 5
     '''
 
-    # Read trc header
+    # Read trc file
     trc_path_in = args.get('input_file')
-    with open(trc_path_in, 'r') as trc_file:
-        header = [next(trc_file) for line in range(5)]
+    Q, frames_col, time_col, keypoints_names, header = read_trc_array(trc_path_in)
     args['frame_rate'] = int(header[2].split('\t')[0])
 
-    # Read trc coordinates values
-    trc_df = pd.read_csv(trc_path_in, sep="\t", skiprows=4)
-    frames_col, time_col = trc_df.iloc[:,0], trc_df.iloc[:,1]
-    Q_coord = trc_df.drop(trc_df.columns[[0, 1]], axis=1)
-
     # Filter coordinates
-    Q_filt = Q_coord.apply(filter1d, axis=0, **args)
+    filter_type, filter_params = filter_params_from_args(**args)
+    Q_filt = filter_array(Q, filter_type, args['frame_rate'], **filter_params)
 
     # Display figures
     display = args.get('display')
     if display == True or display == 'True':
-        keypoints_names = pd.read_csv(trc_path_in, sep="\t", skiprows=3, nrows=0).columns[2::3].tolist()
-        display_figures_fun(Q_coord, Q_filt, time_col, keypoints_names)
+        display_figures_fun(pd.DataFrame(Q.reshape(len(Q), -1)), pd.DataFrame(Q_filt.reshape(len(Q), -1)), time_col, keypoints_names)
 
     # Reconstruct trc file with filtered coordinates
     trc_path_out = args.get('output_file')
     if trc_path_out == None: 
         trc_path_out = trc_path_in.replace('.trc', '_filt.trc')
-    with open(trc_path_out, 'w') as trc_o:
-        [trc_o.write(line) for line in header]
-        Q_filt.insert(0, 'Frame#', frames_col)
-        Q_filt.insert(1, 'Time', time_col)
-        Q_filt.to_csv(trc_o, sep='\t', index=False, header=None, lineterminator='\n')
+    write_trc_array(trc_path_out, header, frames_col, time_col, Q_filt)
 
 
 if __name__ == '__main__':
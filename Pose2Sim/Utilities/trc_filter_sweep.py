@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+'''
+    ##################################################
+    ## Sweep filter parameters on a TRC file        ##
+    ##################################################
+
+    Loads a trc file once, filters it with a grid of parameters, and computes
+    the RMS residual between filtered and unfiltered coordinates for each marker.
+    For Butterworth filters, recommends a cut-off frequency per marker and overall
+    with Winter's residual analysis.
+    Filtered trc files are only written if requested.
+
+    Usage examples:
+    Butterworth filter, 4th order, cut-off frequencies from 1 to 20 Hz:
+        from Pose2Sim.Utilities import trc_filter_sweep; trc_filter_sweep.trc_filter_sweep_func(input_file = input_trc_file,
+            type='butterworth', orders=[4], cut_off_frequencies=[1, 20, 0.5])
+        OR python -m trc_filter_sweep -i input_trc_file -t butterworth -n 4 -f 1 20 0.5
+    Several orders, display residual curves, and write the filtered files:
+        python -m trc_filter_sweep -i input_trc_file -t butterworth -n 2 4 8 -f 1 20 0.5 -d True -w True
+    Kalman filter, several trust ratios:
+        python -m trc_filter_sweep -i input_trc_file -t kalman -r 1 10 100 1000
+'''
+
+
+## INIT
+import numpy as np
+import matplotlib.pyplot as plt
+import argparse
+
+from Pose2Sim.common import read_trc_array, write_trc_array
+from Pose2Sim.filtering import filter_sweep, winter_cutoff
+
+
+## AUTHORSHIP INFORMATION
+__author__ = "David Pagnon"
+__copyright__ = "Copyright 2021, Pose2Sim"
+__credits__ = ["David Pagnon"]
+__license__ = "BSD 3-Clause License"
+__version__ = "0.9.4"
+__maintainer__ = "David Pagnon"
+__email__ = "contact@david-pagnon.com"
+__status__ = "Development"
+
+
+## FUNCTIONS
+def display_residuals(sweep_values, residuals, keypoints_names, xlabel, recommended=None, noise_levels=None):
+    '''
+    Plot residual curves of each marker, and of all markers together
+
+    INPUTS:
+    - sweep_values: array of the swept parameter
+    - residuals: array of shape (len(sweep_values), markers)
+    - keypoints_names: list of strings
+    - xlabel: name of the swept parameter
+    - recommended: recommended cut-off frequency of all markers together, or None
+    - noise_levels: noise level of all markers together, or None
+    '''
+
+    f, ax = plt.subplots()
+    for k, keypoint in enumerate(keypoints_names):
+        ax.plot(sweep_values, residuals[:,k], color='grey', alpha=0.3, linewidth=0.8)
+    ax.plot(sweep_values, np.sqrt(np.nanmean(residuals**2, axis=1)), color='black', linewidth=2, label='all markers')
+    if recommended is not None and np.isfinite(recommended):
+        ax.axhline(noise_levels, color='tab:blue', linestyle='--', label='noise level')
+        ax.axvline(recommended, color='tab:red', label=f'recommended: {recommended:.1f} Hz')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('RMS residual')
+    ax.legend()
+    plt.show()
+
+
+def trc_filter_sweep_func(**args):
+    '''
+    Loads a trc file once, filters it with a grid of parameters, and computes
+    the RMS residual between filtered and unfiltered coordinates for each marker.
+    For Butterworth filters, recommends a cut-off frequency per marker and overall
+    with Winter's residual analysis.
+    Filtered trc files are only written if requested.
+
+    Usage examples:
+    Butterworth filter, 4th order, cut-off frequencies from 1 to 20 Hz:
+        from Pose2Sim.Utilities import trc_filter_sweep; trc_filter_sweep.trc_filter_sweep_func(input_file = input_trc_file,
+            type='butterworth', orders=[4], cut_off_frequencies=[1, 20, 0.5])
+        OR python -m trc_filter_sweep -i input_trc_file -t butterworth -n 4 -f 1 20 0.5
+    Several orders, display residual curves, and write the filtered files:
+        python -m trc_filter_sweep -i input_trc_file -t butterworth -n 2 4 8 -f 1 20 0.5 -d True -w True
+    Kalman filter, several trust ratios:
+        python -m trc_filter_sweep -i input_trc_file -t kalman -r 1 10 100 1000
+
+    OUTPUT:
+    - results: dict. Residuals of each order (or 'kalman'), and recommended cut-off frequencies if Butterworth
+    '''
+
+    trc_path_in = args.get('input_file')
+    filter_type = args.get('type') or 'butterworth'
+    display = args.get('display') in (True, 'True')
+    write = args.get('write') in (True, 'True')
+
+    # Read trc once
+    Q, frames_col, time_col, keypoints_names, header = read_trc_array(trc_path_in)
+    frame_rate = int(float(header[2].split('\t')[0]))
+
+    # Parameter grids
+    if filter_type in ('butterworth', 'butterworth_on_speed'):
+        orders = [int(o) for o in (args.get('orders') or [4])]
+        f_min, f_max, f_step = [float(f) for f in (args.get('cut_off_frequencies') or [1, 20, 1])]
+        sweep_values = np.arange(f_min, f_max + f_step/2, f_step)
+        sweep_values = sweep_values[sweep_values < frame_rate/2]
+        grids = {order: [{'order': order, 'cut_off_frequency': f} for f in sweep_values] for order in orders}
+        param_name = 'cut_off_frequency'
+    elif filter_type == 'kalman':
+        sweep_values = np.array([float(r) for r in (args.get('trust_ratios') or [1, 10, 100, 1000])])
+        grids = {'kalman': [{'trust_ratio': r, 'smooth': True} for r in sweep_values]}
+        param_name = 'trust_ratio'
+    else:
+        raise ValueError('Sweeps are available for butterworth, butterworth_on_speed, and kalman filters.')
+
+    # Sweep
+    results = {}
+    for grid_name, grid in grids.items():
+        sweep_out = filter_sweep(Q, filter_type, frame_rate, grid, return_filtered=write)
+        residuals, Q_filt_list = sweep_out if write else (sweep_out, None)
+        results[grid_name] = {'sweep_values': sweep_values, 'residuals': residuals}
+
+        print(f'\n{filter_type}' + (f', order {grid_name}' if grid_name != 'kalman' else '') + ':')
+        if param_name == 'cut_off_frequency':
+            recommended, _ = winter_cutoff(sweep_values, residuals)
+            overall_residuals = np.sqrt(np.nanmean(residuals**2, axis=1))
+            recommended_all, noise_level_all = winter_cutoff(sweep_values, overall_residuals)
+            results[grid_name].update({'recommended': dict(zip(keypoints_names, recommended)), 'recommended_all': float(recommended_all)})
+            for keypoint, cutoff in zip(keypoints_names, recommended):
+                print(f'  {keypoint}: {cutoff:.1f} Hz')
+            print(f'  --> Recommended cut-off frequency for all markers: {recommended_all:.1f} Hz')
+        else:
+            for value, res in zip(sweep_values, residuals):
+                print(f'  {param_name} {value:g}: mean RMS residual {np.nanmean(res):.4f}')
+            recommended_all, noise_level_all = None, None
+
+        # Write filtered files only on request
+        if write:
+            for value, Q_filt in zip(sweep_values, Q_filt_list):
+                suffix = f'_o{grid_name}_f{value:g}' if grid_name != 'kalman' else f'_r{value:g}'
+                trc_path_out = trc_path_in.replace('.trc', f'_filt_{filter_type}{suffix}.trc')
+                write_trc_array(trc_path_out, header, frames_col, time_col, Q_filt)
+
+        if display:
+            display_residuals(sweep_values, residuals, keypoints_names, param_name, recommended_all, noise_level_all)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input_file', required = True, help='trc input file')
+    parser.add_argument('-t', '--type', required = False, default='butterworth', help='type of filter. "butterworth", \
+        "butterworth_on_speed", or "kalman"')
+    parser.add_argument('-n', '--orders', nargs='+', required = False, help='filter orders')
+    parser.add_argument('-f', '--cut_off_frequencies', nargs=3, required = False, help='min max step of cut-off frequencies')
+    parser.add_argument('-r', '--trust_ratios', nargs='+', required = False, help='trust ratios of the Kalman filter')
+    parser.add_argument('-d', '--display', required = False, default = False, help='display residual curves')
+    parser.add_argument('-w', '--write', required = False, default = False, help='write a filtered trc file for each parameter set')
+
+    args = vars(parser.parse_args())
+
+    trc_filter_sweep_func(**args)
@@ -38,6 +38,8 @@ import json
 import numpy as np
 import pandas as pd
 
+from Pose2Sim.common import write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -115,13 +117,11 @@ def write_trc(Q_df, output_trc_dir, trc_root_name):
                 '\t\t'+'\t'.join([f'X{i+1}\tY{i+1}\tZ{i+1}' for i in range(len(KEYPOINT_NAMES))])]
                 
         Q = zup2yup(Q_df[idx])
-        Q.index = np.array(range(NumFrames)) + 1
-        Q.insert(0, 't', Q.index / DataRate)
+        frames = np.array(range(NumFrames)) + 1
+        times = frames / DataRate
         
         trc_path = os.path.realpath(os.path.join(output_trc_dir, trc_root_name+str(idx)+'.trc'))
-        with open(trc_path, 'w') as trc_o:
-            [trc_o.write(line+'\n') for line in header_trc]
-            Q.to_csv(trc_o, sep='\t', index=True, header=None, lineterminator='\n')
+        write_trc_array(trc_path, [line+'\n' for line in header_trc], frames, times, Q.to_numpy())
 
 
 def trc_from_easymocap_func(**kwargs):
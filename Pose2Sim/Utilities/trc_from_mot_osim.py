@@ -25,6 +25,8 @@ import numpy as np
 import opensim as osim
 import argparse
 
+from Pose2Sim.common import write_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -152,12 +154,10 @@ def trc_from_mot_osim_func(**args):
     header2_str1 = 'Frame#\tTime\t' + '\t\t\t'.join([mk.strip() for mk in marker_set_names]) + '\t\t'
     header2_str2 = '\t\t'+'\t'.join(['X{i}\tY{i}\tZ{i}'.format(i=i+1) for i in range(int(header1['NumMarkers']))])
 
-    header_trc = '\n'.join([header0_str, header1_str1, header1_str2, header2_str1, header2_str2])
+    header_trc = [line+'\n' for line in [header0_str, header1_str1, header1_str2, header2_str1, header2_str2]]
     
     # write data
-    with open(trc_path, 'w') as trc_o:
-        trc_o.write(header_trc+'\n')
-    marker_positions_pd.to_csv(trc_path, header=False, sep = '\t', mode='a', index=False)
+    write_trc_array(trc_path, header_trc, marker_positions_pd['frame'].to_numpy(), marker_positions_pd['time'].to_numpy(), marker_positions_pd.iloc[:,2:].to_numpy())
     print(f'trc file successfully saved as {trc_path}')
     
     
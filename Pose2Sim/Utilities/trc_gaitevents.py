@@ -75,6 +75,8 @@ from scipy import signal
 from scipy.ndimage import gaussian_filter1d
 import matplotlib.pyplot as plt
 
+from Pose2Sim.common import read_trc
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -108,32 +110,6 @@ def start_end_true_seq(series):
     return start_indices, end_indices
 
 
-def read_trc(trc_path):
-    '''
-    Read trc file
-
-    INPUTS:
-    - trc_path: path to the trc file
-
-    OUTPUTS:
-    - Q_coords: dataframe of coordinates
-    - frames_col: series of frames
-    - time_col: series of time
-    - markers: list of marker names
-    - header: list of header lines
-    '''
-    
-    with open(trc_path, 'r') as trc_file:
-        header = [next(trc_file) for line in range(5)]
-    markers = header[3].split('\t')[2::3]
-    
-    trc_df = pd.read_csv(trc_path, sep="\t", skiprows=4)
-    frames_col, time_col = pd.Series(trc_df.iloc[:,0], name='frames'), pd.Series(trc_df.iloc[:,1], name='time')
-    Q_coords = trc_df.drop(trc_df.columns[[0, 1]], axis=1)
-
-    return Q_coords, frames_col, time_col, markers, header
-
-
 def first_step_side(Ron, Lon):
     '''
     Get first step side
@@ -30,6 +30,8 @@ from scipy.ndimage import gaussian_filter1d
 from statsmodels.nonparametric.smoothers_lowess import lowess
 import argparse
 
+from Pose2Sim.common import read_trc_array
+
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -148,12 +150,10 @@ def trc_plot_func(*args):
         trc_path = args[0] # invoked as a function
 
     # Read trc coordinates values
-    trc_df = pd.read_csv(trc_path, sep="\t", skiprows=4)
-    time_col =trc_df.iloc[:,1]
-    Q_coord = trc_df.drop(trc_df.columns[[0, 1]], axis=1)
+    Q, _, time_col, keypoints_names, _ = read_trc_array(trc_path)
+    Q_coord = pd.DataFrame(Q.reshape(len(Q), -1))
 
     # Display figures
-    keypoints_names = pd.read_csv(trc_path, sep="\t", skiprows=3, nrows=0).columns[2::3].tolist()
     display_figures_fun(Q_coord, time_col, keypoints_names)
 
 
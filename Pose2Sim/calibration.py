@@ -29,7 +29,7 @@ OUTPUTS:
 
 
 ## INIT
-from Pose2Sim.common import world_to_camera_persp, rotate_cam, quat2mat, euclidean_distance, natural_sort_key, zup2yup
+from Pose2Sim.common import world_to_camera_persp, rotate_cam, quat2mat, euclidean_distance, natural_sort_key, zup2yup, write_trc_array
 
 import os
 import logging
@@ -1191,14 +1191,12 @@ def trc_write(object_coords_3d, trc_path):
     object_coords_3d = pd.DataFrame([np.array(object_coords_3d).flatten(), np.array(object_coords_3d).flatten()])
     object_coords_3d = zup2yup(object_coords_3d)
     
-    #Add Frame# and Time columns
-    object_coords_3d.index = np.array(range(0, NumFrames)) + 1
-    object_coords_3d.insert(0, 't', object_coords_3d.index / DataRate)
+    #Frame# and Time columns
+    frames = np.array(range(0, NumFrames)) + 1
+    times = frames / DataRate
 
     #Write file
-    with open(trc_path, 'w') as trc_o:
-        [trc_o.write(line+'\n') for line in header_trc]
-        object_coords_3d.to_csv(trc_o, sep='\t', index=True, header=None, lineterminator='\n')
+    write_trc_array(trc_path, [line+'\n' for line in header_trc], frames, times, object_coords_3d.to_numpy())
 
     return trc_path
 
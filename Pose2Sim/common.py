@@ -11,8 +11,12 @@ Functions shared between modules, and other utilities
 '''
 
 ## INIT
+import os
 import toml
 import json
+import fnmatch
+import zipfile
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from scipy import interpolate
@@ -44,6 +48,10 @@ __status__ = "Development"
 
 
 ## CONSTANTS
+sync_manifest_name = 'sync_manifest.toml' # written in pose-sync instead of json copies when sync_output = 'manifest'
+sync_state_name = 'sync_state.toml' # processed json range and offsets of each camera, written in pose when synchronization is incremental
+sync_cache_name = 'sync_cache.npz' # coordinates of each camera (speeds are recomputed from them), written in pose when synchronization is incremental
+
 angle_dict = { # lowercase!
     # joint angles
     'right ankle': [['RKnee', 'RAnkle', 'RBigToe', 'RHeel'], 'dorsiflexion', 90, 1],
@@ -138,7 +146,69 @@ class plotWindow():
         self.tab_handles.append(new_tab)
 
     def show(self):
-        self.app.exec_() 
+        self.app.exec_()
+
+
+class BulkPoseWriter():
+    '''
+    Append the 2D poses of all frames of a camera to a single file,
+    instead of writing one OpenPose json file per frame.
+    Frames are buffered in memory and written every flush_every frames.
+
+    Formats:
+    - 'jsonl': one line per frame: {"frame": frame_idx, "people": [[x1, y1, score1, x2, ...], ...]}
+    - 'npz': chunks of arrays appended to a single zip archive readable with np.load:
+             frames, number of persons per frame, and (persons, keypoints, 3) coordinates and scores
+
+    Both can be read back with read_pose_json and list_json_files, as if they were json directories.
+
+    USAGE:
+    writer = BulkPoseWriter('pose/cam01_json.jsonl', 'jsonl')
+    writer.write(frame_idx, keypoints, scores)
+    writer.close()
+    '''
+
+    def __init__(self, file_path, output_format='jsonl', flush_every=500):
+        if output_format not in ('jsonl', 'npz'):
+            raise ValueError(f"Invalid bulk output format: {output_format}. Must be 'jsonl' or 'npz'.")
+        self.file_path = file_path
+        self.output_format = output_format
+        self.flush_every = flush_every
+        self.buffer = []
+        self.chunk_nb = 0
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        if os.path.exists(file_path): # overwrite previous results
+            os.remove(file_path)
+
+    def write(self, frame_idx, keypoints, scores):
+        if len(keypoints) > 0:
+            people = np.concatenate((np.asarray(keypoints, dtype=float), np.asarray(scores, dtype=float)[...,np.newaxis]), axis=2)
+        else:
+            people = np.empty((0,0,3))
+        self.buffer.append((frame_idx, people))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return
+        if self.output_format == 'jsonl':
+            lines = [json.dumps({'frame': int(f), 'people': [p.ravel().tolist() for p in people]}) + '\n' for f, people in self.buffer]
+            with open(self.file_path, 'a') as bulk_f:
+                bulk_f.writelines(lines)
+        else:
+            chunk = {'frames': np.array([f for f, _ in self.buffer], dtype=np.int64),
+                     'nb_persons': np.array([len(people) for _, people in self.buffer], dtype=np.int32),
+                     'keypoints': np.concatenate([people for _, people in self.buffer if len(people)>0] or [np.empty((0,0,3))]).astype(np.float32)}
+            with zipfile.ZipFile(self.file_path, 'a') as bulk_f:
+                for name, arr in chunk.items():
+                    with bulk_f.open(f'chunk{self.chunk_nb:06d}_{name}.npy', 'w') as arr_f:
+                        np.lib.format.write_array(arr_f, arr, allow_pickle=False)
+            self.chunk_nb += 1
+        self.buffer = []
+
+    def close(self):
+        self.flush()
 
 
 ## FUNCTIONS
@@ -153,23 +223,188 @@ def read_trc(trc_path):
     - tuple: A tuple containing the Q coordinates, frames column, time column, marker names, and header.
     '''
 
+    Q, frames, times, markers, header = read_trc_array(trc_path)
+    Q_coords = pd.DataFrame(Q.reshape(len(Q), -1), columns=np.repeat(markers, 3).tolist())
+    frames_col, time_col = pd.Series(frames, name='Frame#'), pd.Series(times, name='Time')
+
+    return Q_coords, frames_col, time_col, markers, header
+    
+
+def trc_cache_path(trc_path):
+    '''
+    Path of the binary sidecar of a TRC file: <trc_path>.npy
+
+    INPUTS:
+    - trc_path (str): The path to the TRC file.
+
+    OUTPUT:
+    - cache_path (str): The path to the sidecar file
+    '''
+
+    return str(trc_path) + '.npy'
+
+
+def load_trc_cache(trc_path, nb_cols, mmap=False, trc_stat=None):
+    '''
+    Load the numeric block of a TRC file from its binary sidecar.
+    The sidecar is only used if it was written for the current version of the TRC file, 
+    i.e. if its modification time is the one of the TRC file, 
+    and if the TRC file size stored in its first row is the current one.
+
+    INPUTS:
+    - trc_path (str): The path to the TRC file.
+    - nb_cols: expected number of columns (2 + 3*n_markers)
+    - mmap: if True, memory-map the sidecar (copy-on-write) instead of loading it
+    - trc_stat: os.stat_result of the TRC file, stat'ed again if None
+
+    OUTPUT:
+    - data: array of shape (n_frames, nb_cols), or None if there is no valid sidecar
+    '''
+
+    cache_path = trc_cache_path(trc_path)
     try:
-        with open(trc_path, 'r') as trc_file:
+        trc_stat = os.stat(trc_path) if trc_stat is None else trc_stat
+        if os.stat(cache_path).st_mtime_ns != trc_stat.st_mtime_ns:
+            return None
+        data = np.load(cache_path, mmap_mode='c' if mmap else None, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if data.ndim != 2 or data.shape[1] != nb_cols or len(data) == 0 or data[0,0] != trc_stat.st_size:
+        return None
+
+    return data[1:]
+
+
+def save_trc_cache(trc_path, data, trc_stat=None):
+    '''
+    Save the numeric block of a TRC file to its binary sidecar, 
+    below a first row holding the size of the TRC file, 
+    and give it the modification time of the TRC file.
+    Fails silently if the folder is not writable.
+
+    INPUTS:
+    - trc_path (str): The path to the TRC file.
+    - data: array of shape (n_frames, 2 + 3*n_markers), as parsed from the TRC file
+    - trc_stat: os.stat_result of the TRC file when it was parsed, stat'ed again if None
+
+    OUTPUT:
+    - <trc_path>.npy sidecar file
+    '''
+
+    cache_path = trc_cache_path(trc_path)
+    try:
+        trc_stat = os.stat(trc_path) if trc_stat is None else trc_stat
+        stamp = np.full((1, data.shape[1]), np.nan)
+        stamp[0,0] = trc_stat.st_size
+        np.save(cache_path, np.vstack([stamp, data]), allow_pickle=False)
+        os.utime(cache_path, ns=(trc_stat.st_mtime_ns, trc_stat.st_mtime_ns))
+    except OSError:
+        pass
+
+
+def read_trc_array(trc_path, cache=True, mmap=False):
+    '''
+    Read a TRC file in a single pass: the 5 header lines, 
+    then the whole numeric block parsed at once into a NumPy array.
+    The parsed block is stored in a <trc_path>.npy sidecar, 
+    so that the next reads of an unmodified file skip parsing.
+
+    INPUTS:
+    - trc_path (str): The path to the TRC file.
+    - cache: if True, use and refresh the binary sidecar
+    - mmap: if True, memory-map the sidecar (copy-on-write) instead of loading it
+
+    OUTPUTS:
+    - Q: array of shape (n_frames, n_markers, 3). Missing values are nan
+    - frames: array of shape (n_frames,). Frame numbers, as integers if they all are
+    - times: array of shape (n_frames,). Times in seconds
+    - markers: list of marker names
+    - header: list of the 5 header lines, with their line breaks
+    '''
+
+    try:
+        with open(trc_path, 'r', encoding='utf-8') as trc_file:
+            trc_stat = os.fstat(trc_file.fileno())
             header = [next(trc_file) for _ in range(5)]
-        markers = header[3].split('\t')[2::3]
-        markers = [m.strip() for m in markers if m.strip()] # remove last \n character
-       
-        trc_df = pd.read_csv(trc_path, sep="\t", skiprows=4, encoding='utf-8')
-        frames_col, time_col = trc_df.iloc[:, 0], trc_df.iloc[:, 1]
-        Q_coords = trc_df.drop(trc_df.columns[[0, 1]], axis=1)
-        Q_coords = Q_coords.loc[:, ~Q_coords.columns.str.startswith('Unnamed')] # remove unnamed columns
-        Q_coords.columns = np.array([[m,m,m] for m in markers]).ravel().tolist()
+            markers = [m.strip() for m in header[3].split('\t')[2::3] if m.strip()]
+            nb_cols = 2 + 3*len(markers)
+            data = load_trc_cache(trc_path, nb_cols, mmap=mmap, trc_stat=trc_stat) if cache else None
+            if data is None:
+                try:
+                    data = pd.read_csv(trc_file, sep='\t', header=None, dtype=float, engine='c').to_numpy()
+                except pd.errors.EmptyDataError:
+                    data = np.empty((0, nb_cols))
+                if data.shape[1] < nb_cols: # trailing empty fields
+                    data = np.hstack([data, np.full((len(data), nb_cols - data.shape[1]), np.nan)])
+                data = np.ascontiguousarray(data[:, :nb_cols])
+                if cache:
+                    save_trc_cache(trc_path, data, trc_stat=trc_stat)
+
+        Q = data[:, 2:].reshape(len(data), len(markers), 3)
+        frames = data[:,0]
+        if np.all(np.isfinite(frames) & (frames == np.round(frames))):
+            frames = frames.astype(np.int64)
+
+        return Q, frames, data[:,1], markers, header
 
-        return Q_coords, frames_col, time_col, markers, header
-    
     except Exception as e:
         raise ValueError(f"Error reading TRC file at {trc_path}: {e}")
-    
+
+
+def trc_rows(frames, times, Q, float_format='%.10g', chunk_size=10000):
+    '''
+    Format the rows of a TRC file by chunks, with a single preformatted string per chunk.
+    Nan are written as empty fields.
+
+    INPUTS:
+    - frames: array of shape (n_frames,). Frame numbers
+    - times: array of shape (n_frames,). Times in seconds
+    - Q: array of shape (n_frames, n_markers, 3), or (n_frames, 3*n_markers)
+    - float_format: format of the times and coordinates
+    - chunk_size: number of rows formatted at once
+
+    OUTPUT:
+    - generator of strings, each holding chunk_size rows
+    '''
+
+    data = np.column_stack([frames, times, np.asarray(Q, dtype=float).reshape(len(Q), -1)])
+    row_format = '\t'.join(['%d', float_format] + [float_format]*(data.shape[1]-2)) + '\n'
+    frames_are_int = np.all(np.isfinite(data[:,0]) & (data[:,0] == np.round(data[:,0])))
+    if not frames_are_int:
+        row_format = row_format.replace('%d', float_format, 1)
+
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start+chunk_size]
+        yield ((row_format * len(chunk)) % tuple(chunk.ravel())).replace('nan', '')
+
+
+def write_trc_array(trc_path, header, frames, times, Q, float_format='%.10g', chunk_size=10000):
+    '''
+    Write a TRC file from NumPy arrays, with rows formatted by chunks.
+    A binary sidecar left by a previous version of the file is removed.
+
+    INPUTS:
+    - trc_path (str): The path of the output TRC file
+    - header: list of the 5 header lines, with their line breaks
+    - frames: array of shape (n_frames,). Frame numbers
+    - times: array of shape (n_frames,). Times in seconds
+    - Q: array of shape (n_frames, n_markers, 3), or (n_frames, 3*n_markers)
+    - float_format: format of the times and coordinates
+    - chunk_size: number of rows formatted at once
+
+    OUTPUT:
+    - TRC file
+    '''
+
+    with open(trc_path, 'w') as trc_o:
+        trc_o.writelines(header)
+        trc_o.writelines(trc_rows(frames, times, Q, float_format=float_format, chunk_size=chunk_size))
+
+    try:
+        os.remove(trc_cache_path(trc_path))
+    except OSError:
+        pass
+
 
 def extract_trc_data(trc_path):
     '''
@@ -183,14 +418,8 @@ def extract_trc_data(trc_path):
     - marker_coords: Array of marker coordinates (n_frames, t+3*n_markers)
     '''
 
-    # marker names
-    with open(trc_path, 'r') as file:
-        lines = file.readlines()
-        marker_names_line = lines[3]
-        marker_names = marker_names_line.strip().split('\t')[2::3]
-
-    # time and marker coordinates
-    trc_data_np = np.genfromtxt(trc_path, skip_header=5, delimiter = '\t')[:,1:] 
+    Q, _, times, marker_names, _ = read_trc_array(trc_path)
+    trc_data_np = np.column_stack([times, Q.reshape(len(Q), -1)])
 
     return marker_names, trc_data_np
 
@@ -207,6 +436,246 @@ def common_items_in_list(list1, list2):
     return False
 
 
+def pose_bulk_file(json_dir):
+    '''
+    Find the bulk pose file (see BulkPoseWriter) standing for a json directory.
+    Example: pose/cam01_json -> pose/cam01_json.jsonl or pose/cam01_json.npz
+
+    INPUT:
+    - json_dir: str. Path of the json directory
+
+    OUTPUT:
+    - bulk_path: str. Path of the bulk file, or None if there is none
+    '''
+
+    for ext in ('.jsonl', '.npz'):
+        if os.path.isfile(json_dir + ext):
+            return json_dir + ext
+    return None
+
+
+@lru_cache(maxsize=16)
+def _read_pose_bulk(bulk_path, mtime_ns, size):
+    '''
+    Read all frames of a bulk pose file once 
+    (cached until the file is modified, i.e. until its modification time or its size changes).
+
+    OUTPUT:
+    - poses: dict. Virtual json file name -> (persons, keypoints, 3) array of x, y, score
+    '''
+
+    prefix = os.path.basename(bulk_path).rsplit('_json', 1)[0]
+    poses = {}
+    if bulk_path.endswith('.jsonl'):
+        with open(bulk_path, 'r') as bulk_f:
+            for line in bulk_f:
+                if not line.strip(): continue
+                frame_data = json.loads(line)
+                people = np.array(frame_data['people'], dtype=float)
+                poses[f'{prefix}_{frame_data["frame"]:06d}.json'] = people.reshape(len(people), -1, 3) if len(people) > 0 else np.empty((0,0,3))
+    else:
+        with np.load(bulk_path) as bulk_f:
+            chunks = sorted({k.split('_')[0] for k in bulk_f.files})
+            for chunk in chunks:
+                frames, nb_persons = bulk_f[f'{chunk}_frames'], bulk_f[f'{chunk}_nb_persons']
+                keypoints = np.split(bulk_f[f'{chunk}_keypoints'].astype(float), np.cumsum(nb_persons)[:-1])
+                for f, people in zip(frames, keypoints):
+                    poses[f'{prefix}_{f:06d}.json'] = people
+    return poses
+
+
+def read_pose_bulk(bulk_path):
+    '''
+    Read all frames of a bulk pose file written by BulkPoseWriter ('jsonl' or 'npz').
+
+    INPUT:
+    - bulk_path: str. Path of the bulk file
+
+    OUTPUT:
+    - poses: dict. Virtual json file name (<cam>_<frame>.json) -> (persons, keypoints, 3) array of x, y, score
+    '''
+
+    bulk_stat = os.stat(bulk_path)
+    return _read_pose_bulk(bulk_path, bulk_stat.st_mtime_ns, bulk_stat.st_size)
+
+
+def sync_json_name(j_file, offset):
+    '''
+    Name of a json file once its frame number is shifted by a synchronization offset.
+    Example: cam01_000012.json with offset 2 -> cam01_000010.json
+
+    INPUTS:
+    - j_file: str. Name of the json file
+    - offset: int. Synchronization offset of its camera, in frames
+
+    OUTPUT:
+    - json_offset_name: str. New name, or None if the shifted frame number is not positive
+    '''
+
+    j_split = re.split(r'(\d+)', j_file)
+    j_split[-2] = f'{int(j_split[-2])-offset:06d}'
+    if int(j_split[-2]) <= 0:
+        return None
+    return ''.join(j_split)
+
+
+@lru_cache(maxsize=4)
+def _read_sync_manifest(manifest_path, mtime_ns):
+    '''
+    Read a synchronization manifest once (cached until the file is modified).
+
+    OUTPUT:
+    - manifest: dict. Json directory name -> (absolute source directory, offset)
+    '''
+
+    manifest_dir = os.path.dirname(manifest_path)
+    manifest = {}
+    for json_dir_name, cam_sync in toml.load(manifest_path).items():
+        source_dir = os.path.abspath(os.path.join(manifest_dir, cam_sync['source']))
+        manifest[json_dir_name] = (source_dir, int(cam_sync['offset']))
+    return manifest
+
+
+def read_sync_manifest(pose_sync_dir):
+    '''
+    Read the synchronization manifest of a pose-sync directory, written by
+    synchronize_cams_all when sync_output = 'manifest'.
+
+    INPUT:
+    - pose_sync_dir: str. Path of the pose-sync directory
+
+    OUTPUT:
+    - manifest: dict. Json directory name -> (absolute source directory, offset). Empty if there is no manifest
+    '''
+
+    manifest_path = os.path.join(pose_sync_dir, sync_manifest_name)
+    if not os.path.isfile(manifest_path):
+        return {}
+    return _read_sync_manifest(manifest_path, os.stat(manifest_path).st_mtime_ns)
+
+
+@lru_cache(maxsize=64)
+def _sync_json_names(source_dir, offset, source_mtime_ns):
+    '''
+    Synchronized json file name -> source json file name, for one camera
+    '''
+
+    sync_names = {}
+    for j_file in list_json_files(source_dir):
+        json_offset_name = sync_json_name(j_file, offset)
+        if json_offset_name is not None:
+            sync_names[json_offset_name] = j_file
+    return sync_names
+
+
+def sync_json_names(json_dir):
+    '''
+    Resolve the json files of a camera listed in a synchronization manifest.
+
+    INPUT:
+    - json_dir: str. Path of the json directory in pose-sync (it does not need to exist)
+
+    OUTPUT:
+    - source_dir: str. Path of the source json directory, or None if the camera is not in a manifest
+    - sync_names: dict. Synchronized json file name -> source json file name
+    '''
+
+    manifest = read_sync_manifest(os.path.dirname(json_dir))
+    if os.path.basename(json_dir) not in manifest:
+        return None, {}
+    source_dir, offset = manifest[os.path.basename(json_dir)]
+    source_path = source_dir if os.path.isdir(source_dir) else pose_bulk_file(source_dir)
+    if source_path is None:
+        raise FileNotFoundError(f'No json files found in {source_dir}, which {json_dir} is synchronized from.')
+    return source_dir, _sync_json_names(source_dir, offset, os.stat(source_path).st_mtime_ns)
+
+
+def list_json_dirs(pose_dir):
+    '''
+    List the per-camera json directories of a pose directory.
+    Bulk pose files (cam01_json.jsonl, cam01_json.npz) are listed as if they were directories (cam01_json),
+    and so are the cameras of a synchronization manifest.
+
+    INPUT:
+    - pose_dir: str. Path of the pose directory
+
+    OUTPUT:
+    - json_dirs_names: list of str. Unsorted names of json directories
+    '''
+
+    json_dirs_names = [d for d in next(os.walk(pose_dir))[1] if 'json' in d]
+    for f in os.listdir(pose_dir):
+        for ext in ('.jsonl', '.npz'):
+            if f.endswith(ext) and 'json' in f[:-len(ext)] and f[:-len(ext)] not in json_dirs_names:
+                json_dirs_names.append(f[:-len(ext)])
+    json_dirs_names += [d for d in read_sync_manifest(pose_dir) if d not in json_dirs_names]
+    return json_dirs_names
+
+
+def list_json_files(json_dir):
+    '''
+    List the json files of a json directory, or of the synchronization manifest
+    or bulk pose file standing for it.
+    Raises FileNotFoundError if none exist.
+
+    INPUT:
+    - json_dir: str. Path of the json directory
+
+    OUTPUT:
+    - json_files_names: list of str. Unsorted names of json files
+    '''
+
+    if os.path.isdir(json_dir):
+        return fnmatch.filter(os.listdir(json_dir), '*.json')
+    source_dir, sync_names = sync_json_names(json_dir)
+    if source_dir is not None:
+        return list(sync_names.keys())
+    bulk_path = pose_bulk_file(json_dir)
+    if bulk_path is None:
+        raise FileNotFoundError(f'No json files found in {json_dir}.')
+    return list(read_pose_bulk(bulk_path).keys())
+
+
+def read_pose_json(js_file):
+    '''
+    Read an OpenPose json file.
+    If the file does not exist, it is looked for through the synchronization manifest
+    or in the bulk pose file standing for its directory.
+    Raises FileNotFoundError if it cannot be found.
+
+    INPUT:
+    - js_file: str. Path of the json file
+
+    OUTPUT:
+    - js: dict. OpenPose json content
+    '''
+
+    if os.path.isfile(js_file):
+        with open(js_file, 'r') as json_f:
+            return json.load(json_f)
+
+    source_dir, sync_names = sync_json_names(os.path.dirname(js_file))
+    if source_dir is not None:
+        if os.path.basename(js_file) not in sync_names:
+            raise FileNotFoundError(f'{js_file} not found.')
+        return read_pose_json(os.path.join(source_dir, sync_names[os.path.basename(js_file)]))
+
+    bulk_path = pose_bulk_file(os.path.dirname(js_file))
+    if bulk_path is None or os.path.basename(js_file) not in read_pose_bulk(bulk_path):
+        raise FileNotFoundError(f'{js_file} not found.')
+    people = read_pose_bulk(bulk_path)[os.path.basename(js_file)]
+    js = {'version': 1.3, 'people': [{'person_id': [-1],
+                                      'pose_keypoints_2d': p.ravel().tolist(),
+                                      'face_keypoints_2d': [],
+                                      'hand_left_keypoints_2d': [],
+                                      'hand_right_keypoints_2d': [],
+                                      'pose_keypoints_3d': [],
+                                      'face_keypoints_3d': [],
+                                      'hand_left_keypoints_3d': [],
+                                      'hand_right_keypoints_3d': []} for p in people]}
+    return js
+
+
 def bounding_boxes(js_file, margin_percent=0.1, around='extremities'):
     '''
     Compute the bounding boxes of the people in the json file.
@@ -223,26 +692,25 @@ def bounding_boxes(js_file, margin_percent=0.1, around='extremities'):
     '''
 
     bounding_boxes = []
-    with open(js_file, 'r') as json_f:
-        js = json.load(json_f)
-        for people in range(len(js['people'])):
-            if len(js['people'][people]['pose_keypoints_2d']) < 3: continue
-            else:
-                x = js['people'][people]['pose_keypoints_2d'][0::3]
-                y = js['people'][people]['pose_keypoints_2d'][1::3]
-                x_min, x_max = min(x), max(x)
-                y_min, y_max = min(y), max(y)
-
-                if around == 'extremities':
-                    dx = (x_max - x_min) * margin_percent
-                    dy = (y_max - y_min) * margin_percent
-                    bounding_boxes.append([x_min-dx, y_min-dy, x_max+dx, y_max+dy])
-                
-                elif around == 'center':
-                    x_mean, y_mean = np.mean(x), np.mean(y)
-                    x_size = (x_max - x_min) * (1 + margin_percent)
-                    y_size = (y_max - y_min) * (1 + margin_percent)
-                    bounding_boxes.append([x_mean - x_size/2, y_mean - y_size/2, x_mean + x_size/2, y_mean + y_size/2])
+    js = read_pose_json(js_file)
+    for people in range(len(js['people'])):
+        if len(js['people'][people]['pose_keypoints_2d']) < 3: continue
+        else:
+            x = js['people'][people]['pose_keypoints_2d'][0::3]
+            y = js['people'][people]['pose_keypoints_2d'][1::3]
+            x_min, x_max = min(x), max(x)
+            y_min, y_max = min(y), max(y)
+
+            if around == 'extremities':
+                dx = (x_max - x_min) * margin_percent
+                dy = (y_max - y_min) * margin_percent
+                bounding_boxes.append([x_min-dx, y_min-dy, x_max+dx, y_max+dy])
+            
+            elif around == 'center':
+                x_mean, y_mean = np.mean(x), np.mean(y)
+                x_size = (x_max - x_min) * (1 + margin_percent)
+                y_size = (y_max - y_min) * (1 + margin_percent)
+                bounding_boxes.append([x_mean - x_size/2, y_mean - y_size/2, x_mean + x_size/2, y_mean + y_size/2])
 
     return bounding_boxes   
 
@@ -9,7 +9,8 @@
 
 Filter trc 3D coordinates.
 
-Available filters: Butterworth, Butterworth on speed, Gaussian, LOESS, Median, Kalman
+Available filters: Butterworth, Butterworth on speed, Gaussian, LOESS, Median, Kalman, One-Euro
+Causal filters for real-time use: Butterworth, Kalman, One-Euro (stream_filter_from_config)
 Set your parameters in Config.toml
     
 INPUTS: 
@@ -24,21 +25,22 @@ OUTPUT:
 ## INIT
 import os
 import glob
+import math
+import time
 import fnmatch
 import numpy as np
 import pandas as pd
 import cv2
 import matplotlib.pyplot as plt
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from abc import ABC, abstractmethod
 
-from scipy import signal
+from scipy import signal, linalg
 from scipy.ndimage import gaussian_filter1d
-from statsmodels.nonparametric.smoothers_lowess import lowess
-from filterpy.kalman import KalmanFilter, rts_smoother
-from filterpy.common import Q_discrete_white_noise
 
 from Pose2Sim.common import plotWindow
-from Pose2Sim.common import convert_to_c3d
+from Pose2Sim.common import convert_to_c3d, read_trc_array, write_trc_array
 
 ## AUTHORSHIP INFORMATION
 __author__ = "David Pagnon"
@@ -51,8 +53,308 @@ __email__ = "contact@david-pagnon.com"
 __status__ = "Development"
 
 
+## CLASSES
+class StreamFilter(ABC):
+    '''
+    Base class of causal filters, for real-time use.
+    Frames are pushed one at a time and filtered in constant time.
+    Each coordinate is an independent channel. Nan or zero values are missing: 
+    they return nan, and the channel is reinitialized when values come back,
+    as the offline filters restart on each segment of valid values.
+
+    USAGE:
+    stream_filter = stream_filter_from_config(config_dict, frame_rate)
+    for frame in frames: # frame: array of shape (markers, 3), for example
+        frame_filt = stream_filter.push(frame)
+    '''
+
+    def __init__(self):
+        self.active = None # channels with a valid filter state
+
+    def push(self, frame):
+        '''
+        Filter one frame.
+
+        INPUT:
+        - frame: array of any shape, the same for all frames
+
+        OUTPUT:
+        - frame_filt: filtered array of the same shape
+        '''
+
+        frame = np.asarray(frame, dtype=float)
+        values = frame.ravel()
+        valid = ~np.isnan(values) & (values != 0)
+        if self.active is None:
+            self.allocate(len(values))
+            self.active = np.zeros(len(values), dtype=bool)
+
+        new = valid & ~self.active
+        if new.any():
+            self.reset(np.flatnonzero(new), values[new])
+        self.active = valid
+
+        values_filt = np.full(len(values), np.nan)
+        ids = np.flatnonzero(valid)
+        if len(ids):
+            values_filt[ids] = self.step(ids, values[ids])
+        return values_filt.reshape(frame.shape)
+
+    @abstractmethod
+    def allocate(self, nb_channels):
+        '''Create the filter states of nb_channels channels (int), once, on the first frame.'''
+
+    @abstractmethod
+    def reset(self, ids, values):
+        '''Initialize the states of the channels ids (int array of shape (n,)) on their first valid values (float array of shape (n,)).'''
+
+    @abstractmethod
+    def step(self, ids, values):
+        '''Advance the channels ids (int array of shape (n,)) with their new values (float array of shape (n,)), and return their filtered values (float array of shape (n,)).'''
+
+
+class ButterworthStream(StreamFilter):
+    '''
+    Causal Butterworth filter in second-order sections (single pass, hence with a phase lag).
+    Same design as the offline filter for a given order and cut-off frequency.
+    Channels start in the steady state of their first value, to avoid a transient.
+
+    INPUTS:
+    - frame_rate: int
+    - order: int
+    - cut_off_frequency: int
+    - pass_type: 'low' or 'high'
+    '''
+
+    def __init__(self, frame_rate, order, cut_off_frequency, pass_type='low'):
+        super().__init__()
+        self.sos = signal.butter(int(order/2), cut_off_frequency/(frame_rate/2), pass_type, analog = False, output='sos')
+        self.zi = signal.sosfilt_zi(self.sos) # (sections, 2), for a unit step
+
+    def allocate(self, nb_channels):
+        self.z = np.zeros((len(self.sos), nb_channels, 2))
+
+    def reset(self, ids, values):
+        self.z[:, ids, :] = self.zi[:, np.newaxis, :] * values[np.newaxis, :, np.newaxis]
+
+    def step(self, ids, values):
+        # transposed direct form II, as in signal.sosfilt
+        x = values
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            z0, z1 = self.z[s, ids, 0], self.z[s, ids, 1]
+            y = b0*x + z0
+            self.z[s, ids, 0] = b1*x - a1*y + z1
+            self.z[s, ids, 1] = b2*x - a2*y
+            x = y
+        return x
+
+
+class KalmanStream(StreamFilter):
+    '''
+    One-pass Kalman filter, assuming a constant acceleration process.
+    Same model as the offline Kalman filter, without the backward smoothing pass.
+
+    INPUTS:
+    - frame_rate: int
+    - trust_ratio: int, ratio process_noise/measurement_noise
+    - nb_derivatives: int, number of derivatives (3 if constant acceleration model)
+    - steady_state: bool. Use constant steady-state gains instead of propagating covariances
+    '''
+
+    def __init__(self, frame_rate, trust_ratio, nb_derivatives=3, steady_state=False):
+        super().__init__()
+        self.measurement_noise = 20
+        self.F, self.H, self.Q, self.R = kalman_model(frame_rate, self.measurement_noise, self.measurement_noise*trust_ratio, nb_derivatives)
+        self.nb_derivatives = nb_derivatives
+        self.steady_state = steady_state
+        if steady_state:
+            P_prior = linalg.solve_discrete_are(self.F.T, self.H[:,np.newaxis], self.Q, np.array([[self.R]]))
+            self.K = P_prior @ self.H / (self.H @ P_prior @ self.H + self.R)
+
+    def allocate(self, nb_channels):
+        self.x = np.zeros((nb_channels, self.nb_derivatives))
+        if not self.steady_state:
+            self.P = np.zeros((nb_channels, self.nb_derivatives, self.nb_derivatives))
+
+    def reset(self, ids, values):
+        self.x[ids] = 0
+        self.x[ids, 0] = values
+        if not self.steady_state:
+            self.P[ids] = np.eye(self.nb_derivatives) * self.measurement_noise
+
+    def step(self, ids, values):
+        # predict
+        x = self.x[ids] @ self.F.T
+        if self.steady_state:
+            K = self.K
+        else:
+            P = self.F @ self.P[ids] @ self.F.T + self.Q
+            K = P[:,:,0] / (P[:,0,0] + self.R)[:,np.newaxis]
+        # update
+        x += (values - x[:,0])[:,np.newaxis] * K
+        self.x[ids] = x
+        if not self.steady_state:
+            IKH = np.eye(self.nb_derivatives) - K[:,:,np.newaxis] * self.H[np.newaxis,np.newaxis,:]
+            self.P[ids] = IKH @ P @ IKH.transpose(0,2,1) + K[:,:,np.newaxis] * K[:,np.newaxis,:] * self.R # Joseph form
+        return x[:,0]
+
+
+class OneEuroStream(StreamFilter):
+    '''
+    One-Euro filter: a first-order low-pass filter whose cut-off frequency 
+    increases with speed. Smooth when still, low lag when moving fast.
+    Casiez et al. (2012), https://gery.casiez.net/1euro/
+
+    INPUTS:
+    - frame_rate: int
+    - min_cutoff: float. Cut-off frequency at rest (Hz)
+    - beta: float. Increase of the cut-off frequency with speed (Hz per m/s)
+    - d_cutoff: float. Cut-off frequency of the speed estimate (Hz)
+    '''
+
+    def __init__(self, frame_rate, min_cutoff=3, beta=5, d_cutoff=1):
+        super().__init__()
+        self.frame_rate = frame_rate
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.alpha_d = self.alpha(d_cutoff)
+
+    def alpha(self, cutoff):
+        tau = 1 / (2*np.pi*cutoff)
+        return 1 / (1 + tau*self.frame_rate)
+
+    def allocate(self, nb_channels):
+        self.x = np.zeros(nb_channels)
+        self.dx = np.zeros(nb_channels)
+
+    def reset(self, ids, values):
+        self.x[ids] = values
+        self.dx[ids] = 0
+
+    def step(self, ids, values):
+        x_prev = self.x[ids]
+        dx = self.dx[ids] + self.alpha_d * ((values - x_prev)*self.frame_rate - self.dx[ids])
+        x = x_prev + self.alpha(self.min_cutoff + self.beta*np.abs(dx)) * (values - x_prev)
+        self.x[ids], self.dx[ids] = x, dx
+        return x
+
+
 ## FUNCTIONS
-def kalman_filter(coords, frame_rate, measurement_noise, process_noise, nb_dimensions=3, nb_derivatives=3, smooth=True):
+def kalman_model(frame_rate, measurement_noise, process_noise, nb_derivatives=3):
+    '''
+    Matrices of a 1D Kalman filter observing position only.
+    Same model as filterpy with Q_discrete_white_noise.
+    A 3D state per marker is block diagonal with three such blocks, 
+    so it can be filtered as three independent series.
+
+    INPUTS:
+    - frame_rate: integer
+    - measurement_noise: integer
+    - process_noise: integer
+    - nb_derivatives: integer, 2 (constant velocity), 3 (constant acceleration), or 4 (constant jerk)
+
+    OUTPUTS:
+    - F: state transition matrix (nb_derivatives, nb_derivatives)
+    - H: measurement vector (nb_derivatives,)
+    - Q: process noise matrix (nb_derivatives, nb_derivatives)
+    - R: measurement noise variance
+    '''
+
+    if nb_derivatives not in (2, 3, 4):
+        raise ValueError('nb_derivatives must be 2, 3, or 4')
+    dt = 1/frame_rate
+
+    # F = [[1, dt, dt**2/2], 
+    #      [0, 1,  dt     ],
+    #      [0, 0,  1      ]]
+    F = np.zeros((nb_derivatives, nb_derivatives))
+    for i in range(nb_derivatives):
+        for j in range(i+1):
+            F[j,i] = dt**(i-j) / math.factorial(i-j)
+
+    H = np.zeros(nb_derivatives)
+    H[0] = 1
+
+    # discrete white noise on the highest derivative
+    if nb_derivatives == 2:
+        g = np.array([dt**2/2, dt])
+    else:
+        g = np.array([dt**k / math.factorial(k) for k in range(nb_derivatives-1, -1, -1)])
+    Q = np.outer(g, g) * process_noise**2
+
+    R = measurement_noise**2
+
+    return F, H, Q, R
+
+
+def kalman_smoother_batch(Z, frame_rate, measurement_noise, process_noise, nb_derivatives=3, smooth=True, steady_state=False):
+    '''
+    Kalman filter or Rauch-Tung-Striebel smoother of many independent series at once.
+    All series share the same model and have no missing values, 
+    so covariances and gains are computed once and only the state means are per series.
+
+    INPUTS:
+    - Z: array of shape (nframes, nseries), without nan
+    - frame_rate: integer
+    - measurement_noise: integer
+    - process_noise: integer
+    - nb_derivatives: integer, number of derivatives (3 if constant acceleration model)
+    - smooth: boolean. True if double pass (recommended), False if single pass (if real-time)
+    - steady_state: boolean. Use the steady-state gains of the Riccati equation 
+    instead of time-varying ones. Faster, slightly different on the first frames
+
+    OUTPUTS:
+    - Z_filt: filtered positions, array of shape (nframes, nseries)
+    '''
+
+    Z = np.asarray(Z, dtype=float)
+    nb_frames = len(Z)
+    if nb_frames == 0:
+        return Z.copy()
+    F, H, Q, R = kalman_model(frame_rate, measurement_noise, process_noise, nb_derivatives)
+    I = np.eye(nb_derivatives)
+
+    # Initial states: position, velocity, accel (finite differences, as in filterpy version)
+    x = np.zeros((Z.shape[1], nb_derivatives))
+    for n_der in range(min(nb_derivatives, nb_frames)):
+        x[:, n_der] = np.diff(Z, n=n_der, axis=0)[0]
+    P = I * measurement_noise
+
+    # Filter gains (shared by all series)
+    if steady_state:
+        P_prior_ss = linalg.solve_discrete_are(F.T, H[:,np.newaxis], Q, np.array([[R]]))
+        K_ss = P_prior_ss @ H / (H @ P_prior_ss @ H + R)
+        P_post_ss = (I - np.outer(K_ss, H)) @ P_prior_ss
+        K = np.broadcast_to(K_ss, (nb_frames, nb_derivatives))
+    else:
+        K = np.empty((nb_frames, nb_derivatives))
+        P_post = np.empty((nb_frames, nb_derivatives, nb_derivatives))
+        for t in range(nb_frames):
+            P = F @ P @ F.T + Q
+            K[t] = P @ H / (H @ P @ H + R)
+            IKH = I - np.outer(K[t], H)
+            P = IKH @ P @ IKH.T + np.outer(K[t], K[t]) * R # Joseph form
+            P_post[t] = P
+
+    # Forward pass: predict and update each frame
+    X = np.empty((nb_frames, Z.shape[1], nb_derivatives))
+    for t in range(nb_frames):
+        x = x @ F.T
+        x = x + (Z[t] - x[:,0])[:,np.newaxis] * K[t]
+        X[t] = x
+
+    # Backward pass: RTS smoother
+    if smooth:
+        if steady_state:
+            C_ss = P_post_ss @ F.T @ np.linalg.inv(F @ P_post_ss @ F.T + Q)
+        for t in range(nb_frames-2, -1, -1):
+            C = C_ss if steady_state else P_post[t] @ F.T @ np.linalg.inv(F @ P_post[t] @ F.T + Q)
+            X[t] = X[t] + (X[t+1] - X[t] @ F.T) @ C.T
+
+    return X[:,:,0]
+
+
+def kalman_filter(coords, frame_rate, measurement_noise, process_noise, nb_dimensions=3, nb_derivatives=3, smooth=True, steady_state=False):
     '''
     Filters coordinates with a Kalman filter or a Kalman smoother
     
@@ -64,259 +366,475 @@ def kalman_filter(coords, frame_rate, measurement_noise, process_noise, nb_dimen
     - nb_dimensions: integer, number of dimensions (3 if 3D coordinates)
     - nb_derivatives: integer, number of derivatives (3 if constant acceleration model)
     - smooth: boolean. True if souble pass (recommended), False if single pass (if real-time)
+    - steady_state: boolean. True to use precomputed steady-state gains
     
     OUTPUTS:
     - kpt_coords_filt: filtered coords
     '''
 
-    # Variables
-    dim_x = nb_dimensions * nb_derivatives # 9 state variables 
-    dt = 1/frame_rate
-    
-    # Filter definition
-    f = KalmanFilter(dim_x=dim_x, dim_z=nb_dimensions)
-
-    # States: initial position, velocity, accel, in 3D
-    def derivate_array(arr, dt=1):
-        return np.diff(arr, axis=0)/dt
-    def repeat(func, arg_func, nb_reps):
-        for i in range(nb_reps):
-            arg_func = func(arg_func)
-        return arg_func
-    x_init = []
-    for n_der in range(nb_derivatives):
-        x_init += [repeat(derivate_array, coords, n_der)[0]] # pose*3D, vel*3D, accel*3D
-    f.x = np.array(x_init).reshape(nb_dimensions,nb_derivatives).T.flatten() # pose, vel, accel *3D
-    
-    # State transition matrix
-    F_per_coord = np.zeros((int(dim_x/nb_dimensions), int(dim_x/nb_dimensions)))
-    for i in range(nb_derivatives):
-        for j in range(min(i+1, nb_derivatives)):
-            F_per_coord[j,i] = dt**(i-j) / np.math.factorial(i - j)
-    f.F = np.kron(np.eye(nb_dimensions),F_per_coord) 
-    # F_per_coord= [[1, dt, dt**2/2], 
-                 # [ 0, 1,  dt     ],
-                 # [ 0, 0,  1      ]])
-
-    # No control input
-    f.B = None 
-
-    # Measurement matrix (only positions)
-    H = np.zeros((nb_dimensions, dim_x)) 
-    for i in range(min(nb_dimensions,dim_x)):
-        H[i, int(i*(dim_x/nb_dimensions))] = 1
-    f.H = H
-    # H = [[1., 0., 0., 0., 0., 0., 0., 0., 0.],
-        # [0., 0., 0., 1., 0., 0., 0., 0., 0.],
-        # [0., 0., 0., 0., 0., 0., 1., 0., 0.]]
-
-    # Covariance matrix
-    f.P *= measurement_noise 
-
-    # Measurement noise
-    f.R = np.diag([measurement_noise**2]*nb_dimensions) 
-
-    # Process noise
-    f.Q = Q_discrete_white_noise(nb_derivatives, dt=dt, var=process_noise**2, block_size=nb_dimensions) 
-
-    # Run filter: predict and update for each frame
-    mu, cov, _, _ = f.batch_filter(coords) # equivalent to below
-    # mu = []
-    # for kpt_coord_frame in coords:
-        # f.predict()
-        # f.update(kpt_coord_frame)
-        # mu.append(f.x.copy())
-    ind_of_position = [int(d*(dim_x/nb_dimensions)) for d in range(nb_dimensions)]
-    coords_filt = np.array(mu)[:,ind_of_position]
-
-    # RTS smoother
-    if smooth == True:
-        mu2, P, C, _ = f.rts_smoother(mu, cov)
-        coords_filt = np.array(mu2)[:,ind_of_position]
+    # Dimensions are independent (block diagonal model): filter them as separate series
+    coords = np.asarray(coords, dtype=float).reshape(len(coords), nb_dimensions)
+    coords_filt = kalman_smoother_batch(coords, frame_rate, measurement_noise, process_noise, nb_derivatives=nb_derivatives, smooth=smooth, steady_state=steady_state)
 
     return coords_filt
 
 
-def kalman_filter_1d(config_dict, frame_rate, col):
+def segment_index(Q, zeros_missing=True):
+    '''
+    Find the contiguous segments of valid values, and group the columns 
+    which share the same segment, so that they can be filtered at once.
+    Computed once and shared by all filters. 
+    If Q is of shape (frames, markers, 3), x/y/z of a marker share the same gaps: 
+    a frame is valid only if all coordinates of the marker are valid.
+
+    INPUTS:
+    - Q: array of shape (frames, columns) or (frames, markers, 3)
+    - zeros_missing: bool. If True, zeros are considered missing, as well as NaN
+
+    OUTPUT:
+    - segments: dict. (start, end) -> list of column indices in Q.reshape(len(Q), -1)
     '''
-    1D Kalman filter
-    Deals with nans
+
+    Q = np.asarray(Q, dtype=float)
+    Q3d = Q.reshape(len(Q), Q.shape[1] if Q.ndim > 1 else 1, -1) if Q.ndim != 2 else Q[:,:,np.newaxis]
+    valid = ~np.isnan(Q3d)
+    if zeros_missing:
+        valid &= Q3d != 0
+    valid = np.all(valid, axis=2) # (frames, markers)
+    nb_coords = Q3d.shape[2]
+
+    edges = np.diff(np.pad(valid.astype(np.int8), ((1,1),(0,0))), axis=0)
+    start_markers, starts = np.nonzero(edges.T == 1)
+    _, ends = np.nonzero(edges.T == -1)
+
+    segments = {}
+    for marker, start, end in zip(start_markers, starts, ends):
+        segments.setdefault((int(start), int(end)), []).extend(range(marker*nb_coords, (marker+1)*nb_coords))
+    return segments
+
+
+def kalman_filter_array(Q, frame_rate, trust_ratio, smooth=True, steady_state=False, segments=None):
+    '''
+    1D Kalman filter or smoother of each column, on each segment of valid values.
+    All columns sharing the same segment are filtered at once. Deals with nans and zeros
     
-    INPUT:
-    - col: Pandas dataframe column
-    - trustratio: int, ratio process_noise/measurement_noise
+    INPUTS:
+    - Q: array of shape (frames, columns)
     - frame_rate: int
+    - trust_ratio: int, ratio process_noise/measurement_noise
     - smooth: boolean, True if double pass (recommended), False if single pass (if real-time)
+    - steady_state: boolean, True to use precomputed steady-state gains (faster)
+    - segments: segment index of Q (see segment_index). Computed if None
 
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - Q_filt: filtered array of shape (frames, columns)
     '''
 
-    trustratio = int(config_dict.get('filtering').get('kalman').get('trust_ratio'))
-    smooth = int(config_dict.get('filtering').get('kalman').get('smooth'))
     measurement_noise = 20
-    process_noise = measurement_noise * trustratio
-
-    # split into sequences of not nans
-    col_filtered = col.copy()
-    mask = np.isnan(col_filtered)  | col_filtered.eq(0)
-    falsemask_indices = np.where(~mask)[0]
-    gaps = np.where(np.diff(falsemask_indices) > 1)[0] + 1 
-    idx_sequences = np.split(falsemask_indices, gaps)
-    if idx_sequences[0].size > 0:
-        idx_sequences_to_filter = [seq for seq in idx_sequences]
-    
-        # Filter each of the selected sequences
-        for seq_f in idx_sequences_to_filter:
-            col_filtered[seq_f] = kalman_filter(col_filtered[seq_f], frame_rate, measurement_noise, process_noise, nb_dimensions=1, nb_derivatives=3, smooth=smooth).flatten()
+    process_noise = measurement_noise * trust_ratio
 
-    return col_filtered
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        Q_filt[start:end, cols] = kalman_smoother_batch(Q_filt[start:end, cols], frame_rate, measurement_noise, process_noise, nb_derivatives=3, smooth=smooth, steady_state=steady_state)
+    return Q_filt
 
 
-def butterworth_filter_1d(config_dict, frame_rate, col):
+def butterworth_sos(frame_rate, order, cut_off_frequency, pass_type='low'):
     '''
-    1D Zero-phase Butterworth filter (dual pass)
-    Deals with nans
+    Design a Butterworth filter in second-order sections, for dual pass filtering
 
-    INPUT:
-    - col: numpy array
+    INPUTS:
+    - frame_rate: int
+    - order: int. Order of the dual pass filter
+    - cut_off_frequency: int
+    - pass_type: 'low' or 'high'
+
+    OUTPUTS:
+    - sos: second-order sections
+    - padlen: padding length, as in signal.filtfilt with (b, a) coefficients
+    '''
+
+    sos = signal.butter(int(order/2), cut_off_frequency/(frame_rate/2), pass_type, analog = False, output='sos')
+    padlen = 3 * (int(order/2) + 1)
+    return sos, padlen
+
+
+def butterworth_filter_array(Q, frame_rate, order, cut_off_frequency, pass_type='low', segments=None):
+    '''
+    Zero-phase Butterworth filter (dual pass) of each column.
+    The filter is designed once, and all columns sharing the same segment 
+    of valid values are filtered at once. Deals with nans and zeros
+
+    INPUTS:
+    - Q: array of shape (frames, columns)
+    - frame_rate: int
     - order: int
-    - cutoff: int
+    - cut_off_frequency: int
+    - pass_type: 'low' or 'high'
+    - segments: segment index of Q (see segment_index). Computed if None
+
+    OUTPUT:
+    - Q_filt: filtered array of shape (frames, columns)
+    '''
+
+    sos, padlen = butterworth_sos(frame_rate, order, cut_off_frequency, pass_type)
+
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        if end - start > padlen:
+            Q_filt[start:end, cols] = signal.sosfiltfilt(sos, Q_filt[start:end, cols], axis=0, padlen=padlen)
+    return Q_filt
+
+
+def butterworth_on_speed_filter_array(Q, frame_rate, order, cut_off_frequency, pass_type='low', segments=None):
+    '''
+    Zero-phase Butterworth filter (dual pass) on the derivative of each column,
+    on each segment of valid values. Deals with nans and zeros
+
+    INPUTS:
+    - Q: array of shape (frames, columns)
     - frame_rate: int
+    - order: int
+    - cut_off_frequency: int
+    - pass_type: 'low' or 'high'
+    - segments: segment index of Q (see segment_index). Computed if None
 
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - Q_filt: filtered array of shape (frames, columns)
     '''
 
-    type = 'low' #config_dict.get('filtering').get('butterworth').get('type')
-    order = int(config_dict.get('filtering').get('butterworth').get('order'))
-    cutoff = int(config_dict.get('filtering').get('butterworth').get('cut_off_frequency'))    
+    sos, padlen = butterworth_sos(frame_rate, order, cut_off_frequency, pass_type)
 
-    b, a = signal.butter(order/2, cutoff/(frame_rate/2), type, analog = False) 
-    padlen = 3 * max(len(a), len(b))
-    
-    # split into sequences of not nans
-    col_filtered = col.copy()
-    mask = np.isnan(col_filtered)  | col_filtered.eq(0)
-    falsemask_indices = np.where(~mask)[0]
-    gaps = np.where(np.diff(falsemask_indices) > 1)[0] + 1 
-    idx_sequences = np.split(falsemask_indices, gaps)
-    if idx_sequences[0].size > 0:
-        idx_sequences_to_filter = [seq for seq in idx_sequences if len(seq) > padlen]
-    
-        # Filter each of the selected sequences
-        for seq_f in idx_sequences_to_filter:
-            col_filtered[seq_f] = signal.filtfilt(b, a, col_filtered[seq_f])
-    
-    return col_filtered
-    
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        if end - start < 2:
+            continue
+        Q_seg = Q_filt[start:end, cols]
+        Q_diff = np.diff(Q_seg, axis=0, prepend=np.nan) # derivative
+        Q_diff[0] = Q_diff[1]/2 # set first value correctly instead of nan
+        if end - start > padlen:
+            Q_diff = signal.sosfiltfilt(sos, Q_diff, axis=0, padlen=padlen)
+        Q_filt[start:end, cols] = np.cumsum(Q_diff, axis=0) + Q_seg[0] # integrate filtered derivative
+    return Q_filt
 
-def butterworth_on_speed_filter_1d(config_dict, frame_rate, col):
+
+def gaussian_filter_array(Q, sigma_kernel, segments=None):
     '''
-    1D zero-phase Butterworth filter (dual pass) on derivative
+    Gaussian filter of each column, on each segment of valid values. Deals with nans and zeros
 
-    INPUT:
-    - col: Pandas dataframe column
-    - frame rate, order, cut-off frequency, type (from Config.toml)
+    INPUTS:
+    - Q: array of shape (frames, columns)
+    - sigma_kernel: int. Standard deviation of the kernel
+    - segments: segment index of Q (see segment_index). Computed if None
 
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - Q_filt: filtered array of shape (frames, columns)
     '''
 
-    type = 'low' # config_dict.get('filtering').get('butterworth_on_speed').get('type')
-    order = int(config_dict.get('filtering').get('butterworth_on_speed').get('order'))
-    cutoff = int(config_dict.get('filtering').get('butterworth_on_speed').get('cut_off_frequency'))
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        Q_filt[start:end, cols] = gaussian_filter1d(Q_filt[start:end, cols], sigma_kernel, axis=0)
+    return Q_filt
 
-    b, a = signal.butter(order/2, cutoff/(frame_rate/2), type, analog = False)
-    padlen = 3 * max(len(a), len(b))
-    
-    # derivative
-    col_filtered = col.copy()
-    col_filtered_diff = col_filtered.diff()   # derivative
-    col_filtered_diff = col_filtered_diff.fillna(col_filtered_diff.iloc[1]/2) # set first value correctly instead of nan
-    
-    # split into sequences of not nans
-    mask = np.isnan(col_filtered_diff)  | col_filtered_diff.eq(0)
-    falsemask_indices = np.where(~mask)[0]
-    gaps = np.where(np.diff(falsemask_indices) > 1)[0] + 1 
-    idx_sequences = np.split(falsemask_indices, gaps)
-    if idx_sequences[0].size > 0:
-        idx_sequences_to_filter = [seq for seq in idx_sequences if len(seq) > padlen]
-    
-        # Filter each of the selected sequences
-        for seq_f in idx_sequences_to_filter:
-            col_filtered_diff[seq_f] = signal.filtfilt(b, a, col_filtered_diff[seq_f])
-    col_filtered = col_filtered_diff.cumsum() + col.iloc[0] # integrate filtered derivative
-    
-    return col_filtered
 
+def loess_smoother_batch(Y, nb_values_used):
+    '''
+    Local linear regression with tricube weights (LOWESS without robustness iterations),
+    of many series sampled at the same regular times, without missing values.
+    Same neighborhoods and weights as statsmodels lowess(it=0, delta=0), 
+    but all series are smoothed at once: the regression of each frame is a fixed 
+    linear combination of its k neighbors, which is applied to all columns.
+
+    INPUTS:
+    - Y: array of shape (frames, columns), without nan
+    - nb_values_used: window used for smoothing. frac = nb_values_used / frames
 
-def gaussian_filter_1d(config_dict, frame_rate, col):
+    OUTPUT:
+    - Y_filt: smoothed array of shape (frames, columns)
     '''
-    1D Gaussian filter
 
-    INPUT:
-    - col: Pandas dataframe column
-    - gaussian_filter_sigma_kernel: kernel size from Config.toml
+    Y = np.asarray(Y, dtype=float)
+    nb_frames = len(Y)
+    k = int(nb_values_used / nb_frames * nb_frames + 1e-10) # as statsmodels with frac = nb_values_used / nb_frames
+    k = min(max(k, 2), nb_frames)
+    if nb_frames < 2:
+        return Y.copy()
+
+    # k nearest neighbors of each frame (window start slides when past the middle of the window)
+    frames = np.arange(nb_frames)
+    left = np.clip(np.ceil(frames - k/2), 0, nb_frames-k).astype(int)
+    x = left[:,np.newaxis] + np.arange(k) # (frames, k)
+    radius = np.maximum(frames - left, left + k-1 - frames)
+
+    # tricube weights, then projection weights of the weighted linear regression
+    weights = (1 - (np.abs(x - frames[:,np.newaxis]) / radius[:,np.newaxis])**3)**3
+    reg_ok = np.sum(weights > 1e-12, axis=1) >= 2
+    weights /= weights.sum(axis=1, keepdims=True)
+    x_mean = np.sum(weights * x, axis=1, keepdims=True)
+    x_var = np.maximum(np.sum(weights * (x - x_mean)**2, axis=1, keepdims=True), 1e-12)
+    proj = weights * (1 + (frames[:,np.newaxis] - x_mean) * (x - x_mean) / x_var)
+    proj[~reg_ok] = 0
+    proj[~reg_ok, frames[~reg_ok] - left[~reg_ok]] = 1 # no regression: keep value
+
+    # apply to all columns at once
+    Y_filt = np.zeros_like(Y)
+    for j in range(k):
+        Y_filt += proj[:, j, np.newaxis] * Y[left + j]
+    return Y_filt
+
+
+def loess_filter_array(Q, nb_values_used, segments=None):
+    '''
+    LOWESS filter (Locally Weighted Scatterplot Smoothing) of each column, 
+    on each segment of valid values longer than the window. 
+    All columns sharing the same segment are smoothed at once. Deals with nans and zeros
+
+    INPUTS:
+    - Q: array of shape (frames, columns)
+    - nb_values_used: window used for smoothing. frac = nb_values_used / segment length
+    - segments: segment index of Q (see segment_index). Computed if None
 
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - Q_filt: filtered array of shape (frames, columns)
     '''
 
-    gaussian_filter_sigma_kernel = int(config_dict.get('filtering').get('gaussian').get('sigma_kernel'))
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        if end - start > nb_values_used:
+            Q_filt[start:end, cols] = loess_smoother_batch(Q_filt[start:end, cols], nb_values_used)
+    return Q_filt
 
-    col_filtered = gaussian_filter1d(col, gaussian_filter_sigma_kernel)
 
-    return col_filtered
-    
+def median_filter_array(Q, kernel_size, segments=None):
+    '''
+    Median filter of each column, on each segment of valid values 
+    at least as long as the kernel. Deals with nans and zeros
 
-def loess_filter_1d(config_dict, frame_rate, col):
+    INPUTS:
+    - Q: array of shape (frames, columns)
+    - kernel_size: int. Odd number of frames
+    - segments: segment index of Q (see segment_index). Computed if None
+
+    OUTPUT:
+    - Q_filt: filtered array of shape (frames, columns)
     '''
-    1D LOWESS filter (Locally Weighted Scatterplot Smoothing)
 
-    INPUT:
-    - col: Pandas dataframe column
-    - loess_filter_nb_values: window used for smoothing from Config.toml
-    frac = loess_filter_nb_values * frames_number
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        if end - start >= kernel_size:
+            Q_filt[start:end, cols] = signal.medfilt(Q_filt[start:end, cols], kernel_size=[kernel_size, 1])
+    return Q_filt
+
+
+def one_euro_filter_array(Q, frame_rate, min_cutoff=3, beta=5, d_cutoff=1, segments=None):
+    '''
+    One-Euro filter of each column (causal, single pass), restarted on each segment of valid values. 
+    Deals with nans and zeros
+
+    INPUTS:
+    - Q: array of shape (frames, columns)
+    - frame_rate: int
+    - min_cutoff: float. Cut-off frequency at rest (Hz)
+    - beta: float. Increase of the cut-off frequency with speed
+    - d_cutoff: float. Cut-off frequency of the speed estimate (Hz)
+    - segments: segment index of Q (see segment_index). Computed if None
 
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - Q_filt: filtered array of shape (frames, columns)
     '''
 
-    kernel = config_dict.get('filtering').get('LOESS').get('nb_values_used')
+    Q_filt = np.array(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q_filt)
+    for (start, end), cols in segments.items():
+        stream_filter = OneEuroStream(frame_rate, min_cutoff, beta, d_cutoff)
+        Q_filt[start:end, cols] = [stream_filter.push(frame) for frame in Q_filt[start:end, cols]]
+    return Q_filt
 
-    col_filtered = col.copy()
-    mask = np.isnan(col_filtered) 
-    falsemask_indices = np.where(~mask)[0]
-    gaps = np.where(np.diff(falsemask_indices) > 1)[0] + 1 
-    idx_sequences = np.split(falsemask_indices, gaps)
-    if idx_sequences[0].size > 0:
-        idx_sequences_to_filter = [seq for seq in idx_sequences if len(seq) > kernel]
-    
-        # Filter each of the selected sequences
-        for seq_f in idx_sequences_to_filter:
-            col_filtered[seq_f] = lowess(col_filtered[seq_f], seq_f, is_sorted=True, frac=kernel/len(seq_f), it=0)[:,1]
 
-    return col_filtered
-    
+def filter_params_from_config(config_dict, filter_type):
+    '''
+    Read the parameters of a filter from Config.toml, once for all columns
 
-def median_filter_1d(config_dict, frame_rate, col):
+    INPUTS:
+    - config_dict: dictionary of Config.toml parameters
+    - filter_type: 'kalman', 'butterworth', 'butterworth_on_speed', 'gaussian', 'LOESS', 'median', or 'one_euro'
+
+    OUTPUT:
+    - filter_params: dict of keyword arguments of the filter function
     '''
-    1D median filter
 
-    INPUT:
-    - col: Pandas dataframe column
-    - median_filter_kernel_size: kernel size from Config.toml
-    
+    filter_config = config_dict.get('filtering').get(filter_type)
+    if filter_type == 'kalman':
+        return {'trust_ratio': int(filter_config.get('trust_ratio')), 'smooth': int(filter_config.get('smooth')), 'steady_state': filter_config.get('steady_state', False)}
+    elif filter_type in ('butterworth', 'butterworth_on_speed'):
+        return {'order': int(filter_config.get('order')), 'cut_off_frequency': int(filter_config.get('cut_off_frequency'))}
+    elif filter_type == 'gaussian':
+        return {'sigma_kernel': int(filter_config.get('sigma_kernel'))}
+    elif filter_type == 'LOESS':
+        return {'nb_values_used': filter_config.get('nb_values_used')}
+    elif filter_type == 'median':
+        return {'kernel_size': filter_config.get('kernel_size')}
+    elif filter_type == 'one_euro':
+        return {'min_cutoff': filter_config.get('min_cutoff'), 'beta': filter_config.get('beta'), 'd_cutoff': filter_config.get('d_cutoff')}
+    raise ValueError(f'Unknown filter type: {filter_type}')
+
+
+def stream_filter_from_config(config_dict, frame_rate, filter_type=None):
+    '''
+    Create a causal filter for real-time use, with the parameters of the [filtering] section of Config.toml.
+    Only Butterworth, Kalman, and One-Euro filters can run causally.
+
+    INPUTS:
+    - config_dict: dictionary of Config.toml parameters
+    - frame_rate: int
+    - filter_type: 'butterworth', 'kalman', or 'one_euro'. Type of Config.toml if None
+
     OUTPUT:
-    - col_filtered: Filtered pandas dataframe column
+    - stream_filter: StreamFilter object, with a push(frame) method
     '''
-    
-    median_filter_kernel_size = config_dict.get('filtering').get('median').get('kernel_size')
-    
-    col_filtered = signal.medfilt(col, kernel_size=median_filter_kernel_size)
 
-    return col_filtered
+    if filter_type is None:
+        filter_type = config_dict.get('filtering').get('type')
+    filter_params = filter_params_from_config(config_dict, filter_type)
+
+    if filter_type == 'butterworth':
+        return ButterworthStream(frame_rate, **filter_params)
+    elif filter_type == 'kalman':
+        return KalmanStream(frame_rate, filter_params['trust_ratio'], steady_state=filter_params['steady_state'])
+    elif filter_type == 'one_euro':
+        return OneEuroStream(frame_rate, **filter_params)
+    raise ValueError(f'{filter_type} filter cannot run causally. Choose butterworth, kalman, or one_euro.')
+
+
+def filter_array(Q, filter_type, frame_rate, segments=None, **filter_params):
+    '''
+    Filter all coordinates at once.
+    The segments of valid values are indexed once, per marker if Q is of shape (frames, markers, 3), 
+    and shared by the filter. Missing values (nan or zeros) and segments too short to be filtered are left unchanged.
+
+    INPUTS:
+    - Q: array of shape (frames, ...), for example (frames, markers, 3) or (frames, columns)
+    - filter_type: 'kalman', 'butterworth', 'butterworth_on_speed', 'gaussian', 'LOESS', 'median', or 'one_euro'
+    - frame_rate: int
+    - segments: segment index of Q (see segment_index). Computed if None
+    - filter_params: parameters of the filter (see filter_params_from_config)
+
+    OUTPUT:
+    - Q_filt: filtered array of the same shape as Q
+    '''
+
+    filter_mapping = {
+        'kalman': lambda Q2d: kalman_filter_array(Q2d, frame_rate, segments=segments, **filter_params),
+        'butterworth': lambda Q2d: butterworth_filter_array(Q2d, frame_rate, segments=segments, **filter_params), 
+        'butterworth_on_speed': lambda Q2d: butterworth_on_speed_filter_array(Q2d, frame_rate, segments=segments, **filter_params), 
+        'gaussian': lambda Q2d: gaussian_filter_array(Q2d, segments=segments, **filter_params), 
+        'LOESS': lambda Q2d: loess_filter_array(Q2d, segments=segments, **filter_params), 
+        'median': lambda Q2d: median_filter_array(Q2d, segments=segments, **filter_params),
+        'one_euro': lambda Q2d: one_euro_filter_array(Q2d, frame_rate, segments=segments, **filter_params)
+        }
+    Q = np.asarray(Q, dtype=float)
+    if segments is None:
+        segments = segment_index(Q)
+    Q_filt = filter_mapping[filter_type](Q.reshape(len(Q), -1))
+    return Q_filt.reshape(Q.shape)
+
+
+def filter_sweep(Q, filter_type, frame_rate, grid, return_filtered=False):
+    '''
+    Filter the same coordinates with a grid of parameters, 
+    and compute the RMS residual between filtered and unfiltered data for each of them.
+    Each parameter set filters all coordinates at once. Filtered arrays are only kept on request.
+
+    INPUTS:
+    - Q: array of shape (frames, markers, ...), for example (frames, markers, 3)
+    - filter_type: 'kalman', 'butterworth', 'butterworth_on_speed', 'gaussian', 'LOESS', 'median', or 'one_euro'
+    - frame_rate: int
+    - grid: list of dicts of filter parameters, e.g. [{'order': 4, 'cut_off_frequency': f} for f in range(1,21)]
+    - return_filtered: bool. Also return the filtered arrays
+
+    OUTPUTS:
+    - residuals: array of shape (len(grid), markers). RMS residual over frames and coordinates, missing values excluded
+    - Q_filt_list: list of filtered arrays, one per parameter set (only if return_filtered)
+    '''
+
+    Q = np.asarray(Q, dtype=float)
+    missing = np.isnan(Q) | (Q == 0)
+    nb_valid = np.sum(~missing.reshape(len(Q), Q.shape[1], -1), axis=(0,2))
+
+    segments = segment_index(Q)
+    residuals = np.empty((len(grid), Q.shape[1]))
+    Q_filt_list = []
+    for g, filter_params in enumerate(grid):
+        Q_filt = filter_array(Q, filter_type, frame_rate, segments=segments, **filter_params)
+        sq_diff = np.where(missing, 0, Q - Q_filt)**2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            residuals[g] = np.sqrt(np.nansum(sq_diff.reshape(len(Q), Q.shape[1], -1), axis=(0,2)) / nb_valid)
+        if return_filtered:
+            Q_filt_list.append(Q_filt)
+
+    if return_filtered:
+        return residuals, Q_filt_list
+    return residuals
+
+
+def winter_cutoff(cut_off_frequencies, residuals, noise_range=None):
+    '''
+    Recommend a cut-off frequency with Winter's residual analysis.
+    At high cut-off frequencies, the residual is mostly noise and decreases linearly. 
+    This line is extrapolated to 0 Hz: its intercept estimates the noise level, 
+    and the recommended cut-off is the lowest frequency at which the residual falls to this level.
+    Winter, D. A. (2009). Biomechanics and motor control of human movement. 
+
+    INPUTS:
+    - cut_off_frequencies: increasing array of cut-off frequencies (Hz)
+    - residuals: array of shape (len(cut_off_frequencies), ...). RMS residuals for each cut-off frequency
+    - noise_range: [min, max] frequencies over which the residual is linear. Upper half of the frequencies if None
+
+    OUTPUTS:
+    - recommended_cutoffs: array of shape residuals.shape[1:]. nan if the residual never reaches the noise level
+    - noise_levels: intercepts of the noise lines, same shape
+    '''
+
+    cut_off_frequencies = np.asarray(cut_off_frequencies, dtype=float)
+    residuals = np.asarray(residuals, dtype=float)
+    res_2d = residuals.reshape(len(residuals), -1)
+    if noise_range is None:
+        noise_range = [cut_off_frequencies[len(cut_off_frequencies)//2], cut_off_frequencies[-1]]
+    in_noise_range = (cut_off_frequencies >= noise_range[0]) & (cut_off_frequencies <= noise_range[1])
+    if in_noise_range.sum() < 2:
+        raise ValueError('At least 2 cut-off frequencies are needed in the noise range.')
+
+    # noise line, for all series at once
+    valid_series = np.all(np.isfinite(res_2d[in_noise_range]), axis=0)
+    noise_levels = np.full(res_2d.shape[1], np.nan)
+    if valid_series.any():
+        _, noise_levels[valid_series] = np.polyfit(cut_off_frequencies[in_noise_range], res_2d[in_noise_range][:,valid_series], 1)
+
+    # first crossing of the noise level, linearly interpolated
+    recommended_cutoffs = np.full(res_2d.shape[1], np.nan)
+    below = res_2d <= noise_levels
+    for s in np.flatnonzero(valid_series & below.any(axis=0)):
+        i = np.argmax(below[:,s])
+        if i == 0:
+            recommended_cutoffs[s] = cut_off_frequencies[0]
+        else:
+            r0, r1 = res_2d[i-1,s], res_2d[i,s]
+            recommended_cutoffs[s] = np.interp(noise_levels[s], [r1, r0], [cut_off_frequencies[i], cut_off_frequencies[i-1]])
+
+    return recommended_cutoffs.reshape(residuals.shape[1:]), noise_levels.reshape(residuals.shape[1:])
 
 
 def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names, person_id=0):
@@ -324,9 +842,9 @@ def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names, person_id=0
     Displays filtered and unfiltered data for comparison
 
     INPUTS:
-    - Q_unfilt: pandas dataframe of unfiltered 3D coordinates
-    - Q_filt: pandas dataframe of filtered 3D coordinates
-    - time_col: pandas column
+    - Q_unfilt: array of unfiltered 3D coordinates, of shape (frames, markers, 3)
+    - Q_filt: array of filtered 3D coordinates, of shape (frames, markers, 3)
+    - time_col: array of times
     - keypoints_names: list of strings
 
     OUTPUT:
@@ -339,22 +857,22 @@ def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names, person_id=0
         f = plt.figure()
         
         axX = plt.subplot(311)
-        plt.plot(time_col.to_numpy(), Q_unfilt.iloc[:,id*3].to_numpy(), label='unfiltered')
-        plt.plot(time_col.to_numpy(), Q_filt.iloc[:,id*3].to_numpy(), label='filtered')
+        plt.plot(time_col, Q_unfilt[:,id,0], label='unfiltered')
+        plt.plot(time_col, Q_filt[:,id,0], label='filtered')
         plt.setp(axX.get_xticklabels(), visible=False)
         axX.set_ylabel(keypoint+' X')
         plt.legend()
 
         axY = plt.subplot(312)
-        plt.plot(time_col.to_numpy(), Q_unfilt.iloc[:,id*3+1].to_numpy(), label='unfiltered')
-        plt.plot(time_col.to_numpy(), Q_filt.iloc[:,id*3+1].to_numpy(), label='filtered')
+        plt.plot(time_col, Q_unfilt[:,id,1], label='unfiltered')
+        plt.plot(time_col, Q_filt[:,id,1], label='filtered')
         plt.setp(axY.get_xticklabels(), visible=False)
         axY.set_ylabel(keypoint+' Y')
         plt.legend()
 
         axZ = plt.subplot(313)
-        plt.plot(time_col.to_numpy(), Q_unfilt.iloc[:,id*3+2].to_numpy(), label='unfiltered')
-        plt.plot(time_col.to_numpy(), Q_filt.iloc[:,id*3+2].to_numpy(), label='filtered')
+        plt.plot(time_col, Q_unfilt[:,id,2], label='unfiltered')
+        plt.plot(time_col, Q_filt[:,id,2], label='filtered')
         axZ.set_ylabel(keypoint+' Z')
         axZ.set_xlabel('Time')
         plt.legend()
@@ -366,7 +884,8 @@ def display_figures_fun(Q_unfilt, Q_filt, time_col, keypoints_names, person_id=0
 
 def filter1d(col, config_dict, filter_type, frame_rate):
     '''
-    Choose filter type and filter column
+    Choose filter type and filter column.
+    Prefer filter_array to filter all columns at once.
 
     INPUT:
     - col: Pandas dataframe column
@@ -377,27 +896,21 @@ def filter1d(col, config_dict, filter_type, frame_rate):
     - col_filtered: Filtered pandas dataframe column
     '''
 
-    # Choose filter
-    filter_mapping = {
-        'kalman': kalman_filter_1d,
-        'butterworth': butterworth_filter_1d, 
-        'butterworth_on_speed': butterworth_on_speed_filter_1d, 
-        'gaussian': gaussian_filter_1d, 
-        'LOESS': loess_filter_1d, 
-        'median': median_filter_1d
-        }
-    filter_fun = filter_mapping[filter_type]
-    
-    # Filter column
-    col_filtered = filter_fun(config_dict, frame_rate, col)
+    filter_params = filter_params_from_config(config_dict, filter_type)
+    col_filtered = filter_array(col.to_numpy()[:, np.newaxis], filter_type, frame_rate, **filter_params)[:, 0]
 
-    return col_filtered
+    return pd.Series(col_filtered, index=col.index, name=col.name)
 
 
-def recap_filter3d(config_dict, trc_path):
+def recap_filter3d(config_dict, trc_path, elapsed=None):
     '''
     Print a log message giving filtering parameters. Also stored in User/logs.txt.
 
+    INPUTS:
+    - config_dict: dictionary of Config.toml parameters
+    - trc_path: path of the filtered trc file
+    - elapsed: float. Time taken to read, filter, and write this file, in seconds
+
     OUTPUT:
     - Message in console
     '''
@@ -407,6 +920,8 @@ def recap_filter3d(config_dict, trc_path):
     kalman_filter_trustratio = int(config_dict.get('filtering').get('kalman').get('trust_ratio'))
     kalman_filter_smooth = int(config_dict.get('filtering').get('kalman').get('smooth'))
     kalman_filter_smooth_str = 'smoother' if kalman_filter_smooth else 'filter'
+    if config_dict.get('filtering').get('kalman').get('steady_state', False):
+        kalman_filter_smooth_str += ' with steady-state gains'
     butterworth_filter_type = 'low' # config_dict.get('filtering').get('butterworth').get('type')
     butterworth_filter_order = int(config_dict.get('filtering').get('butterworth').get('order'))
     butterworth_filter_cutoff = int(config_dict.get('filtering').get('butterworth').get('cut_off_frequency'))
@@ -416,6 +931,7 @@ def recap_filter3d(config_dict, trc_path):
     gaussian_filter_sigma_kernel = int(config_dict.get('filtering').get('gaussian').get('sigma_kernel'))
     loess_filter_nb_values = config_dict.get('filtering').get('LOESS').get('nb_values_used')
     median_filter_kernel_size = config_dict.get('filtering').get('median').get('kernel_size')
+    one_euro_config = config_dict.get('filtering').get('one_euro', {})
     make_c3d = config_dict.get('filtering').get('make_c3d')
     
     # Recap
@@ -425,14 +941,56 @@ def recap_filter3d(config_dict, trc_path):
         'butterworth_on_speed': f'--> Filter type: Butterworth on speed {butter_speed_filter_type}-pass. Order {butter_speed_filter_order}, Cut-off frequency {butter_speed_filter_cutoff} Hz.', 
         'gaussian': f'--> Filter type: Gaussian. Standard deviation kernel: {gaussian_filter_sigma_kernel}', 
         'LOESS': f'--> Filter type: LOESS. Number of values used: {loess_filter_nb_values}', 
-        'median': f'--> Filter type: Median. Kernel size: {median_filter_kernel_size}'
+        'median': f'--> Filter type: Median. Kernel size: {median_filter_kernel_size}',
+        'one_euro': f'--> Filter type: One-Euro. Minimum cut-off frequency {one_euro_config.get("min_cutoff")} Hz, beta {one_euro_config.get("beta")}, speed cut-off frequency {one_euro_config.get("d_cutoff")} Hz.'
     }
     logging.info(filter_mapping_recap[filter_type])
-    logging.info(f'Filtered 3D coordinates are stored at {trc_path}.\n')
+    elapsed_str = f' ({elapsed:.2f} s)' if elapsed is not None else ''
+    logging.info(f'Filtered 3D coordinates are stored at {trc_path}{elapsed_str}.\n')
     if make_c3d:
         logging.info('All filtered trc files have been converted to c3d.')
 
 
+def filter_trc_file(trc_path_in, trc_path_out, filter_type, frame_rate, filter_params, make_c3d=False, return_data=False):
+    '''
+    Read a trc file, filter its coordinates, and write the filtered trc file.
+    Defined at module level so that it can be run in a worker process.
+
+    INPUTS:
+    - trc_path_in: path of the trc file to filter
+    - trc_path_out: path of the filtered trc file
+    - filter_type: 'kalman', 'butterworth', 'butterworth_on_speed', 'gaussian', 'LOESS', or 'median'
+    - frame_rate: int
+    - filter_params: parameters of the filter (see filter_params_from_config)
+    - make_c3d: bool. Also save the filtered file in c3d format
+    - return_data: bool. Return the unfiltered and filtered coordinates, for display
+
+    OUTPUTS:
+    - trc_path_out: path of the filtered trc file
+    - elapsed: float. Processing time in seconds
+    - data: (Q_coord, Q_filt, time_col, keypoints_names) if return_data, else None. 
+    Coordinates are arrays of shape (frames, markers, 3)
+    '''
+
+    start = time.time()
+
+    # Read trc file in a single pass
+    Q_coord, frames_col, time_col, keypoints_names, header = read_trc_array(trc_path_in)
+
+    # Filter coordinates
+    Q_filt = filter_array(Q_coord, filter_type, frame_rate, **filter_params)
+    data = (Q_coord, Q_filt, time_col, keypoints_names) if return_data else None
+
+    # Write trc file with filtered coordinates
+    write_trc_array(trc_path_out, header, frames_col, time_col, Q_filt)
+
+    # Save c3d
+    if make_c3d:
+        convert_to_c3d(trc_path_out)
+
+    return trc_path_out, time.time() - start, data
+
+
 def filter_all(config_dict):
     '''
     Filter the 3D coordinates of the trc file.
@@ -452,6 +1010,9 @@ def filter_all(config_dict):
     display_figures = config_dict.get('filtering').get('display_figures')
     filter_type = config_dict.get('filtering').get('type')
     make_c3d = config_dict.get('filtering').get('make_c3d')
+    nb_workers = config_dict.get('filtering').get('nb_workers', 1)
+    if nb_workers == 'auto':
+        nb_workers = os.cpu_count() or 1
 
     # Get frame_rate
     video_dir = os.path.join(project_dir, 'videos')
@@ -468,43 +1029,29 @@ def filter_all(config_dict):
         except:
             frame_rate = 60
     
+    # Filter parameters, read once for all files
+    filter_params = filter_params_from_config(config_dict, filter_type)
+
     # Trc paths
     trc_path_in = [file for file in glob.glob(os.path.join(pose3d_dir, '*.trc')) if 'filt' not in file]
     trc_f_out = [f'{os.path.basename(t).split(".")[0]}_filt_{filter_type}.trc' for t in trc_path_in]
     trc_path_out = [os.path.join(pose3d_dir, t) for t in trc_f_out]
     
-    for person_id, (t_in, t_out) in enumerate(zip(trc_path_in, trc_path_out)):
-        # Read trc header
-        with open(t_in, 'r') as trc_file:
-            header = [next(trc_file) for line in range(5)]
-
-        # Read trc coordinates values
-        trc_df = pd.read_csv(t_in, sep="\t", skiprows=4)
-        frames_col, time_col = trc_df.iloc[:,0], trc_df.iloc[:,1]
-        Q_coord = trc_df.drop(trc_df.columns[[0, 1, -1]], axis=1)
-
-        # Filter coordinates
-        Q_filt = Q_coord.apply(filter1d, axis=0, args = [config_dict, filter_type, frame_rate])
-
-        # Display figures
-        if display_figures:
-            # Retrieve keypoints
-            keypoints_names = pd.read_csv(t_in, sep="\t", skiprows=3, nrows=0).columns[2::3][:-1].to_numpy()
-            display_figures_fun(Q_coord, Q_filt, time_col, keypoints_names, person_id)
-
-        # Reconstruct trc file with filtered coordinates
-        with open(t_out, 'w') as trc_o:
-            [trc_o.write(line) for line in header]
-            Q_filt.insert(0, 'Frame#', frames_col)
-            Q_filt.insert(1, 'Time', time_col)
-            # Q_filt = Q_filt.fillna(' ')
-            Q_filt.to_csv(trc_o, sep='\t', index=False, header=None, lineterminator='\n')
-
-        # Save c3d
-        if make_c3d:
-            convert_to_c3d(t_out)
-
-        # Recap
-        recap_filter3d(config_dict, t_out)
+    # Filter files, in parallel processes if several files and nb_workers > 1
+    nb_workers = max(1, min(nb_workers, len(trc_path_in)))
+    file_args = [(t_in, t_out, filter_type, frame_rate, filter_params, make_c3d, display_figures) for t_in, t_out in zip(trc_path_in, trc_path_out)]
+    if nb_workers > 1:
+        logging.info(f'--> Filtering {len(trc_path_in)} files with {nb_workers} processes.')
+        with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+            results = list(executor.map(filter_trc_file, *zip(*file_args)))
+    else:
+        results = [filter_trc_file(*args) for args in file_args]
 
+    # Recap
+    for t_out, elapsed, _ in results:
+        recap_filter3d(config_dict, t_out, elapsed)
 
+    # Display figures, once all files are filtered
+    if display_figures:
+        for person_id, (_, _, (Q_coord, Q_filt, time_col, keypoints_names)) in enumerate(results):
+            display_figures_fun(Q_coord, Q_filt, time_col, keypoints_names, person_id)
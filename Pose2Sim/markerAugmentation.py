@@ -43,7 +43,84 @@ __email__ = "contact@david-pagnon.com"
 __status__ = "Development"
 
 
+## CLASSES
+class AugmenterModelCache():
+    '''
+    Keeps augmenter models alive across persons and trials of a same pipeline run,
+    so that each model is only built and loaded once.
+    Models, with their feature means and standard deviations, are keyed by model directory.
+
+    USAGE:
+    augmenter_model_cache = AugmenterModelCache()
+    for config_dict in config_dicts:
+        augment_markers_all(config_dict, augmenter_model_cache=augmenter_model_cache)
+    augmenter_model_cache.clear()
+    '''
+
+    def __init__(self):
+        self.models = {}
+
+    def get(self, augmenterModelDir):
+        '''
+        Return the model, feature mean, and feature std of an augmenter model directory.
+        Mean and std are None if the directory does not provide them.
+        '''
+
+        if augmenterModelDir not in self.models:
+            with open(os.path.join(augmenterModelDir, "model.json"), 'r') as json_file:
+                pretrainedModel_json = json_file.read()
+            model = tf.keras.models.model_from_json(pretrainedModel_json, custom_objects={
+                                    'Sequential': tf.keras.models.Sequential,
+                                    'Dense': tf.keras.layers.Dense
+                                    })
+            model.load_weights(os.path.join(augmenterModelDir, "weights.h5"))
+
+            pathMean = os.path.join(augmenterModelDir, "mean.npy")
+            pathSTD = os.path.join(augmenterModelDir, "std.npy")
+            trainFeatures_mean = np.load(pathMean, allow_pickle=True) if os.path.isfile(pathMean) else None
+            trainFeatures_std = np.load(pathSTD, allow_pickle=True) if os.path.isfile(pathSTD) else None
+
+            self.models[augmenterModelDir] = (model, trainFeatures_mean, trainFeatures_std)
+            logging.info(f'--> Augmenter model {os.path.basename(augmenterModelDir)} loaded.')
+        return self.models[augmenterModelDir]
+
+    def clear(self):
+        if self.models:
+            self.models.clear()
+            tf.keras.backend.clear_session()
+
+
 ## FUNCTIONS
+def predict_batch(model, inputs_list, sequences=True):
+    '''
+    Predict the outputs of several persons with a single model call.
+    Sequences are zero-padded at the end to the longest one: the LSTM layers of 
+    the augmenter are not bidirectional, so padding does not affect previous frames.
+    Non-sequence inputs are stacked along the frame axis.
+
+    INPUTS:
+    - model: Keras model
+    - inputs_list: list of arrays of shape (n_frames_person, n_features)
+    - sequences: True if the model takes (batch, frames, features) inputs, False if it takes (frames, features)
+
+    OUTPUT:
+    - outputs_list: list of arrays of shape (n_frames_person, n_outputs)
+    '''
+
+    lengths = [len(inputs) for inputs in inputs_list]
+    if sequences:
+        inputs_batch = np.zeros((len(inputs_list), max(lengths), inputs_list[0].shape[1]))
+        for i, inputs in enumerate(inputs_list):
+            inputs_batch[i, :len(inputs)] = inputs
+        outputs_batch = model.predict(inputs_batch)
+        outputs_list = [outputs_batch[i, :length] for i, length in enumerate(lengths)]
+    else:
+        outputs_batch = model.predict(np.concatenate(inputs_list, axis=0))
+        outputs_list = np.split(outputs_batch, np.cumsum(lengths)[:-1])
+
+    return outputs_list
+
+
 # subject_height must be in meters
 def check_midhip_data(trc_file):
     try:
@@ -77,7 +154,21 @@ def check_neck_data(trc_file):
     return trc_file
 
 
-def augment_markers_all(config_dict):
+def augment_markers_all(config_dict, augmenter_model_cache=None):
+    '''
+    Augment all trc files of a trial with the Stanford LSTM model.
+    The lower and upper body models are each run once, on all persons at once.
+
+    INPUTS:
+    - config_dict: dictionary of configuration parameters
+    - augmenter_model_cache: AugmenterModelCache or None. Shares loaded models across calls.
+      If None, models are loaded for this trial only
+
+    OUTPUT:
+    - augmented trc files (and c3d files if make_c3d)
+    - min_y_pos: minimum vertical position of the augmented markers of the last person
+    '''
+
     # get parameters from Config.toml
     project_dir = config_dict.get('project').get('project_dir')
     pathInputTRCFile = os.path.realpath(os.path.join(project_dir, 'pose-3d'))
@@ -155,121 +246,132 @@ def augment_markers_all(config_dict):
         logging.warning("Number of subject masses does not match number of TRC files. Missing masses are set to 70kg.")
         subject_mass += [70] * (len(trc_files) - len(subject_mass))
 
-    for p in range(len(subject_mass)):
-        pathInputTRCFile = trc_files[p]
-        pathOutputTRCFile = os.path.splitext(pathInputTRCFile)[0] + '_LSTM.trc'
+    # This is by default - might need to be adjusted in the future.
+    featureHeight = True
+    featureWeight = True
     
-        # This is by default - might need to be adjusted in the future.
-        featureHeight = True
-        featureWeight = True
-        
-        # Augmenter types
-        if augmenter_model == 'v0.3':
-            # Lower body           
-            augmenterModelType_lower = '{}_lower'.format(augmenter_model)
-            from Pose2Sim.MarkerAugmenter.utils import getOpenPoseMarkers_lowerExtremity2
-            feature_markers_lower, response_markers_lower = getOpenPoseMarkers_lowerExtremity2()
-            # Upper body
-            augmenterModelType_upper = '{}_upper'.format(augmenter_model)
-            from Pose2Sim.MarkerAugmenter.utils import getMarkers_upperExtremity_noPelvis2
-            feature_markers_upper, response_markers_upper = getMarkers_upperExtremity_noPelvis2()        
-            augmenterModelType_all = [augmenterModelType_lower, augmenterModelType_upper]
-            feature_markers_all = [feature_markers_lower, feature_markers_upper]
-            response_markers_all = [response_markers_lower, response_markers_upper]
-        else:
-            raise ValueError('Augmenter models other than 0.3 are not supported.')
-        logging.info('Using Stanford augmenter model: {}'.format(augmenter_model))
-        
+    # Augmenter types
+    if augmenter_model == 'v0.3':
+        # Lower body           
+        augmenterModelType_lower = '{}_lower'.format(augmenter_model)
+        from Pose2Sim.MarkerAugmenter.utils import getOpenPoseMarkers_lowerExtremity2
+        feature_markers_lower, response_markers_lower = getOpenPoseMarkers_lowerExtremity2()
+        # Upper body
+        augmenterModelType_upper = '{}_upper'.format(augmenter_model)
+        from Pose2Sim.MarkerAugmenter.utils import getMarkers_upperExtremity_noPelvis2
+        feature_markers_upper, response_markers_upper = getMarkers_upperExtremity_noPelvis2()        
+        augmenterModelType_all = [augmenterModelType_lower, augmenterModelType_upper]
+        feature_markers_all = [feature_markers_lower, feature_markers_upper]
+        response_markers_all = [response_markers_lower, response_markers_upper]
+    else:
+        raise ValueError('Augmenter models other than 0.3 are not supported.')
+    logging.info('Using Stanford augmenter model: {}'.format(augmenter_model))
+
+    if augmenter_model_cache is None:
+        augmenter_model_cache = AugmenterModelCache()
+        clear_cache = True
+    else:
+        clear_cache = False
+
+    try:
         # %% Process data.
-        # Import TRC file
-        try:
-            trc_file = utilsDataman.TRCFile(pathInputTRCFile)
-        except:
-            raise ValueError('Cannot read TRC file. You may need to enable interpolation in Config.toml while triangulating.')
+        trc_files_all, inputs_all, referenceMarker_data_all = [], [], []
+        for p in range(len(trc_files)):
+            pathInputTRCFile = trc_files[p]
+
+            # Import TRC file
+            try:
+                trc_file = utilsDataman.TRCFile(pathInputTRCFile)
+            except:
+                raise ValueError('Cannot read TRC file. You may need to enable interpolation in Config.toml while triangulating.')
         
-        # add neck and midhip data if not in file
-        trc_file = check_midhip_data(trc_file)
-        trc_file = check_neck_data(trc_file)
-        trc_file.write(pathInputTRCFile)
+            # add neck and midhip data if not in file
+            trc_file = check_midhip_data(trc_file)
+            trc_file = check_neck_data(trc_file)
+            trc_file.write(pathInputTRCFile)
         
-        # Verify that all feature markers are present in the TRC file.
-        feature_markers_joined = set(feature_markers_all[0]+feature_markers_all[1])
-        trc_markers = set(trc_file.marker_names)
-        missing_markers = list(feature_markers_joined - trc_markers)
-        if len(missing_markers) > 0:
-            raise ValueError(f'Marker augmentation requires {missing_markers} markers and they are not present in the TRC file.')
-
-        # Loop over augmenter types to handle separate augmenters for lower and
-        # upper bodies.
-        outputs_all = {}
-        n_response_markers_all = 0
-        for idx_augm, augmenterModelType in enumerate(augmenterModelType_all):
-            outputs_all[idx_augm] = {}
-            feature_markers = feature_markers_all[idx_augm]
-            response_markers = response_markers_all[idx_augm]
-            
-            augmenterModelDir = os.path.join(augmenterDir, augmenterModelName, 
-                                             augmenterModelType)
-            
-            # %% Pre-process inputs.
-            # Step 1: import .trc file with OpenPose marker trajectories.  
-            trc_data = TRC2numpy(pathInputTRCFile, feature_markers)
-            trc_data_data = trc_data[:,1:]
+            # Verify that all feature markers are present in the TRC file.
+            feature_markers_joined = set(feature_markers_all[0]+feature_markers_all[1])
+            trc_markers = set(trc_file.marker_names)
+            missing_markers = list(feature_markers_joined - trc_markers)
+            if len(missing_markers) > 0:
+                raise ValueError(f'Marker augmentation requires {missing_markers} markers and they are not present in the TRC file.')
 
-            # Step 2: Normalize with reference marker position.
+            # Reference marker position, to normalize inputs and un-normalize outputs.
             referenceMarker_data = trc_file.marker("Hip")  # instead of trc_file.marker(referenceMarker) # change by HunMin
-            norm_trc_data_data = np.zeros((trc_data_data.shape[0],
-                                        trc_data_data.shape[1]))
-            for i in range(0,trc_data_data.shape[1],3):
-                norm_trc_data_data[:,i:i+3] = (trc_data_data[:,i:i+3] - 
-                                            referenceMarker_data)
-                
-                
-            # Step 3: Normalize with subject's height.
-            norm2_trc_data_data = copy.deepcopy(norm_trc_data_data)
-            norm2_trc_data_data = norm2_trc_data_data / subject_height[p]
+
+            # Loop over augmenter types to handle separate augmenters for lower and
+            # upper bodies.
+            inputs_all.append({})
+            for idx_augm, augmenterModelType in enumerate(augmenterModelType_all):
+                feature_markers = feature_markers_all[idx_augm]
+                augmenterModelDir = os.path.join(augmenterDir, augmenterModelName, 
+                                                 augmenterModelType)
+                _, trainFeatures_mean, trainFeatures_std = augmenter_model_cache.get(augmenterModelDir)
             
-            # Step 4: Add remaining features.
-            inputs = copy.deepcopy(norm2_trc_data_data)
-            if featureHeight:    
-                inputs = np.concatenate(
-                    (inputs, subject_height[p]*np.ones((inputs.shape[0],1))), axis=1)
-            if featureWeight:    
-                inputs = np.concatenate(
-                    (inputs, subject_mass[p]*np.ones((inputs.shape[0],1))), axis=1)
+                # %% Pre-process inputs.
+                # Step 1: import .trc file with OpenPose marker trajectories.  
+                trc_data = TRC2numpy(pathInputTRCFile, feature_markers)
+                trc_data_data = trc_data[:,1:]
+
+                # Step 2: Normalize with reference marker position.
+                norm_trc_data_data = np.zeros((trc_data_data.shape[0],
+                                            trc_data_data.shape[1]))
+                for i in range(0,trc_data_data.shape[1],3):
+                    norm_trc_data_data[:,i:i+3] = (trc_data_data[:,i:i+3] - 
+                                                referenceMarker_data)
                 
-            # Step 5: Pre-process data
-            pathMean = os.path.join(augmenterModelDir, "mean.npy")
-            pathSTD = os.path.join(augmenterModelDir, "std.npy")
-            if os.path.isfile(pathMean):
-                trainFeatures_mean = np.load(pathMean, allow_pickle=True)
-                inputs -= trainFeatures_mean
-            if os.path.isfile(pathSTD):
-                trainFeatures_std = np.load(pathSTD, allow_pickle=True)
-                inputs /= trainFeatures_std 
                 
-            # Step 6: Reshape inputs if necessary (eg, LSTM)
-            if augmenterModelName == "LSTM":
-                inputs = np.reshape(inputs, (1, inputs.shape[0], inputs.shape[1]))
+                # Step 3: Normalize with subject's height.
+                norm2_trc_data_data = copy.deepcopy(norm_trc_data_data)
+                norm2_trc_data_data = norm2_trc_data_data / subject_height[p]
+            
+                # Step 4: Add remaining features.
+                inputs = copy.deepcopy(norm2_trc_data_data)
+                if featureHeight:    
+                    inputs = np.concatenate(
+                        (inputs, subject_height[p]*np.ones((inputs.shape[0],1))), axis=1)
+                if featureWeight:    
+                    inputs = np.concatenate(
+                        (inputs, subject_mass[p]*np.ones((inputs.shape[0],1))), axis=1)
                 
-            # %% Load model and weights, and predict outputs.
-            json_file = open(os.path.join(augmenterModelDir, "model.json"), 'r')
-            pretrainedModel_json = json_file.read()
-            json_file.close()
-            model = tf.keras.models.model_from_json(pretrainedModel_json, custom_objects={
-                                    'Sequential': tf.keras.models.Sequential,
-                                    'Dense': tf.keras.layers.Dense
-                                    })
-            model.load_weights(os.path.join(augmenterModelDir, "weights.h5"))  
-            outputs = model.predict(inputs)
-            tf.keras.backend.clear_session()
+                # Step 5: Pre-process data
+                if trainFeatures_mean is not None:
+                    inputs -= trainFeatures_mean
+                if trainFeatures_std is not None:
+                    inputs /= trainFeatures_std 
+
+                inputs_all[p][idx_augm] = inputs
+
+            trc_files_all.append(trc_file)
+            referenceMarker_data_all.append(referenceMarker_data)
+
+        # %% Predict outputs of all persons at once, for each augmenter type.
+        outputs_all = [{} for p in range(len(trc_files))]
+        for idx_augm, augmenterModelType in enumerate(augmenterModelType_all):
+            augmenterModelDir = os.path.join(augmenterDir, augmenterModelName, 
+                                             augmenterModelType)
+            model, _, _ = augmenter_model_cache.get(augmenterModelDir)
+            outputs_persons = predict_batch(model, [inputs_all[p][idx_augm] for p in range(len(trc_files))], 
+                                            sequences=(augmenterModelName == "LSTM"))
+            for p in range(len(trc_files)):
+                outputs_all[p][idx_augm] = outputs_persons[p]
+    finally:
+        if clear_cache:
+            augmenter_model_cache.clear()
+
+    for p in range(len(trc_files)):
+        pathInputTRCFile = trc_files[p]
+        pathOutputTRCFile = os.path.splitext(pathInputTRCFile)[0] + '_LSTM.trc'
+        trc_file = trc_files_all[p]
+        referenceMarker_data = referenceMarker_data_all[p]
+
+        responses_all = []
+        for idx_augm, response_markers in enumerate(response_markers_all):
+            outputs = outputs_all[p][idx_augm]
 
             # %% Post-process outputs.
-            # Step 1: Reshape if necessary (eg, LSTM)
-            if augmenterModelName == "LSTM":
-                outputs = np.reshape(outputs, (outputs.shape[1], outputs.shape[2]))
-                
-            # Step 2: Un-normalize with subject's height.
+            # Step 1: Un-normalize with subject's height.
             unnorm_outputs = outputs * subject_height[p]
             
             # Step 2: Un-normalize with reference marker position.
@@ -287,21 +389,11 @@ def augment_markers_all(config_dict):
                 trc_file.add_marker(marker, x, y, z)
                 
             # %% Gather data for computing minimum y-position.
-            outputs_all[idx_augm]['response_markers'] = response_markers   
-            outputs_all[idx_augm]['response_data'] = unnorm2_outputs
-            n_response_markers_all += len(response_markers)
+            responses_all.append(unnorm2_outputs)
             
         # %% Extract minimum y-position across response markers. This is used
         # to align feet and floor when visualizing.
-        responses_all_conc = np.zeros((unnorm2_outputs.shape[0],
-                                       n_response_markers_all*3))
-        idx_acc_res = 0
-        for idx_augm in outputs_all:
-            idx_acc_res_end = (idx_acc_res + 
-                               (len(outputs_all[idx_augm]['response_markers']))*3)
-            responses_all_conc[:,idx_acc_res:idx_acc_res_end] = (
-                outputs_all[idx_augm]['response_data'])
-            idx_acc_res = idx_acc_res_end
+        responses_all_conc = np.concatenate(responses_all, axis=1)
         # Minimum y-position across response markers.
         min_y_pos = np.min(responses_all_conc[:,1::3])
             
@@ -33,7 +33,6 @@ OUTPUTS:
 ## INIT
 import os
 import glob
-import fnmatch
 import re
 import numpy as np
 import json
@@ -46,7 +45,8 @@ from anytree.importer import DictImporter
 import logging
 
 from Pose2Sim.common import retrieve_calib_params, computeP, weighted_triangulation, \
-    reprojection, euclidean_distance, sort_stringlist_by_last_number
+    reprojection, euclidean_distance, sort_stringlist_by_last_number, \
+    list_json_dirs, list_json_files, read_pose_json
 from Pose2Sim.skeletons import *
 
 
@@ -80,8 +80,7 @@ def persons_combinations(json_files_framef):
     nb_persons_per_cam = []
     for c in range(n_cams):
         try:
-            with open(json_files_framef[c], 'r') as js:
-                nb_persons_per_cam += [len(json.load(js)['people'])]
+            nb_persons_per_cam += [len(read_pose_json(json_files_framef[c])['people'])]
         except:
             nb_persons_per_cam += [0]
     
@@ -233,13 +232,12 @@ def read_json(js_file):
     Read OpenPose json file
     '''
     try:
-        with open(js_file, 'r') as json_f:
-            js = json.load(json_f)
-            json_data = []
-            for people in range(len(js['people'])):
-                if len(js['people'][people]['pose_keypoints_2d']) < 3: continue
-                else:
-                    json_data.append(js['people'][people]['pose_keypoints_2d'])
+        js = read_pose_json(js_file)
+        json_data = []
+        for people in range(len(js['people'])):
+            if len(js['people'][people]['pose_keypoints_2d']) < 3: continue
+            else:
+                json_data.append(js['people'][people]['pose_keypoints_2d'])
     except:
         json_data = []
     return json_data
@@ -536,19 +534,18 @@ def rewrite_json_files(json_tracked_files_f, json_files_f, proposals, n_cams):
 
     for cam in range(n_cams):
         try:
+            js = read_pose_json(json_files_f[cam])
+            js_new = js.copy()
+            js_new['people'] = []
+            for new_comb in proposals:
+                if not np.isnan(new_comb[cam]):
+                    js_new['people'] += [js['people'][int(new_comb[cam])]]
+                else:
+                    js_new['people'] += [{}]
             with open(json_tracked_files_f[cam], 'w') as json_tracked_f:
-                with open(json_files_f[cam], 'r') as json_f:
-                    js = json.load(json_f)
-                    js_new = js.copy()
-                    js_new['people'] = []
-                    for new_comb in proposals:
-                        if not np.isnan(new_comb[cam]):
-                            js_new['people'] += [js['people'][int(new_comb[cam])]]
-                        else:
-                            js_new['people'] += [{}]
                 json_tracked_f.write(json.dumps(js_new))
         except:
-            os.remove(json_tracked_files_f[cam])
+            if os.path.exists(json_tracked_files_f[cam]): os.remove(json_tracked_files_f[cam])
 
 
 def recap_tracking(config_dict, error=0, nb_cams_excluded=0):
@@ -680,21 +677,22 @@ def associate_all(config_dict):
             raise NameError('{pose_model} not found in skeletons.py nor in Config.toml')
 
     # 2d-pose files selection
-    pose_listdirs_names = next(os.walk(pose_dir))[1]
     try:
-        pose_listdirs_names = sort_stringlist_by_last_number(pose_listdirs_names)
-        os.listdir(os.path.join(pose_dir, pose_listdirs_names[0]))[0]
+        json_dirs_names = sort_stringlist_by_last_number(list_json_dirs(pose_dir))
+        list_json_files(os.path.join(pose_dir, json_dirs_names[0]))[0]
     except:
         raise ValueError(f'No json files found in {pose_dir} subdirectories. Make sure you run Pose2Sim.poseEstimation() first.')
-    json_dirs_names = [k for k in pose_listdirs_names if 'json' in k]
-    try: 
-        json_files_names = [fnmatch.filter(os.listdir(os.path.join(poseSync_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+    try: # synchronized json files, or synchronization manifest
+        json_files_names = [list_json_files(os.path.join(poseSync_dir, js_dir)) for js_dir in json_dirs_names]
+        json_source_dir = poseSync_dir
     except:
         try:
-            json_files_names = [fnmatch.filter(os.listdir(os.path.join(pose_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+            json_files_names = [list_json_files(os.path.join(pose_dir, js_dir)) for js_dir in json_dirs_names]
+            json_source_dir = pose_dir
         except:
             raise ValueError(f'No json files found in {pose_dir} nor {poseSync_dir} subdirectories. Make sure you run Pose2Sim.poseEstimation() first.')
     json_files_names = [sort_stringlist_by_last_number(j) for j in json_files_names]
+    json_files_by_frame = [{int(re.split(r'(\d+)',j)[-2]): j for j in reversed(json_files_names[c])} for c in range(len(json_dirs_names))]
     
     # 2d-pose-associated files creation
     if not os.path.exists(poseTracked_dir): os.mkdir(poseTracked_dir)   
@@ -726,13 +724,8 @@ def associate_all(config_dict):
 
     for f in tqdm(range(*f_range)):
         # print(f'\nFrame {f}:')
-        json_files_names_f = [[j for j in json_files_names[c] if int(re.split(r'(\d+)',j)[-2])==f] for c in range(n_cams)]
-        json_files_names_f = [j for j_list in json_files_names_f for j in (j_list or ['none'])]
-        try:
-            json_files_f = [os.path.join(poseSync_dir, json_dirs_names[c], json_files_names_f[c]) for c in range(n_cams)]
-            with open(os.path.exist(json_files_f[0])) as json_exist_test: pass
-        except:
-            json_files_f = [os.path.join(pose_dir, json_dirs_names[c], json_files_names_f[c]) for c in range(n_cams)]
+        json_files_names_f = [json_files_by_frame[c].get(f, 'none') for c in range(n_cams)]
+        json_files_f = [os.path.join(json_source_dir, json_dirs_names[c], json_files_names_f[c]) for c in range(n_cams)]
         json_tracked_files_f = [os.path.join(poseTracked_dir, json_dirs_names[c], json_files_names_f[c]) for c in range(n_cams)]
 
         if not multi_person:
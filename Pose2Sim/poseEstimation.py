@@ -38,8 +38,12 @@ import json
 import re
 import logging
 import ast
+import time
+import itertools as it
 import numpy as np
 from functools import partial
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from anytree.importer import DictImporter
 import cv2
@@ -47,7 +51,8 @@ import cv2
 from rtmlib import PoseTracker, BodyWithFeet, Wholebody, Body, Hand, Custom, draw_skeleton
 from deep_sort_realtime.deepsort_tracker import DeepSort
 from Pose2Sim.common import natural_sort_key, sort_people_sports2d, sort_people_deepsort, sort_people_rtmlib,\
-                        colors, thickness, draw_bounding_box, draw_keypts, draw_skel
+                        colors, thickness, draw_bounding_box, draw_keypts, draw_skel, bbox_ltwh_compute, \
+                        BulkPoseWriter, list_json_dirs, list_json_files
 from Pose2Sim.skeletons import *
 
 
@@ -62,6 +67,230 @@ __email__ = "contact@david-pagnon.com"
 __status__ = "Development"
 
 
+## CLASSES
+class RoiPoseTracker():
+    '''
+    Region of interest wrapper around an RTMLib PoseTracker.
+
+    Full-frame person detection is only run on the first frame, every det_frequency frames,
+    or when all persons were lost on the previous frame. Inbetween, the region of each person
+    is derived from their confident keypoints on the previous frame (score above min_roi_score),
+    so that a single low-score keypoint cannot grow the region.
+    Each region is cropped, downscaled if its longest side is larger than roi_max_size,
+    and passed alone to the pose model. Keypoints are then mapped back to full-frame coordinates.
+
+    USAGE:
+    pose_tracker = setup_pose_tracker(ModelClass, det_frequency, mode, False, backend, device)
+    roi_tracker = RoiPoseTracker(pose_tracker, det_frequency=det_frequency, roi_max_size=512)
+    keypoints, scores = roi_tracker(frame)
+    '''
+
+    def __init__(self, pose_tracker, det_frequency=1, roi_max_size=512, roi_padding=20, min_roi_score=0.3, min_roi_keypoints=4):
+        '''
+        INPUTS:
+        - pose_tracker: PoseTracker. The initialized RTMLib pose tracker object (must be top-down, with a detection model)
+        - det_frequency: int. Full-frame detection is run at least every N frames
+        - roi_max_size: int. Longest side of a cropped region above which it is downscaled (px)
+        - roi_padding: int. Padding around the previous keypoints, in percent of the bounding box size
+        - min_roi_score: float. Persons whose mean keypoint score is below this value are considered lost,
+          and keypoints whose score is below this value are not used to derive the next region
+        - min_roi_keypoints: int. Persons with fewer confident keypoints are considered lost
+        '''
+
+        if getattr(pose_tracker, 'det_model', None) is None or getattr(pose_tracker, 'pose_model', None) is None:
+            raise ValueError('ROI tracking requires a top-down pose model with a person detector.')
+
+        self.pose_tracker = pose_tracker
+        self.det_model = pose_tracker.det_model
+        self.pose_model = pose_tracker.pose_model
+        self.det_frequency = det_frequency
+        self.roi_max_size = roi_max_size
+        self.roi_padding = roi_padding
+        self.min_roi_score = min_roi_score
+        self.min_roi_keypoints = min_roi_keypoints
+        self.reset()
+
+    def reset(self):
+        self.pose_tracker.reset()
+        self.frame_cnt = 0
+        self.prev_bboxes = []
+        self.nb_full_detections = 0
+        self.roi_pixel_fractions = []
+
+    def __call__(self, frame):
+        H, W = frame.shape[:2]
+
+        # Full-frame detection if persons were lost or every det_frequency frames
+        if len(self.prev_bboxes) == 0 or self.frame_cnt % self.det_frequency == 0:
+            bboxes = np.array(self.det_model(frame)).reshape(-1,4)
+            self.nb_full_detections += 1
+        else:
+            bboxes = self.prev_bboxes
+        self.frame_cnt += 1
+
+        if len(bboxes) == 0: # same behavior as RTMLib: estimate pose on the whole frame
+            keypoints, scores = self.pose_model(frame, bboxes=[])
+            self.prev_bboxes = []
+            self.roi_pixel_fractions.append(1)
+            return keypoints, scores
+
+        # Estimate pose on each cropped and downscaled region
+        keypoints, scores, roi_pixels = [], [], 0
+        for x_min, y_min, x_max, y_max in bboxes:
+            # crop with a margin, as the pose model enlarges bounding boxes by 1.25
+            dx, dy = (x_max-x_min)*0.15, (y_max-y_min)*0.15
+            x0, y0 = int(max(x_min-dx, 0)), int(max(y_min-dy, 0))
+            x1, y1 = int(min(x_max+dx, W)), int(min(y_max+dy, H))
+            if x1-x0 < 2 or y1-y0 < 2:
+                continue
+            roi = frame[y0:y1, x0:x1]
+            roi_pixels += roi.shape[0] * roi.shape[1]
+            scale = min(1, self.roi_max_size / max(roi.shape[:2]))
+            if scale < 1:
+                roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            bbox_roi = [(x_min-x0)*scale, (y_min-y0)*scale, (x_max-x0)*scale, (y_max-y0)*scale]
+            kpts, scrs = self.pose_model(roi, bboxes=[bbox_roi])
+            keypoints.append(kpts[0] / scale + [x0, y0])
+            scores.append(scrs[0])
+        self.roi_pixel_fractions.append(min(roi_pixels / (H*W), 1))
+
+        if len(keypoints) == 0:
+            self.prev_bboxes = []
+            return self.pose_model(frame, bboxes=[])
+        keypoints, scores = np.array(keypoints), np.array(scores)
+
+        # Only keep track of persons who are still reliably detected, 
+        # and derive their next region from their confident keypoints only
+        prev_bboxes = []
+        for kpts, scrs in zip(keypoints, scores):
+            confident = scrs >= self.min_roi_score
+            if np.mean(scrs) < self.min_roi_score or np.sum(confident) < self.min_roi_keypoints:
+                continue
+            x_min, y_min, w, h = bbox_ltwh_compute(kpts[confident][np.newaxis], padding=self.roi_padding)[0]
+            prev_bboxes.append([x_min, y_min, x_min+w, y_min+h])
+        self.prev_bboxes = np.array(prev_bboxes).reshape(-1,4)
+
+        return keypoints, scores
+
+    def log_stats(self):
+        if self.frame_cnt == 0:
+            return
+        logging.info(f'--> ROI tracking: full-frame detection run on {self.nb_full_detections}/{self.frame_cnt} frames, '
+                     f'pose estimated on {np.mean(self.roi_pixel_fractions):.1%} of frame pixels on average.')
+
+
+class ImageFolderLoader():
+    '''
+    Load the images of a folder in natural order, while a pool of threads decodes the next ones
+    ahead of inference. At most queue_size decoded images are held in memory at once.
+    Images whose longest side is larger than max_size are downscaled on load.
+
+    USAGE:
+    image_loader = ImageFolderLoader(image_folder_path, '.png', frame_range=[0,100], max_size=1280)
+    for frame_idx, image_file, frame, scale in image_loader:
+        keypoints, scores = pose_tracker(frame)
+        keypoints_full_res = keypoints / scale
+    '''
+
+    def __init__(self, image_folder_path, vid_img_extension, frame_range=[], max_size=0, nb_workers=4, queue_size=16):
+        '''
+        INPUTS:
+        - image_folder_path: str. Path to the input image folder
+        - vid_img_extension: str. Extension of the image files
+        - frame_range: list. Range of frames to load, all of them if empty
+        - max_size: int. Longest side above which images are downscaled (px). 0 to disable
+        - nb_workers: int. Number of decoding threads
+        - queue_size: int. Maximum number of images decoded ahead
+        '''
+
+        self.image_files = sorted(glob.glob(os.path.join(image_folder_path, '*'+vid_img_extension)), key=natural_sort_key)
+        f_range = [[len(self.image_files)] if frame_range==[] else frame_range][0]
+        self.frame_indices = [f for f in range(*f_range) if f < len(self.image_files)]
+        self.max_size = max_size
+        self.nb_workers = max(1, min(nb_workers, os.cpu_count() or 1))
+        self.queue_size = max(1, queue_size)
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def load(self, image_file):
+        frame = cv2.imread(image_file)
+        if frame is None:
+            raise NameError(f"{image_file} is not an image. Videos must be put in the video directory, not in subdirectories.")
+        scale = 1
+        if self.max_size and max(frame.shape[:2]) > self.max_size:
+            scale = self.max_size / max(frame.shape[:2])
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return frame, scale
+
+    def __iter__(self):
+        frame_indices = iter(self.frame_indices)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.nb_workers) as executor:
+            try:
+                for frame_idx in it.islice(frame_indices, self.queue_size):
+                    pending.append((frame_idx, executor.submit(self.load, self.image_files[frame_idx])))
+                while pending:
+                    frame_idx, future = pending.popleft()
+                    next_frame_idx = next(frame_indices, None)
+                    if next_frame_idx is not None:
+                        pending.append((next_frame_idx, executor.submit(self.load, self.image_files[next_frame_idx])))
+                    frame, scale = future.result()
+                    yield frame_idx, self.image_files[frame_idx], frame, scale
+            finally: # stop decoding if the caller breaks out early
+                for _, future in pending:
+                    future.cancel()
+
+
+class PoseSessionCache():
+    '''
+    Keeps backends, pose trackers, and DeepSort trackers alive across trials of a same pipeline run,
+    so that torch/onnxruntime are only probed once and models are only loaded once.
+    Pose trackers are keyed by (model, mode, backend, device), and only reset between videos.
+
+    USAGE:
+    pose_session_cache = PoseSessionCache()
+    for config_dict in config_dicts:
+        estimate_pose_all(config_dict, pose_session_cache=pose_session_cache)
+    pose_session_cache.clear()
+    '''
+
+    def __init__(self):
+        self.backend_devices = {}
+        self.pose_trackers = {}
+        self.deepsort_trackers = {}
+
+    def get_backend_device(self, backend='auto', device='auto'):
+        key = (backend, device)
+        if key not in self.backend_devices:
+            self.backend_devices[key] = setup_backend_device(backend=backend, device=device)
+        return self.backend_devices[key]
+
+    def get_pose_tracker(self, ModelClass, det_frequency, mode, backend, device, model_name):
+        key = (model_name, str(mode), backend, device)
+        if key in self.pose_trackers:
+            pose_tracker = self.pose_trackers[key]
+            pose_tracker.det_frequency = det_frequency
+            logging.info(f'--> Reusing {model_name} models already loaded with {backend} on {device}.')
+        else:
+            start = time.time()
+            pose_tracker = setup_pose_tracker(ModelClass, det_frequency, mode, False, backend, device)
+            self.pose_trackers[key] = pose_tracker
+            logging.info(f'--> {model_name} models loaded with {backend} on {device} in {time.time()-start:.2f} s.')
+        return pose_tracker
+
+    def get_deepsort_tracker(self, deepsort_params):
+        key = json.dumps(deepsort_params, sort_keys=True, default=str)
+        if key not in self.deepsort_trackers:
+            self.deepsort_trackers[key] = DeepSort(**deepsort_params)
+        return self.deepsort_trackers[key]
+
+    def clear(self):
+        self.backend_devices.clear()
+        self.pose_trackers.clear()
+        self.deepsort_trackers.clear()
+
+
 ## FUNCTIONS
 def setup_pose_tracker(ModelClass, det_frequency, mode, tracking, backend, device):
     '''
@@ -163,9 +392,7 @@ def save_to_openpose(json_file_path, keypoints, scores):
     # print('results: ', keypoints, scores)
     detections = []
     for i in range(nb_detections): # nb of detected people
-        keypoints_with_confidence_i = []
-        for kp, score in zip(keypoints[i], scores[i]):
-            keypoints_with_confidence_i.extend([kp[0].item(), kp[1].item(), score.item()])
+        keypoints_with_confidence_i = np.column_stack((keypoints[i][:,:2], scores[i])).ravel().tolist()
         detections.append({
                     "person_id": [-1],
                     "pose_keypoints_2d": keypoints_with_confidence_i,
@@ -196,7 +423,7 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
     - video_path: str. Path to the input video file
     - pose_tracker: PoseTracker. Initialized pose tracker object from RTMLib
     - pose_model: str. The pose model to use for pose estimation (HALPE_26, COCO_133, COCO_17)
-    - output_format: str. Output format for the pose estimation results ('openpose', 'mmpose', 'deeplabcut')
+    - output_format: list of str. Output formats for the pose estimation results ('openpose', 'jsonl', 'npz')
     - save_video: bool. Whether to save the output video
     - save_images: bool. Whether to save the output images
     - display_detection: bool. Whether to show real-time visualization
@@ -207,6 +434,7 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
 
     OUTPUTS:
     - JSON files with the detected keypoints and confidence scores in the OpenPose format
+    - if 'jsonl' or 'npz' in output_format: a single file per camera with the keypoints and scores of all frames
     - if save_video: Video file with the detected keypoints and confidence scores drawn on the frames
     - if save_images: Image files with the detected keypoints and confidence scores drawn on the frames
     '''
@@ -235,6 +463,8 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
     if display_detection:
         cv2.namedWindow(f"Pose Estimation {os.path.basename(video_path)}", cv2.WINDOW_NORMAL + cv2.WINDOW_KEEPRATIO)
 
+    bulk_writers = [BulkPoseWriter(f'{json_output_dir}.{f}', f) for f in output_format if f in ('jsonl', 'npz')]
+
     frame_idx = 0
     cap = cv2.VideoCapture(video_path)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -264,6 +494,8 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
                 if 'openpose' in output_format:
                     json_file_path = os.path.join(json_output_dir, f'{video_name_wo_ext}_{frame_idx:06d}.json')
                     save_to_openpose(json_file_path, keypoints, scores)
+                for bulk_writer in bulk_writers:
+                    bulk_writer.write(frame_idx, keypoints, scores)
 
                 # Draw skeleton on the frame
                 if display_detection or save_video or save_images:
@@ -300,6 +532,11 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
             pbar.update(1)
 
     cap.release()
+    for bulk_writer in bulk_writers:
+        bulk_writer.close()
+        logging.info(f"--> Poses saved to {bulk_writer.file_path}.")
+    if isinstance(pose_tracker, RoiPoseTracker):
+        pose_tracker.log_stats()
     if save_video:
         out.release()
         logging.info(f"--> Output video saved to {output_video_path}.")
@@ -309,7 +546,7 @@ def process_video(video_path, pose_tracker, pose_model, output_format, save_vide
         cv2.destroyAllWindows()
 
 
-def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_model, output_format, fps, save_video, save_images, display_detection, frame_range, multi_person, tracking_mode, deepsort_tracker):
+def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_model, output_format, fps, save_video, save_images, display_detection, frame_range, multi_person, tracking_mode, deepsort_tracker, image_max_size=0):
     '''
     Estimate pose estimation from a folder of images
     
@@ -318,7 +555,7 @@ def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_mode
     - vid_img_extension: str. Extension of the image files
     - pose_tracker: PoseTracker. Initialized pose tracker object from RTMLib
     - pose_model: str. The pose model to use for pose estimation (HALPE_26, COCO_133, COCO_17)
-    - output_format: str. Output format for the pose estimation results ('openpose', 'mmpose', 'deeplabcut')
+    - output_format: list of str. Output formats for the pose estimation results ('openpose', 'jsonl', 'npz')
     - save_video: bool. Whether to save the output video
     - save_images: bool. Whether to save the output images
     - display_detection: bool. Whether to show real-time visualization
@@ -326,9 +563,11 @@ def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_mode
     - multi_person: bool. Whether to detect multiple people in the video
     - tracking_mode: str. The tracking mode to use for person tracking (deepsort, sports2d)
     - deepsort_tracker: DeepSort tracker object or None
+    - image_max_size: int. Images whose longest side is larger are downscaled on load (px). 0 to disable
 
     OUTPUTS:
     - JSON files with the detected keypoints and confidence scores in the OpenPose format
+    - if 'jsonl' or 'npz' in output_format: a single file per camera with the keypoints and scores of all frames
     - if save_video: Video file with the detected keypoints and confidence scores drawn on the frames
     - if save_images: Image files with the detected keypoints and confidence scores drawn on the frames
     '''    
@@ -339,74 +578,78 @@ def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_mode
     output_video_path = os.path.join(pose_dir, f'{os.path.basename(image_folder_path)}_pose.mp4')
     img_output_dir = os.path.join(pose_dir, f'{os.path.basename(image_folder_path)}_img')
 
-    image_files = glob.glob(os.path.join(image_folder_path, '*'+vid_img_extension))
-    sorted(image_files, key=natural_sort_key)
+    # Images are sorted and decoded ahead of inference
+    image_loader = ImageFolderLoader(image_folder_path, vid_img_extension, frame_range=frame_range, max_size=image_max_size)
 
     if save_video: # Set up video writer
         logging.warning('Using default framerate of 60 fps.')
         fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Codec for the output video
-        W, H = cv2.imread(image_files[0]).shape[:2][::-1] # Get the width and height from the first image (assuming all images have the same size)
+        W, H = image_loader.load(image_loader.image_files[0])[0].shape[:2][::-1] # Get the width and height from the first image (assuming all images have the same size)
         out = cv2.VideoWriter(output_video_path, fourcc, fps, (W, H)) # Create the output video file
 
     if display_detection:
         cv2.namedWindow(f"Pose Estimation {os.path.basename(image_folder_path)}", cv2.WINDOW_NORMAL)
+
+    bulk_writers = [BulkPoseWriter(f'{json_output_dir}.{f}', f) for f in output_format if f in ('jsonl', 'npz')]
     
-    f_range = [[len(image_files)] if frame_range==[] else frame_range][0]
-    for frame_idx, image_file in enumerate(tqdm(image_files, desc=f'\nProcessing {os.path.basename(img_output_dir)}')):
-        if frame_idx in range(*f_range):
+    for frame_idx, image_file, frame, scale in tqdm(image_loader, desc=f'\nProcessing {os.path.basename(img_output_dir)}'):
+        frame_idx += 1
+        
+        # Detect poses
+        keypoints, scores = pose_tracker(frame)
+
+        # Track poses across frames
+        if multi_person:
+            if tracking_mode == 'deepsort':
+                keypoints, scores = sort_people_deepsort(keypoints, scores, deepsort_tracker, frame, frame_idx)
+            if tracking_mode == 'sports2d': 
+                if 'prev_keypoints' not in locals(): prev_keypoints = keypoints
+                prev_keypoints, keypoints, scores = sort_people_sports2d(prev_keypoints, keypoints, scores=scores)
+                
+        # Extract frame number from the filename
+        keypoints_full_res = keypoints / scale if scale != 1 else keypoints # saved in original image coordinates
+        if 'openpose' in output_format:
+            json_file_path = os.path.join(json_output_dir, f"{os.path.splitext(os.path.basename(image_file))[0]}_{frame_idx:06d}.json")
+            save_to_openpose(json_file_path, keypoints_full_res, scores)
+        for bulk_writer in bulk_writers:
+            bulk_writer.write(frame_idx, keypoints_full_res, scores)
+
+        # Draw skeleton on the image
+        if display_detection or save_video or save_images:
             try:
-                frame = cv2.imread(image_file)
-                frame_idx += 1
+                # MMPose skeleton
+                img_show = frame.copy()
+                img_show = draw_skeleton(img_show, keypoints, scores, kpt_thr=0.1) # maybe change this value if 0.1 is too low
             except:
-                raise NameError(f"{image_file} is not an image. Videos must be put in the video directory, not in subdirectories.")
-            
-            # Detect poses
-            keypoints, scores = pose_tracker(frame)
-
-            # Track poses across frames
-            if multi_person:
-                if tracking_mode == 'deepsort':
-                    keypoints, scores = sort_people_deepsort(keypoints, scores, deepsort_tracker, frame, frame_idx)
-                if tracking_mode == 'sports2d': 
-                    if 'prev_keypoints' not in locals(): prev_keypoints = keypoints
-                    prev_keypoints, keypoints, scores = sort_people_sports2d(prev_keypoints, keypoints, scores=scores)
-                    
-            # Extract frame number from the filename
-            if 'openpose' in output_format:
-                json_file_path = os.path.join(json_output_dir, f"{os.path.splitext(os.path.basename(image_file))[0]}_{frame_idx:06d}.json")
-                save_to_openpose(json_file_path, keypoints, scores)
-
-            # Draw skeleton on the image
-            if display_detection or save_video or save_images:
-                try:
-                    # MMPose skeleton
-                    img_show = frame.copy()
-                    img_show = draw_skeleton(img_show, keypoints, scores, kpt_thr=0.1) # maybe change this value if 0.1 is too low
-                except:
-                    # Sports2D skeleton
-                    valid_X, valid_Y, valid_scores = [], [], []
-                    for person_keypoints, person_scores in zip(keypoints, scores):
-                        person_X, person_Y = person_keypoints[:, 0], person_keypoints[:, 1]
-                        valid_X.append(person_X)
-                        valid_Y.append(person_Y)
-                        valid_scores.append(person_scores)
-                    img_show = frame.copy()
-                    img_show = draw_bounding_box(img_show, valid_X, valid_Y, colors=colors, fontSize=2, thickness=thickness)
-                    img_show = draw_keypts(img_show, valid_X, valid_Y, valid_scores, cmap_str='RdYlGn')
-                    img_show = draw_skel(img_show, valid_X, valid_Y, pose_model)
-
-            if display_detection:
-                cv2.imshow(f"Pose Estimation {os.path.basename(image_folder_path)}", img_show)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-
-            if save_video:
-                out.write(img_show)
-
-            if save_images:
-                if not os.path.isdir(img_output_dir): os.makedirs(img_output_dir)
-                cv2.imwrite(os.path.join(img_output_dir, f'{os.path.splitext(os.path.basename(image_file))[0]}_{frame_idx:06d}.png'), img_show)
+                # Sports2D skeleton
+                valid_X, valid_Y, valid_scores = [], [], []
+                for person_keypoints, person_scores in zip(keypoints, scores):
+                    person_X, person_Y = person_keypoints[:, 0], person_keypoints[:, 1]
+                    valid_X.append(person_X)
+                    valid_Y.append(person_Y)
+                    valid_scores.append(person_scores)
+                img_show = frame.copy()
+                img_show = draw_bounding_box(img_show, valid_X, valid_Y, colors=colors, fontSize=2, thickness=thickness)
+                img_show = draw_keypts(img_show, valid_X, valid_Y, valid_scores, cmap_str='RdYlGn')
+                img_show = draw_skel(img_show, valid_X, valid_Y, pose_model)
+
+        if display_detection:
+            cv2.imshow(f"Pose Estimation {os.path.basename(image_folder_path)}", img_show)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+        if save_video:
+            out.write(img_show)
 
+        if save_images:
+            if not os.path.isdir(img_output_dir): os.makedirs(img_output_dir)
+            cv2.imwrite(os.path.join(img_output_dir, f'{os.path.splitext(os.path.basename(image_file))[0]}_{frame_idx:06d}.png'), img_show)
+
+    for bulk_writer in bulk_writers:
+        bulk_writer.close()
+        logging.info(f"--> Poses saved to {bulk_writer.file_path}.")
+    if isinstance(pose_tracker, RoiPoseTracker):
+        pose_tracker.log_stats()
     if save_video:
         logging.info(f"--> Output video saved to {output_video_path}.")
     if save_images:
@@ -415,7 +658,7 @@ def process_images(image_folder_path, vid_img_extension, pose_tracker, pose_mode
         cv2.destroyAllWindows()
 
 
-def estimate_pose_all(config_dict):
+def estimate_pose_all(config_dict, pose_session_cache=None):
     '''
     Estimate pose from a video file or a folder of images and 
     write the results to JSON files, videos, and/or images.
@@ -431,9 +674,13 @@ def estimate_pose_all(config_dict):
     If a valid cuda installation is detected, uses the GPU with the ONNXRuntime backend. Otherwise, 
     uses the CPU with the OpenVINO backend.
 
+    In batch mode, backends and models are loaded once and reused across trials 
+    if the same pose_session_cache is passed to every call.
+
     INPUTS:
     - videos or image folders from the video directory
     - a Config.toml file
+    - pose_session_cache: PoseSessionCache or None. Shares loaded models across calls
 
     OUTPUTS:
     - JSON files with the detected keypoints and confidence scores in the OpenPose format
@@ -456,11 +703,15 @@ def estimate_pose_all(config_dict):
     vid_img_extension = config_dict['pose']['vid_img_extension']
     
     output_format = config_dict['pose']['output_format']
+    output_format = [output_format] if isinstance(output_format, str) else output_format
     save_video = True if 'to_video' in config_dict['pose']['save_video'] else False
     save_images = True if 'to_images' in config_dict['pose']['save_video'] else False
     display_detection = config_dict['pose']['display_detection']
     overwrite_pose = config_dict['pose']['overwrite_pose']
     det_frequency = config_dict['pose']['det_frequency']
+    roi_tracking = config_dict.get('pose').get('roi_tracking', False)
+    roi_max_size = config_dict.get('pose').get('roi_max_size', 512)
+    image_max_size = config_dict.get('pose').get('image_max_size', 0)
     tracking_mode = config_dict.get('pose').get('tracking_mode')
     if tracking_mode == 'deepsort' and multi_person:
         deepsort_params = config_dict.get('pose').get('deepsort_params')
@@ -470,7 +721,7 @@ def estimate_pose_all(config_dict):
             deepsort_params = deepsort_params.strip("'").replace('\n', '').replace(" ", "").replace(",", '", "').replace(":", '":"').replace("{", '{"').replace("}", '"}').replace('":"/',':/').replace('":"\\',':\\')
             deepsort_params = re.sub(r'"\[([^"]+)",\s?"([^"]+)\]"', r'[\1,\2]', deepsort_params) # changes "[640", "640]" to [640,640]
             deepsort_params = json.loads(deepsort_params)
-        deepsort_tracker = DeepSort(**deepsort_params)
+        deepsort_tracker = DeepSort(**deepsort_params) if pose_session_cache is None else pose_session_cache.get_deepsort_tracker(deepsort_params)
     else:
         deepsort_tracker = None
     backend = config_dict['pose']['backend']
@@ -538,7 +789,9 @@ def estimate_pose_all(config_dict):
             raise NameError(f'{pose_model} not found in skeletons.py nor in Config.toml')
 
     # Select device and backend
-    backend, device = setup_backend_device(backend=backend, device=device)
+    if pose_session_cache is None:
+        pose_session_cache = PoseSessionCache()
+    backend, device = pose_session_cache.get_backend_device(backend=backend, device=device)
 
     # Manually select the models if mode is a dictionary rather than 'lightweight', 'balanced', or 'performance'
     if not mode in ['lightweight', 'balanced', 'performance'] or 'ModelClass' not in locals():
@@ -569,8 +822,8 @@ def estimate_pose_all(config_dict):
 
     # Estimate pose
     try:
-        pose_listdirs_names = next(os.walk(pose_dir))[1]
-        os.listdir(os.path.join(pose_dir, pose_listdirs_names[0]))[0]
+        json_dirs_names = list_json_dirs(pose_dir)
+        list_json_files(os.path.join(pose_dir, json_dirs_names[0]))[0]
         if not overwrite_pose:
             logging.info('Skipping pose estimation as it has already been done. Set overwrite_pose to true in Config.toml if you want to run it again.')
         else:
@@ -580,10 +833,16 @@ def estimate_pose_all(config_dict):
     except:
         # Set up pose tracker
         try:
-            pose_tracker = setup_pose_tracker(ModelClass, det_frequency, mode, False, backend, device)
+            pose_tracker = pose_session_cache.get_pose_tracker(ModelClass, det_frequency, mode, backend, device, model_name)
         except:
             logging.error('Error: Pose estimation failed. Check in Config.toml that pose_model and mode are valid.')
             raise ValueError('Error: Pose estimation failed. Check in Config.toml that pose_model and mode are valid.')
+        if roi_tracking:
+            try:
+                pose_tracker = RoiPoseTracker(pose_tracker, det_frequency=det_frequency, roi_max_size=roi_max_size)
+                logging.info(f'ROI tracking: full-frame detection only every {det_frequency} frames or when persons are lost. Regions larger than {roi_max_size} px are downscaled.')
+            except ValueError as e:
+                logging.warning(f'{e} Running pose estimation on full frames.')
 
         if tracking_mode not in ['deepsort', 'sports2d']:
             logging.warning(f"Tracking mode {tracking_mode} not recognized. Using sports2d method.")
@@ -609,4 +868,4 @@ def estimate_pose_all(config_dict):
                 pose_tracker.reset()
                 image_folder_path = os.path.join(video_dir, image_folder)
                 if tracking_mode == 'deepsort': deepsort_tracker.tracker.delete_all_tracks()                
-                process_images(image_folder_path, vid_img_extension, pose_tracker, pose_model, output_format, frame_rate, save_video, save_images, display_detection, frame_range, multi_person, tracking_mode, deepsort_tracker)
+                process_images(image_folder_path, vid_img_extension, pose_tracker, pose_model, output_format, frame_rate, save_video, save_images, display_detection, frame_range, multi_person, tracking_mode, deepsort_tracker, image_max_size=image_max_size)
@@ -39,17 +39,22 @@ from matplotlib.widgets import Slider
 from matplotlib import patheffects
 from scipy import signal
 import json
+import toml
 import os
 import glob
-import fnmatch
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import OrderedDict
 from anytree import RenderTree
 from anytree.importer import DictImporter
 from matplotlib.widgets import TextBox, Button
 import logging
 
-from Pose2Sim.common import sort_stringlist_by_last_number, bounding_boxes, interpolate_zeros_nans
+from Pose2Sim.common import sort_stringlist_by_last_number, bounding_boxes, \
+    list_json_dirs, list_json_files, read_pose_json, sync_json_name, sync_manifest_name, BulkPoseWriter, \
+    sync_state_name, sync_cache_name
 from Pose2Sim.skeletons import *
 
 
@@ -830,7 +835,7 @@ def keypoints_ui(keypoints_to_consider, keypoints_names):
     return selected_keypoints
 
 
-def person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_range_around_maxspeed, fps, cam_index, frame_to_json, pose_dir, json_dirs_names):
+def person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_range_around_maxspeed, fps, cam_index, frame_to_json, pose_dir, json_dirs_names, display_scale=1):
     '''
     Step 2: Initializes the UI for person and frame selection.
     
@@ -845,13 +850,14 @@ def person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_rang
     - frame_to_json: Mapping from frame numbers to JSON files
     - pose_dir: Directory containing pose data
     - json_dirs_names: Names of JSON directories for each camera
+    - display_scale: Ratio between the displayed frame size and the original one
     
     OUTPUTS:
     - ui: Dictionary containing all UI elements and state
     '''
     
-    # Set up UI based on frame size and orientation
-    frame_height, frame_width = frame_rgb.shape[:2]
+    # Set up UI based on original frame size and orientation
+    frame_height, frame_width = [d / display_scale for d in frame_rgb.shape[:2]]
     is_vertical = frame_height > frame_width
     
     # Calculate appropriate figure height based on video orientation
@@ -979,7 +985,7 @@ def person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_rang
     return ui
 
 
-def select_person(vid_or_img_files, cam_names, json_files_names_range, search_around_frames, pose_dir, json_dirs_names, keypoints_names, keypoints_to_consider, time_range_around_maxspeed, fps):
+def select_person(vid_or_img_files, cam_names, json_files_names_range, search_around_frames, pose_dir, json_dirs_names, keypoints_names, keypoints_to_consider, time_range_around_maxspeed, fps, display_max_size=0):
     '''
     This function manages the process of selecting keypoints and persons for each camera.
     It performs two main steps:
@@ -996,6 +1002,7 @@ def select_person(vid_or_img_files, cam_names, json_files_names_range, search_ar
     - keypoints_names: Names of keypoints to consider
     - time_range_around_maxspeed: Time range to consider around max speed
     - fps: Frames per second of the videos
+    - display_max_size: Maximum width or height of displayed frames. 0 for full resolution
 
     OUTPUTS:
     - selected_id_list: List of selected person IDs for each camera
@@ -1039,18 +1046,18 @@ def select_person(vid_or_img_files, cam_names, json_files_names_range, search_ar
 
         frame_to_json = {int(re.split(r'(\d+)', name)[-2]): name for name in json_files_names_range[i]}
         frame_number = search_around_frames[i][0]
+        cap = SyncFrameCache(cap, search_around_frames[i], frame_to_json, pose_dir, json_dirs_names[i], display_max_size=display_max_size)
 
         frame_rgb, bounding_boxes_list = load_frame_and_bounding_boxes(cap, frame_number, frame_to_json, pose_dir, json_dirs_names[i])
         if frame_rgb is None:
             logging.warning(f'Cannot read frame {frame_number} from video {vid_or_img_files_cam}')
             selected_id_list.append(None)
             time_RAM_list.append(time_range_around_maxspeed)  # Use default value for missing cameras
-            if isinstance(cap, cv2.VideoCapture):
-                cap.release()
+            cap.release()
             continue
         
         # Initialize UI for person/frame selection only (no keypoint selection)
-        ui = person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_range_around_maxspeed, fps, i, frame_to_json, pose_dir, json_dirs_names)
+        ui = person_ui(frame_rgb, cam_name, frame_number, search_around_frames, time_range_around_maxspeed, fps, i, frame_to_json, pose_dir, json_dirs_names, display_scale=cap.scale)
         ui['cap'] = cap
         
         # Draw initial bounding boxes
@@ -1100,6 +1107,128 @@ def select_person(vid_or_img_files, cam_names, json_files_names_range, search_ar
     return selected_id_list, keypoints_to_consider, approx_time_maxspeed, time_RAM_list
 
 
+# FRAME CACHE
+class SyncFrameCache():
+    '''
+    Frames and bounding boxes of one camera, for the synchronization GUI.
+    Bounding boxes of the whole search window are loaded once. Frames are kept in 
+    an LRU cache, which a background thread fills by decoding the frames around 
+    the last requested one sequentially, so that scrubbing does not seek every time.
+    Frames can be downscaled for display, in which case bounding boxes are scaled accordingly.
+
+    INPUTS:
+    - cap: cv2.VideoCapture object or list of image file paths
+    - frame_range: [start, end] frame numbers of the search window (end included)
+    - frame_to_json: dict. Mapping from frame numbers to JSON file names
+    - pose_dir: str. Path to the directory containing pose data
+    - json_dir_name: str. Name of the JSON directory for the camera
+    - display_max_size: int. Maximum width or height of displayed frames. 0 for full resolution
+    - cache_size_mb: int. Memory budget of the frame cache
+    - prefetch_radius: int. Number of frames prefetched on each side of the requested one
+
+    OUTPUTS (get method):
+    - frame_rgb: The RGB image of the frame, or None if it cannot be read
+    - bounding_boxes_list: List of bounding boxes for the frame
+    '''
+
+    def __init__(self, cap, frame_range, frame_to_json, pose_dir, json_dir_name, display_max_size=0, cache_size_mb=1024, prefetch_radius=60):
+        self.cap = cap
+        self.frame_range = [frame_range[0], frame_range[1]]
+        self.display_max_size = display_max_size
+        self.cache_size_mb = cache_size_mb
+        self.prefetch_radius = prefetch_radius
+        self.scale = 1
+        self.cache_size = None # number of frames, known once a frame has been read
+        self.frames = OrderedDict()
+        self.cap_lock = threading.Lock() # cap is shared with the prefetch thread
+        self.frames_lock = threading.Lock()
+        self.next_frame = None # position of the video capture
+        self.generation = 0 # older prefetch requests stop when a new one comes
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Preload bounding boxes of the whole window
+        self.bounding_boxes = {frame: bounding_boxes(os.path.join(pose_dir, json_dir_name, json_file_name)) 
+                               for frame, json_file_name in frame_to_json.items()}
+
+    def read(self, frame_number):
+        '''
+        Decode one frame, only seeking if it is not the next one in the video.
+        '''
+
+        with self.cap_lock:
+            if isinstance(self.cap, cv2.VideoCapture):
+                if self.next_frame != frame_number:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                ret, frame = self.cap.read()
+                self.next_frame = frame_number + 1 if ret else None
+                if not ret:
+                    return None
+            elif isinstance(self.cap, list):
+                if frame_number >= len(self.cap):
+                    return None
+                frame = cv2.imread(self.cap[frame_number])
+                if frame is None:
+                    return None
+            else:
+                raise ValueError("Input must be either a video capture object or a list of image file paths.")
+
+        if self.cache_size is None:
+            h, w = frame.shape[:2]
+            if self.display_max_size and max(h, w) > self.display_max_size:
+                self.scale = self.display_max_size / max(h, w)
+            frame_bytes = frame.nbytes * self.scale**2
+            self.cache_size = max(int(self.cache_size_mb * 1024**2 / frame_bytes), 2*self.prefetch_radius + 1)
+        if self.scale != 1:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def store(self, frame_number, frame_rgb):
+        with self.frames_lock:
+            self.frames[frame_number] = frame_rgb
+            self.frames.move_to_end(frame_number)
+            while len(self.frames) > self.cache_size:
+                self.frames.popitem(last=False)
+
+    def prefetch(self, frame_numbers, generation):
+        for frame_number in frame_numbers:
+            if generation != self.generation:
+                return
+            with self.frames_lock:
+                if frame_number in self.frames:
+                    continue
+            frame_rgb = self.read(frame_number)
+            if frame_rgb is None:
+                return
+            self.store(frame_number, frame_rgb)
+
+    def get(self, frame_number):
+        with self.frames_lock:
+            frame_rgb = self.frames.get(frame_number)
+            if frame_rgb is not None:
+                self.frames.move_to_end(frame_number)
+        if frame_rgb is None:
+            frame_rgb = self.read(frame_number)
+            if frame_rgb is None:
+                return None, []
+            self.store(frame_number, frame_rgb)
+
+        # Prefetch frames after, then before the requested one
+        self.generation += 1
+        start, end = self.frame_range
+        after = range(frame_number+1, min(frame_number+self.prefetch_radius, end)+1)
+        before = range(max(frame_number-self.prefetch_radius, start), frame_number)
+        self.executor.submit(self.prefetch, list(after) + list(before), self.generation)
+
+        bounding_boxes_list = [[coord*self.scale for coord in bbox] for bbox in self.bounding_boxes.get(frame_number, [])]
+        return frame_rgb, bounding_boxes_list
+
+    def release(self):
+        self.generation += 1
+        self.executor.shutdown(wait=True)
+        if isinstance(self.cap, cv2.VideoCapture):
+            self.cap.release()
+
+
 # SYNC FUNCTIONS
 def load_frame_and_bounding_boxes(cap, frame_number, frame_to_json, pose_dir, json_dir_name):
     '''
@@ -1107,7 +1236,7 @@ def load_frame_and_bounding_boxes(cap, frame_number, frame_to_json, pose_dir, js
     load the frame (or image) and corresponding bounding boxes.
 
     INPUTS:
-    - cap: cv2.VideoCapture object or list of image file paths.
+    - cap: SyncFrameCache, cv2.VideoCapture object or list of image file paths.
     - frame_number: int. The frame number to load.
     - frame_to_json: dict. Mapping from frame numbers to JSON file names.
     - pose_dir: str. Path to the directory containing pose data.
@@ -1118,8 +1247,12 @@ def load_frame_and_bounding_boxes(cap, frame_number, frame_to_json, pose_dir, js
     - bounding_boxes_list: List of bounding boxes for the frame/image.
     '''
 
+    # Case 0: Frames and bounding boxes are cached
+    if isinstance(cap, SyncFrameCache):
+        return cap.get(frame_number)
+
     # Case 1: If input is a video file (cv2.VideoCapture object)
-    if isinstance(cap, cv2.VideoCapture):
+    elif isinstance(cap, cv2.VideoCapture):
         cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
         ret, frame = cap.read()
         if not ret:
@@ -1149,6 +1282,68 @@ def load_frame_and_bounding_boxes(cap, frame_number, frame_to_json, pose_dir, js
     return frame_rgb, bounding_boxes_list
 
 
+def read_json_keypoints(json_file, keypoints_ids):
+    '''
+    Read the selected keypoints of all persons of one json file.
+
+    INPUTS:
+    - json_file: str. Path of the json file
+    - keypoints_ids: list of int. Indices of the keypoints to extract
+
+    OUTPUTS:
+    - keypoints: array of shape (persons, keypoints, 3). x, y, likelihood. NaN for persons without keypoints
+    - has_keypoints: array of bool of shape (persons,). False for persons without keypoints
+    '''
+
+    try:
+        people = read_pose_json(json_file)['people']
+        keypoints = np.full((len(people), len(keypoints_ids), 3), np.nan)
+        has_keypoints = np.zeros(len(people), dtype=bool)
+        for p, person in enumerate(people):
+            if 'pose_keypoints_2d' in person:
+                keypoints[p] = np.asarray(person['pose_keypoints_2d'], dtype=float).reshape(-1,3)[keypoints_ids]
+                has_keypoints[p] = True
+    except: # missing or malformed file: no person on this frame
+        keypoints, has_keypoints = np.full((0, len(keypoints_ids), 3), np.nan), np.zeros(0, dtype=bool)
+    return keypoints, has_keypoints
+
+
+def load_json_keypoints(json_files, keypoints_ids, nb_workers=8):
+    '''
+    Read a range of json files of a camera in parallel threads, 
+    into a single array padded with NaN for missing persons.
+
+    INPUTS:
+    - json_files: list of str. Paths of the json files, one per frame
+    - keypoints_ids: list of int. Indices of the keypoints to extract
+    - nb_workers: int. Number of reading threads
+
+    OUTPUTS:
+    - keypoints: array of shape (frames, persons, keypoints, 3). x, y, likelihood
+    - person_status: array of int of shape (frames, persons). 1 if the person has keypoints, 
+      0 if it is listed without keypoints, -1 for padding
+    '''
+
+    # One contiguous chunk of files per thread, to limit scheduling overhead
+    nb_workers = max(1, min(nb_workers, os.cpu_count() or 1, len(json_files)))
+    read_chunk = lambda chunk: [read_json_keypoints(j_p, keypoints_ids) for j_p in chunk]
+    if nb_workers == 1:
+        frames = read_chunk(json_files)
+    else:
+        chunks = [json_files[i*len(json_files)//nb_workers : (i+1)*len(json_files)//nb_workers] for i in range(nb_workers)]
+        with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+            chunks_frames = list(executor.map(read_chunk, chunks))
+        frames = [frame for chunk_frames in chunks_frames for frame in chunk_frames]
+
+    max_persons = max([len(kpts) for kpts, _ in frames], default=0)
+    keypoints = np.full((len(json_files), max_persons, len(keypoints_ids), 3), np.nan)
+    person_status = np.full((len(json_files), max_persons), -1, dtype=int)
+    for f, (kpts, has_kpts) in enumerate(frames):
+        keypoints[f, :len(kpts)] = kpts
+        person_status[f, :len(kpts)] = has_kpts
+    return keypoints, person_status
+
+
 def convert_json2pandas(json_files, likelihood_threshold=0.6, keypoints_ids=[], synchronization_gui=False, selected_id=None):
     '''
     Convert a list of JSON files to a pandas DataFrame.
@@ -1164,48 +1359,36 @@ def convert_json2pandas(json_files, likelihood_threshold=0.6, keypoints_ids=[],
     '''
 
     nb_coords = len(keypoints_ids)
-    json_coords = []
-    for j_p in json_files:
-        with open(j_p) as j_f:
-            try:
-                json_data_all = json.load(j_f)['people']
-
-                # # previous approach takes person #0
-                # json_data = json_data_all[0]
-                # json_data = np.array([json_data['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])
-                
-                # # approach based on largest mean confidence does not work if person in background is better detected
-                # p_conf = [np.mean(np.array([p['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])[:, 2])
-                #         if 'pose_keypoints_2d' in p else 0
-                #         for p in json_data_all]
-                # max_confidence_person = json_data_all[np.argmax(p_conf)]
-                # json_data = np.array([max_confidence_person['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])
-
-                # latest approach: uses person with largest bounding box
-                if not synchronization_gui:
-                    bbox_area = [
-                                (keypoints[:, 0].max() - keypoints[:, 0].min()) * (keypoints[:, 1].max() - keypoints[:, 1].min())
-                                if 'pose_keypoints_2d' in p else 0
-                                for p in json_data_all
-                                for keypoints in [np.array([p['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])]
-                                ]
-                    max_area_person = json_data_all[np.argmax(bbox_area)]
-                    json_data = np.array([max_area_person['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])
-
-                elif synchronization_gui:
-                    if selected_id is not None: # We can sfely assume that selected_id is always not greater than len(json_data_all) because padding with 0 was done in the previous step
-                        selected_person = json_data_all[selected_id]
-                        json_data = np.array([selected_person['pose_keypoints_2d'][3*i:3*i+3] for i in keypoints_ids])
-                    else:
-                        json_data = [np.nan] * nb_coords * 3
-                
-                # Remove points with low confidence
-                json_data = np.array([j if j[2]>likelihood_threshold else [np.nan, np.nan, np.nan] for j in json_data]).ravel().tolist() 
-            except:
-                # print(f'No person found in {os.path.basename(json_dir)}, frame {i}')
-                json_data = [np.nan] * nb_coords*3
-        json_coords.append(json_data)
-    df_json_coords = pd.DataFrame(json_coords)
+    keypoints, person_status = load_json_keypoints(json_files, keypoints_ids)
+    nb_frames, nb_persons = person_status.shape
+
+    if nb_persons == 0:
+        json_coords = np.full((nb_frames, nb_coords, 3), np.nan)
+    else:
+        if not synchronization_gui:
+            # uses person with largest bounding box 
+            # (largest mean confidence does not work if person in background is better detected)
+            with np.errstate(invalid='ignore'):
+                bbox_area = (keypoints[...,0].max(axis=2) - keypoints[...,0].min(axis=2)) * (keypoints[...,1].max(axis=2) - keypoints[...,1].min(axis=2))
+            bbox_area = np.where(person_status==1, bbox_area, 0)
+            bbox_area = np.where(person_status==-1, -np.inf, bbox_area)
+            person_ids = np.argmax(bbox_area, axis=1)
+        else:
+            # We can safely assume that selected_id is always not greater than the number of persons because padding with 0 was done in the previous step
+            person_ids = np.full(nb_frames, selected_id if selected_id is not None and 0 <= selected_id < nb_persons else 0)
+
+        frames_ids = np.arange(nb_frames)
+        json_coords = keypoints[frames_ids, person_ids]
+        # No person on frame, person listed without keypoints, or no person selected
+        valid_person = person_status[frames_ids, person_ids] == 1
+        if synchronization_gui and (selected_id is None or not 0 <= selected_id < nb_persons):
+            valid_person[:] = False
+        json_coords[~valid_person] = np.nan
+
+    # Remove points with low confidence
+    with np.errstate(invalid='ignore'):
+        json_coords[~(json_coords[...,2] > likelihood_threshold)] = np.nan
+    df_json_coords = pd.DataFrame(json_coords.reshape(nb_frames, nb_coords*3))
 
     if df_json_coords.isnull().all().all():
         logging.error('No valid coordinates found in the JSON files. There may be a mismatch between the "pose_model" specified for pose estimation and for synchronization. If not, make sure that your likelihood_threshold for synchronization is not set too high.')
@@ -1214,45 +1397,169 @@ def convert_json2pandas(json_files, likelihood_threshold=0.6, keypoints_ids=[],
     return df_json_coords
 
 
-def drop_col(df, col_nb):
+def interpolate_fill(coords):
     '''
-    Drops every nth column from a DataFrame.
+    Linearly interpolate missing coordinates (NaN or zero) of each column,
+    and extrapolate them linearly on the edges.
+    Columns with 4 valid values or fewer are only back- and forward-filled.
+    Same as interpolate_zeros_nans(col, 'linear') followed by bfill().ffill().
 
     INPUTS:
-    - df: dataframe. The DataFrame from which columns will be dropped.
-    - col_nb: int. The column number to drop.
+    - coords: array of shape (frames, columns)
 
     OUTPUTS:
-    - dataframe: DataFrame with dropped columns.
+    - coords_filled: array of shape (frames, columns)
+    '''
+
+    coords_filled = np.array(coords, dtype=float)
+    frames = np.arange(len(coords_filled))
+    for col in coords_filled.T:
+        valid = ~(np.isnan(col) | (col == 0))
+        idx_good = np.flatnonzero(valid)
+        if len(idx_good) > 4:
+            missing = ~valid
+            good = col[idx_good]
+            interp = np.interp(frames[missing], idx_good, good)
+            # linear extrapolation from the first and last two valid points
+            before, after = frames[missing] < idx_good[0], frames[missing] > idx_good[-1]
+            interp[before] = good[0] + (frames[missing][before] - idx_good[0]) * (good[1]-good[0]) / (idx_good[1]-idx_good[0])
+            interp[after] = good[-1] + (frames[missing][after] - idx_good[-1]) * (good[-1]-good[-2]) / (idx_good[-1]-idx_good[-2])
+            col[missing] = interp
+        elif not np.isnan(col).all():
+            # bfill then ffill
+            not_nan = np.flatnonzero(~np.isnan(col))
+            col[:] = col[not_nan[np.clip(np.searchsorted(not_nan, frames), 0, len(not_nan)-1)]]
+    return coords_filled
+
+
+def sum_of_speeds(coords, nb_frames, sos, axis='y', nb_workers=1):
+    '''
+    Sum of absolute speeds of all keypoints along one axis, for each camera.
+    Coordinates are interpolated, low-pass filtered, differentiated, and their 
+    absolute values are summed and filtered again. The same filter is used for all 
+    cameras, which are processed in parallel threads if nb_workers > 1.
+
+    INPUTS:
+    - coords: array of shape (cams, frames, keypoints, 2). Padded with NaN after nb_frames[cam]
+    - nb_frames: list of int. Number of frames of each camera
+    - sos: array. Second-order sections of the low-pass filter
+    - axis: str. 'x' or 'y'. Default: 'y'
+    - nb_workers: int. Number of threads
+
+    OUTPUTS:
+    - sum_speeds: list of pandas series. Filtered sum of absolute speeds of each camera
+    '''
+
+    axis_dict = {'x':0, 'y':1}
+    padlen = 3 * (2*len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())) # as in signal.sosfiltfilt
+
+    def sum_of_speeds_cam(cam_id):
+        coords_cam = interpolate_fill(coords[cam_id, :nb_frames[cam_id], :, axis_dict[axis]])
+        if len(coords_cam) > padlen:
+            coords_cam = signal.sosfiltfilt(sos, coords_cam, axis=0)
+        else:
+            logging.warning(
+                f"Camera {cam_id}: insufficient number of samples ({len(coords_cam)} < {padlen + 1}) to apply the Butterworth filter. "
+                "Data will remain unfiltered."
+            )
+
+        # speed, with first frame extrapolated from the second one
+        speed = np.diff(coords_cam, axis=0, prepend=np.nan)
+        speed = np.where(np.isnan(speed), speed[1]*2, speed)
+        sum_speeds_cam = np.nansum(np.abs(speed), axis=1)
+
+        if len(sum_speeds_cam) > padlen:
+            sum_speeds_cam = signal.sosfiltfilt(sos, sum_speeds_cam)
+        else:
+            logging.warning(
+                f"Camera {cam_id}: insufficient number of samples ({len(sum_speeds_cam)} < {padlen + 1}) to apply the Butterworth filter. "
+                "Data will remain unfiltered."
+            )
+        return pd.Series(sum_speeds_cam)
+
+    if nb_workers > 1:
+        with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+            return list(executor.map(sum_of_speeds_cam, range(len(coords))))
+    return [sum_of_speeds_cam(cam_id) for cam_id in range(len(coords))]
+
+
+def normalized_cross_corr(camx, camy, lags):
     '''
+    Compute the Pearson correlation between camx and camy shifted by each lag,
+    i.e. camx.corr(camy.shift(lag)), for all lags at once with FFTs.
+    As in pandas, NaN values are ignored pairwise, and lags for which fewer than 
+    2 valid pairs remain, or with a constant signal, give NaN.
 
-    idx_col = list(range(col_nb-1, df.shape[1], col_nb)) 
-    df_dropped = df.drop(idx_col, axis=1)
-    df_dropped.columns = range(df_dropped.columns.size)
-    return df_dropped
+    INPUTS:
+    - camx: pandas series. Coordinates of reference camera.
+    - camy: pandas series. Coordinates of camera to compare.
+    - lags: list or range of int. Lags (in frames) for which to compute correlation.
 
+    OUTPUTS:
+    - pearson_r: array of float. The correlation for each lag.
+    '''
 
-def vert_speed(df, axis='y'):
+    # camy.shift(lag) keeps camy's index, so only camx values at these frames are compared
+    x = camx.reindex(camy.index).to_numpy(dtype=float)
+    y = camy.to_numpy(dtype=float)
+
+    # Centering does not change correlation but limits FFT round-off errors
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    x0 = np.where(mx, x - np.nanmean(x) if mx.any() else 0, 0)
+    y0 = np.where(my, y - np.nanmean(y) if my.any() else 0, 0)
+    mx, my = mx.astype(float), my.astype(float)
+
+    # Sums over valid pairs (x[i], y[i-lag]) for every lag
+    xcorr = lambda a, b: signal.correlate(a, b, mode='full', method='fft')
+    n = np.round(xcorr(mx, my))
+    sx, sy = xcorr(x0, my), xcorr(mx, y0)
+    sxx, syy = xcorr(x0**2, my), xcorr(mx, y0**2)
+    sxy = xcorr(x0, y0)
+    all_lags = signal.correlation_lags(len(x), len(y), mode='full')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n*sxy - sx*sy
+        var_x = n*sxx - sx**2
+        var_y = n*syy - sy**2
+        r = cov / np.sqrt(var_x * var_y)
+    tol = 1e-10 * max(np.nansum(x0**2), np.nansum(y0**2), 1) * max(len(x), 1)
+    r[(n < 2) | (var_x <= tol) | (var_y <= tol)] = np.nan
+    r = np.round(np.clip(r, -1, 1), 10) # round-off errors should not decide between equal peaks
+
+    # Select requested lags, NaN if no overlap at all
+    lags = np.asarray(list(lags), dtype=int)
+    pearson_r = np.full(len(lags), np.nan)
+    valid = (lags >= all_lags[0]) & (lags <= all_lags[-1])
+    pearson_r[valid] = r[lags[valid] - all_lags[0]]
+
+    return pearson_r
+
+
+def parabolic_peak(pearson_r, peak_id):
     '''
-    Calculate the vertical speed of a DataFrame along a specified axis.
+    Refine the position of a correlation peak by fitting a parabola 
+    through the peak and its two neighbours.
 
     INPUTS:
-    - df: dataframe. DataFrame of 2D coordinates.
-    - axis: str. The axis along which to calculate speed. 'x', 'y', or 'z', default is 'y'.
+    - pearson_r: array. Correlation for each lag, with a step of 1 frame
+    - peak_id: int. Index of the peak
 
     OUTPUTS:
-    - df_vert_speed: DataFrame of vertical speed values.
+    - delta: float. Sub-frame shift of the peak, between -0.5 and 0.5. 0 if the peak is on an edge
+    - peak_value: float. Interpolated correlation at the refined peak
     '''
 
-    axis_dict = {'x':0, 'y':1, 'z':2}
-    df_diff = df.diff()
-    df_diff = df_diff.fillna(df_diff.iloc[1]*2)
-    df_vert_speed = pd.DataFrame([df_diff.loc[:, 2*k + axis_dict[axis]] for k in range(int(df_diff.shape[1] / 2))]).T # modified ( df_diff.shape[1]*2 to df_diff.shape[1] / 2 )
-    df_vert_speed.columns = np.arange(len(df_vert_speed.columns))
-    return df_vert_speed
+    if not 0 < peak_id < len(pearson_r)-1:
+        return 0., pearson_r[peak_id]
+    r_before, r_peak, r_after = pearson_r[peak_id-1], pearson_r[peak_id], pearson_r[peak_id+1]
+    curvature = r_before - 2*r_peak + r_after
+    if np.isnan(curvature) or curvature >= 0:
+        return 0., r_peak
+    delta = float(np.clip(0.5 * (r_before - r_after) / curvature, -0.5, 0.5))
+    return delta, r_peak - 0.25 * (r_before - r_after) * delta
 
 
-def time_lagged_cross_corr(camx, camy, lag_range, show=True, ref_cam_name='0', cam_name='1'):
+def time_lagged_cross_corr(camx, camy, lag_range, show=True, ref_cam_name='0', cam_name='1', sub_frame=False):
     '''
     Compute the time-lagged cross-correlation between two pandas series.
 
@@ -1263,19 +1570,23 @@ def time_lagged_cross_corr(camx, camy, lag_range, show=True, ref_cam_name='0', c
     - show: bool. If True, display the cross-correlation plot.
     - ref_cam_name: str. The name of the reference camera.
     - cam_name: str. The name of the camera to compare with.
+    - sub_frame: bool. If True, refine the offset by parabolic interpolation of the peak.
 
     OUTPUTS:
-    - offset: int. The time offset for which the correlation is highest.
+    - offset: int (float rounded to 0.01 frame if sub_frame). The time offset for which the correlation is highest.
     - max_corr: float. The maximum correlation value.
     '''
 
     if isinstance(lag_range, int):
         lag_range = [-lag_range, lag_range]
 
-    pearson_r = [camx.corr(camy.shift(lag)) for lag in range(lag_range[0], lag_range[1])]
-    offset = int(np.floor(len(pearson_r)/2)-np.argmax(pearson_r))
+    pearson_r = normalized_cross_corr(camx, camy, range(lag_range[0], lag_range[1]))
     if not np.isnan(pearson_r).all():
+        offset = int(np.floor(len(pearson_r)/2)-np.nanargmax(pearson_r))
         max_corr = np.nanmax(pearson_r)
+        if sub_frame:
+            delta, max_corr = parabolic_peak(pearson_r, np.nanargmax(pearson_r))
+            offset = round(offset - delta, 2)
 
         if show:
             f, ax = plt.subplots(2,1, num='Synchronizing cameras')
@@ -1287,7 +1598,7 @@ def time_lagged_cross_corr(camx, camy, lag_range, show=True, ref_cam_name='0', c
             # time lagged cross-correlation
             ax[1].plot(list(range(lag_range[0], lag_range[1])), pearson_r)
             ax[1].axvline(np.ceil(len(pearson_r)/2) + lag_range[0],color='k',linestyle='--')
-            ax[1].axvline(np.argmax(pearson_r) + lag_range[0],color='r',linestyle='--',label='Peak synchrony')
+            ax[1].axvline(np.nanargmax(pearson_r) + lag_range[0],color='r',linestyle='--',label='Peak synchrony')
             plt.annotate(f'Max correlation={np.round(max_corr,2)}', xy=(0.05, 0.9), xycoords='axes fraction')
             ax[1].set(title=f'Offset = {offset} frames', xlabel='Offset (frames)',ylabel='Pearson r')
             
@@ -1304,6 +1615,532 @@ def time_lagged_cross_corr(camx, camy, lag_range, show=True, ref_cam_name='0', c
     return offset, max_corr
 
 
+def decimate_series(series, decimation):
+    '''
+    Reduce the sampling rate of a series by averaging blocks of consecutive values.
+    NaN values are ignored, and blocks with only NaN values give NaN.
+
+    INPUTS:
+    - series: pandas series. Signal to decimate, indexed from frame 0
+    - decimation: int. Number of frames per block
+
+    OUTPUTS:
+    - decimated: pandas series. Block means, indexed from 0
+    '''
+
+    values = series.to_numpy(dtype=float)
+    nb_blocks = len(values) // decimation
+    blocks = values[:nb_blocks*decimation].reshape(nb_blocks, decimation)
+    counts = (~np.isnan(blocks)).sum(axis=1)
+    block_means = np.where(counts > 0, np.nansum(blocks, axis=1) / np.maximum(counts, 1), np.nan)
+    return pd.Series(block_means)
+
+
+def peak_confidence(pearson_r, peak_id, other_peaks_r=[]):
+    '''
+    How much a correlation peak stands out: difference between its correlation
+    and the best other candidate peak, or the median correlation if there is no other candidate.
+
+    INPUTS:
+    - pearson_r: array. Correlation for each lag
+    - peak_id: int. Index of the selected peak
+    - other_peaks_r: list of float. Correlations of the other candidate peaks
+
+    OUTPUTS:
+    - confidence: float. Between 0 (ambiguous) and 2 (unambiguous)
+    '''
+
+    runner_up = np.nanmax(other_peaks_r) if len(other_peaks_r) > 0 else np.nanmedian(pearson_r)
+    return float(pearson_r[peak_id] - runner_up)
+
+
+def coarse_to_fine_cross_corr(camx, camy, lag_range, decimation=4, nb_candidates=3, show=True, ref_cam_name='0', cam_name='1', sub_frame=False):
+    '''
+    Hierarchical version of time_lagged_cross_corr.
+    The correlation is first computed on all lags at a frame rate divided by decimation. 
+    The best candidate peaks are then refined at full frame rate, in a window of 
+    +/- 2*decimation frames around each of them. Both stages log a confidence score.
+
+    INPUTS:
+    - camx: pandas series. Coordinates of reference camera.
+    - camy: pandas series. Coordinates of camera to compare.
+    - lag_range: int or list. Range of frames for which to compute cross-correlation.
+    - decimation: int. Decimation factor of the coarse stage.
+    - nb_candidates: int. Number of coarse peaks refined at full frame rate.
+    - show: bool. If True, display the cross-correlation plot.
+    - ref_cam_name: str. The name of the reference camera.
+    - cam_name: str. The name of the camera to compare with.
+    - sub_frame: bool. If True, refine the offset by parabolic interpolation of the peak.
+
+    OUTPUTS:
+    - offset: int (float rounded to 0.01 frame if sub_frame). The time offset for which the correlation is highest.
+    - max_corr: float. The maximum correlation value.
+    '''
+
+    if isinstance(lag_range, int):
+        lag_range = [-lag_range, lag_range]
+
+    # Coarse stage: all lags, decimated signals
+    coarse_lags = np.arange(int(np.floor(lag_range[0]/decimation)), int(np.ceil(lag_range[1]/decimation)))
+    coarse_r = normalized_cross_corr(decimate_series(camx, decimation), decimate_series(camy, decimation), coarse_lags)
+    if np.isnan(coarse_r).all():
+        return 0, 0
+    r_floor = np.nanmin(coarse_r) - 1 # local maxima, including on the edges
+    peaks, _ = signal.find_peaks(np.concatenate([[r_floor], np.nan_to_num(coarse_r, nan=r_floor), [r_floor]]))
+    peaks = peaks - 1
+    candidates = peaks[np.argsort(coarse_r[peaks])[::-1]][:nb_candidates]
+    coarse_confidence = peak_confidence(coarse_r, candidates[0], coarse_r[candidates[1:]])
+    logging.info(f'    Coarse search at 1/{decimation} frame rate: {len(candidates)} candidate peak(s), best at {coarse_lags[candidates[0]]*decimation} frames lag, correlation {coarse_r[candidates[0]]:.2f}, confidence {coarse_confidence:.2f}.')
+
+    # Fine stage: full frame rate, around each candidate
+    window = 2*decimation
+    fine_lags_all = [np.arange(max(coarse_lags[c]*decimation-window, lag_range[0]), min(coarse_lags[c]*decimation+window+1, lag_range[1])) for c in candidates]
+    fine_r_all = np.split(normalized_cross_corr(camx, camy, np.concatenate(fine_lags_all)), np.cumsum([len(l) for l in fine_lags_all])[:-1])
+    fine_results = {} # lag -> (correlation, lags, pearson_r)
+    for fine_lags, fine_r in zip(fine_lags_all, fine_r_all):
+        if len(fine_lags) == 0 or np.isnan(fine_r).all():
+            continue
+        best_id = np.nanargmax(fine_r)
+        fine_results[fine_lags[best_id]] = (fine_r[best_id], fine_lags, fine_r)
+    if len(fine_results) == 0:
+        return 0, 0
+    best_lag = max(fine_results, key=lambda lag: fine_results[lag][0])
+    max_corr, best_lags, best_r = fine_results[best_lag]
+    fine_confidence = peak_confidence(best_r, np.where(best_lags==best_lag)[0][0], [fine_results[lag][0] for lag in fine_results if abs(lag-best_lag) > window])
+    logging.info(f'    Fine search at full frame rate: best at {best_lag} frames lag, correlation {max_corr:.2f}, confidence {fine_confidence:.2f}.')
+    offset = -int(best_lag)
+    if sub_frame:
+        delta, max_corr = parabolic_peak(best_r, np.where(best_lags==best_lag)[0][0])
+        offset = round(offset - delta, 2)
+
+    if show:
+        f, ax = plt.subplots(2,1, num='Synchronizing cameras')
+        # speed
+        camx.plot(ax=ax[0], label = f'Reference: {ref_cam_name}')
+        camy.plot(ax=ax[0], label = f'Compared: {cam_name}')
+        ax[0].set(xlabel='Frame', ylabel='Speed (px/frame)')
+        ax[0].legend()
+        # coarse and fine time lagged cross-correlation
+        ax[1].plot(coarse_lags*decimation, coarse_r, label=f'Coarse (1/{decimation} frame rate)')
+        for lag in fine_results:
+            ax[1].plot(fine_results[lag][1], fine_results[lag][2], color='k')
+        ax[1].axvline(0,color='k',linestyle='--')
+        ax[1].axvline(best_lag,color='r',linestyle='--',label='Peak synchrony')
+        plt.annotate(f'Max correlation={np.round(max_corr,2)}', xy=(0.05, 0.9), xycoords='axes fraction')
+        ax[1].set(title=f'Offset = {offset} frames', xlabel='Offset (frames)',ylabel='Pearson r')
+        
+        plt.legend()
+        f.tight_layout()
+        plt.show()
+
+    return offset, max_corr
+
+
+def all_pairs_offsets(sum_speeds, section_starts, correlate=time_lagged_cross_corr, nb_workers=4, show=False, cam_names=None):
+    '''
+    Compute the time offset and the correlation between every pair of cameras.
+    Pairs are processed in parallel threads, unless plots are displayed.
+
+    INPUTS:
+    - sum_speeds: list of pandas series. Filtered sum of speeds for each camera
+    - section_starts: list of int. First frame of the section of each camera
+    - correlate: function. time_lagged_cross_corr or coarse_to_fine_cross_corr (with its decimation bound)
+    - nb_workers: int. Number of threads
+    - show: bool. If True, display the cross-correlation plot of each pair
+    - cam_names: list of str. Names of the cameras
+
+    OUTPUTS:
+    - pairs: list of (cam_i, cam_j, offset, max_corr) tuples, with offset the 
+    number of frames camera j is shifted relative to camera i
+    '''
+
+    cam_nb = len(sum_speeds)
+    cam_names = cam_names if cam_names is not None else [str(c) for c in range(cam_nb)]
+    cam_pairs = [(i, j) for i in range(cam_nb) for j in range(i+1, cam_nb)]
+
+    def correlate_pair(cam_pair):
+        i, j = cam_pair
+        lag_range = int(min(len(sum_speeds[i]), len(sum_speeds[j]))/2)
+        offset_section, max_corr = correlate(sum_speeds[i], sum_speeds[j], lag_range, show=show, ref_cam_name=cam_names[i], cam_name=cam_names[j])
+        return i, j, offset_section - (section_starts[i] - section_starts[j]), max_corr
+
+    if show or nb_workers <= 1:
+        return [correlate_pair(cam_pair) for cam_pair in cam_pairs]
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        return list(executor.map(correlate_pair, cam_pairs))
+
+
+def solve_global_offsets(cam_nb, pairs, ref_cam_id=0, nb_iterations=10, sub_frame=False):
+    '''
+    Find the per-camera offsets which best agree with all pairwise offsets.
+    Weighted least squares on offset_j - offset_i = pair offset, weighted by the 
+    pair correlation. Weights are iteratively reduced for pairs that disagree 
+    with the consensus (Huber weights), so that a few wrong pairs do not spoil all offsets.
+
+    INPUTS:
+    - cam_nb: int. Number of cameras
+    - pairs: list of (cam_i, cam_j, offset, max_corr) tuples, as returned by all_pairs_offsets
+    - ref_cam_id: int. Camera whose offset is set to 0
+    - nb_iterations: int. Number of reweighting iterations
+    - sub_frame: bool. If True, offsets are rounded to 0.01 frame instead of 1 frame
+
+    OUTPUTS:
+    - offsets: list of int (or float if sub_frame). Offset of each camera, 0 for the reference camera
+    - residuals: array. Pair offset minus the difference of solved offsets, for each pair
+    '''
+
+    cam_i, cam_j, pair_offsets, pair_corr = [np.array(c) for c in zip(*pairs)]
+    pair_offsets = pair_offsets.astype(float)
+    corr_weights = np.clip(np.nan_to_num(pair_corr.astype(float)), 0, None)
+    if (corr_weights == 0).all():
+        corr_weights = np.ones(len(pairs))
+
+    # offset_j - offset_i, with the reference camera removed from the unknowns
+    design = np.zeros((len(pairs), cam_nb))
+    design[np.arange(len(pairs)), cam_j] = 1
+    design[np.arange(len(pairs)), cam_i] = -1
+    design = np.delete(design, ref_cam_id, axis=1)
+    if np.linalg.matrix_rank(design[corr_weights > 0]) < cam_nb - 1:
+        logging.warning('Some cameras are not correlated with any other one. Their offset is set relative to the reference camera with a weight of 0.')
+
+    weights = corr_weights.copy()
+    for _ in range(nb_iterations):
+        sqrt_w = np.sqrt(weights)
+        solution = np.linalg.lstsq(design * sqrt_w[:,None], pair_offsets * sqrt_w, rcond=None)[0]
+        residuals = pair_offsets - design @ solution
+        scale = max(1.4826 * np.median(np.abs(residuals[corr_weights > 0])) if (corr_weights > 0).any() else 0, 1)
+        huber = np.minimum(1, 1.345*scale / np.maximum(np.abs(residuals), 1e-9))
+        if np.allclose(corr_weights * huber, weights):
+            break
+        weights = corr_weights * huber
+
+    offsets = np.insert(np.round(solution, 2) if sub_frame else np.round(solution).astype(int), ref_cam_id, 0).tolist()
+    residuals = pair_offsets - design @ np.delete(np.array(offsets, dtype=float), ref_cam_id)
+    return offsets, residuals
+
+
+def write_sync_copy(sync_dir, json_dirs, json_files_names, offset):
+    '''
+    Copy the json files of each camera to pose-sync, renamed according to their offset.
+    Removes any previous synchronization manifest.
+
+    INPUTS:
+    - sync_dir: str. Path of the pose-sync directory
+    - json_dirs: list of str. Paths of the json directories of each camera
+    - json_files_names: list of list of str. Names of the json files of each camera
+    - offset: list of int. Offset of each camera, in frames
+
+    OUTPUTS:
+    - renamed json files in sync_dir
+    '''
+
+    manifest_path = os.path.join(sync_dir, sync_manifest_name)
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+
+    for d, j_dir in enumerate(json_dirs):
+        os.makedirs(os.path.join(sync_dir, os.path.basename(j_dir)), exist_ok=True)
+        for j_file in json_files_names[d]:
+            json_offset_name = sync_json_name(j_file, offset[d])
+            if json_offset_name is not None:
+                j_path = os.path.join(j_dir, j_file)
+                if os.path.isfile(j_path):
+                    shutil.copy(j_path, os.path.join(sync_dir, os.path.basename(j_dir), json_offset_name))
+                else: # from bulk pose file
+                    with open(os.path.join(sync_dir, os.path.basename(j_dir), json_offset_name), 'w') as j_sync_f:
+                        json.dump(read_pose_json(j_path), j_sync_f)
+
+
+def write_sync_manifest(sync_dir, json_dirs, offset):
+    '''
+    Write the offset of each camera to a manifest in pose-sync, instead of copying json files.
+    Person association and triangulation then read pose-sync/<cam>_json/<file> from the 
+    original json directory, with frame numbers shifted by the offset.
+    Removes any previously copied json directories of these cameras.
+
+    INPUTS:
+    - sync_dir: str. Path of the pose-sync directory
+    - json_dirs: list of str. Paths of the json directories of each camera
+    - offset: list of int. Offset of each camera, in frames
+
+    OUTPUTS:
+    - sync_manifest.toml in sync_dir
+    '''
+
+    manifest = {}
+    for d, j_dir in enumerate(json_dirs):
+        if os.path.isdir(os.path.join(sync_dir, os.path.basename(j_dir))):
+            shutil.rmtree(os.path.join(sync_dir, os.path.basename(j_dir)))
+        manifest[os.path.basename(j_dir)] = {'source': os.path.relpath(j_dir, sync_dir).replace('\\', '/'), 'offset': int(offset[d])}
+
+    with open(os.path.join(sync_dir, sync_manifest_name), 'w') as manifest_f:
+        toml.dump(manifest, manifest_f)
+
+
+def resample_keypoints(keypoints, person_status, positions):
+    '''
+    Read the 2D keypoints of a camera at possibly fractional frame positions,
+    by linear interpolation between consecutive frames, all at once.
+    When a keypoint is missing on one of the two frames, the other one is used.
+
+    INPUTS:
+    - keypoints: array of shape (frames, persons, keypoints, 3). x, y, likelihood, NaN if missing
+    - person_status: array of shape (frames, persons). -1 if the person is absent
+    - positions: array of float. Input frame index to read for each output frame
+
+    OUTPUTS:
+    - keypoints_resampled: array of shape (len(positions), persons, keypoints, 3). NaN outside the input range
+    - person_status_resampled: array of shape (len(positions), persons)
+    '''
+
+    nb_frames = len(keypoints)
+    positions = np.asarray(positions, dtype=float)
+    source = np.floor(positions).astype(int)
+    alpha = (positions - source)[:, np.newaxis, np.newaxis, np.newaxis]
+    in_range = (source >= 0) & (source + (alpha[:,0,0,0] > 0) < nb_frames)
+    source_next = np.clip(source + 1, 0, nb_frames - 1)
+    source = np.clip(source, 0, nb_frames - 1)
+
+    # missing keypoints: NaN, or zero likelihood as in OpenPose
+    kpts = np.where((keypoints[...,2:3] > 0), keypoints, np.nan)
+    kpts_now, kpts_next = kpts[source], kpts[source_next]
+    kpts_resampled = np.where(alpha > 0, (1-alpha)*kpts_now + alpha*kpts_next, kpts_now)
+    kpts_resampled = np.where(np.isnan(kpts_resampled) & (alpha > 0), np.where(np.isnan(kpts_now), kpts_next, kpts_now), kpts_resampled)
+    status_resampled = np.where(alpha[:,:,0,0] > 0, np.maximum(person_status[source], person_status[source_next]), person_status[source])
+    kpts_resampled[~in_range] = np.nan
+    status_resampled[~in_range] = -1
+    return kpts_resampled, status_resampled
+
+
+def write_sync_resampled(sync_dir, json_dirs, json_files_names, offset, drift=None, interpolate=True):
+    '''
+    Resample the 2D keypoints of each camera onto the time base of the reference 
+    camera, and write them to pose-sync as bulk pose files (see BulkPoseWriter).
+    Frame f of the reference camera is read at frame f + offset + drift*f of each camera,
+    so that sub-frame offsets and clock drift can be compensated.
+    Persons keep their index, so pose estimation should have been run with tracking.
+    Removes any previous synchronization manifest, and json directories of these cameras.
+
+    INPUTS:
+    - sync_dir: str. Path of the pose-sync directory
+    - json_dirs: list of str. Paths of the json directories of each camera
+    - json_files_names: list of list of str. Names of the json files of each camera
+    - offset: list of float. Offset of each camera at frame 0, in frames
+    - drift: list of float. Clock drift of each camera, in frames per frame. None for no drift
+    - interpolate: bool. If False, the nearest frame is read instead of interpolating
+
+    OUTPUTS:
+    - <cam>_json.npz bulk pose files in sync_dir
+    '''
+
+    drift = [0.] * len(json_dirs) if drift is None else drift
+    manifest_path = os.path.join(sync_dir, sync_manifest_name)
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+
+    for d, j_dir in enumerate(json_dirs):
+        sync_json_dir = os.path.join(sync_dir, os.path.basename(j_dir))
+        if os.path.isdir(sync_json_dir):
+            shutil.rmtree(sync_json_dir)
+        if os.path.isfile(sync_json_dir + '.jsonl'):
+            os.remove(sync_json_dir + '.jsonl')
+
+        # dense (frames, persons, keypoints, 3) array over the frame numbers of the camera
+        frames_files = {int(re.split(r'(\d+)', j_file)[-2]): j_file for j_file in json_files_names[d]}
+        first_frame, last_frame = min(frames_files), max(frames_files)
+        json_files = [os.path.join(j_dir, frames_files.get(f, '')) for f in range(first_frame, last_frame+1)]
+        nb_keypoints = next((len(p['pose_keypoints_2d'])//3 for j_file in json_files if os.path.basename(j_file)
+                             for p in read_pose_json(j_file)['people'] if len(p.get('pose_keypoints_2d', [])) > 0), 0)
+        keypoints, person_status = load_json_keypoints(json_files, list(range(nb_keypoints)))
+
+        # synchronized frames whose source position falls within the camera frames
+        first_sync = max(1, int(np.ceil((first_frame - offset[d]) / (1 + drift[d]))))
+        last_sync = int(np.floor((last_frame - offset[d]) / (1 + drift[d])))
+        sync_frames = np.arange(first_sync, last_sync+1)
+        positions = sync_frames + offset[d] + drift[d]*sync_frames - first_frame
+        positions = np.clip(positions if interpolate else np.round(positions), 0, len(keypoints)-1)
+        keypoints_sync, person_status_sync = resample_keypoints(keypoints, person_status, positions)
+
+        writer = BulkPoseWriter(sync_json_dir + '.npz', 'npz')
+        for f, frame_idx in enumerate(sync_frames):
+            present = np.flatnonzero(person_status_sync[f] >= 0)
+            if len(present) == 0:
+                continue
+            people = np.nan_to_num(keypoints_sync[f, :present[-1]+1]) # missing keypoints and persons as zeros
+            writer.write(frame_idx, people[...,:2], people[...,2])
+        writer.close()
+
+
+def windowed_offsets(sum_speeds_ref, sum_speeds_cam, offset_section, window, step, search):
+    '''
+    Estimate the offset of a camera on sliding windows of the reference camera, 
+    around a global offset, with sub-frame precision.
+    Only the samples needed by each window are correlated.
+
+    INPUTS:
+    - sum_speeds_ref: pandas series. Speed signal of the reference camera
+    - sum_speeds_cam: pandas series. Speed signal of the camera
+    - offset_section: float. Global offset of the camera, in frames of the speed signals
+    - window: int. Window length, in frames
+    - step: int. Step between windows, in frames
+    - search: int. Searched lags on each side of the global offset, in frames
+
+    OUTPUTS:
+    - window_centers: array. Center of each window, in frames of the reference speed signal
+    - window_offsets: array. Offset with the highest correlation on each window
+    - window_corr: array. Correlation at this offset
+    '''
+
+    lags = np.arange(-int(round(offset_section)) - search, -int(round(offset_section)) + search + 1)
+    window_centers, window_offsets, window_corr = [], [], []
+    for start in range(0, max(len(sum_speeds_ref) - window, 0) + 1, step):
+        # pairs (ref[i], cam[i-lag]) with i in the window
+        first, last = min(start, start - lags[-1]), max(start + window, start + window - lags[0])
+        pearson_r = normalized_cross_corr(sum_speeds_ref.iloc[start:start+window], sum_speeds_cam.iloc[max(first, 0):max(last, 0)], lags)
+        if np.isnan(pearson_r).all():
+            continue
+        peak_id = np.nanargmax(pearson_r)
+        delta, max_corr = parabolic_peak(pearson_r, peak_id)
+        window_centers.append(start + window/2)
+        window_offsets.append(-(lags[peak_id] + delta))
+        window_corr.append(max_corr)
+    return np.array(window_centers), np.array(window_offsets), np.array(window_corr)
+
+
+def fit_drift(window_frames, window_offsets, window_corr, min_corr=0.5, nb_iterations=10):
+    '''
+    Fit a linear clock drift model offset = intercept + drift * frame to windowed offsets,
+    by weighted least squares. Windows are weighted by their correlation, and iteratively 
+    down-weighted if they disagree with the fit (Huber weights).
+
+    INPUTS:
+    - window_frames: array. Frame of each window (reference time base)
+    - window_offsets: array. Offset of each window
+    - window_corr: array. Correlation of each window
+    - min_corr: float. Windows with a lower correlation are ignored
+    - nb_iterations: int. Number of reweighting iterations
+
+    OUTPUTS:
+    - intercept: float. Offset at frame 0
+    - drift: float. Offset change per frame
+    - residuals: array. Window offsets minus fitted offsets
+    '''
+
+    corr_weights = np.where(window_corr >= min_corr, window_corr, 0)
+    if (corr_weights > 0).sum() < 2:
+        raise ValueError(f'Not enough windows with a correlation above {min_corr} to fit a clock drift.')
+
+    weights = corr_weights.copy()
+    for _ in range(nb_iterations):
+        drift, intercept = np.polyfit(window_frames, window_offsets, 1, w=np.sqrt(weights))
+        residuals = window_offsets - (intercept + drift*window_frames)
+        scale = max(1.4826 * np.median(np.abs(residuals[corr_weights > 0])), 0.5)
+        huber = np.minimum(1, 1.345*scale / np.maximum(np.abs(residuals), 1e-9))
+        if np.allclose(corr_weights * huber, weights):
+            break
+        weights = corr_weights * huber
+    return intercept, drift, residuals
+
+
+def read_sync_cache(pose_dir, sync_settings):
+    '''
+    Read the state of a previous incremental synchronization, written next to the pose data.
+    It is discarded if the synchronization settings have changed.
+
+    INPUTS:
+    - pose_dir: str. Path of the pose directory
+    - sync_settings: dict. Settings which the cached signals depend on
+
+    OUTPUTS:
+    - sync_state: dict. Json directory name -> {'first_file', 'last_file', 'nb_files', 
+      'processed_frames', 'offset'}. Empty if there is no valid cache
+    - sync_cache: dict. Json directory name -> (frames, keypoints, 2) array of coordinates
+    '''
+
+    state_path, cache_path = os.path.join(pose_dir, sync_state_name), os.path.join(pose_dir, sync_cache_name)
+    if not (os.path.isfile(state_path) and os.path.isfile(cache_path)):
+        return {}, {}
+    try:
+        sync_state = toml.load(state_path)
+        if sync_state.get('settings') != toml.loads(toml.dumps({'settings': sync_settings}))['settings']:
+            logging.info('Synchronization settings have changed since the last run: the cache is discarded.')
+            return {}, {}
+        with np.load(cache_path) as cache_f:
+            sync_cache = {json_dir_name: cache_f[json_dir_name] for json_dir_name in sync_state.get('cameras', {}) if json_dir_name in cache_f.files}
+        return sync_state.get('cameras', {}), sync_cache
+    except Exception as e:
+        logging.warning(f'Could not read the synchronization cache ({e}). It is discarded.')
+        return {}, {}
+
+
+def write_sync_cache(pose_dir, sync_settings, sync_state, sync_cache):
+    '''
+    Write the processed json range, offset, and coordinates of each camera next to the pose data,
+    so that the next incremental synchronization only reads new json files.
+
+    INPUTS:
+    - pose_dir: str. Path of the pose directory
+    - sync_settings: dict. Settings which the cached signals depend on
+    - sync_state: dict. Json directory name -> processed range and offset (see read_sync_cache)
+    - sync_cache: dict. Json directory name -> (frames, keypoints, 2) array of coordinates
+
+    OUTPUTS:
+    - sync_state.toml and sync_cache.npz in pose_dir
+    '''
+
+    with open(os.path.join(pose_dir, sync_state_name), 'w') as state_f:
+        toml.dump({'settings': sync_settings, 'cameras': sync_state}, state_f)
+    np.savez(os.path.join(pose_dir, sync_cache_name), **sync_cache)
+
+
+def nb_cached_files(cam_state, json_files_names):
+    '''
+    Number of json files of a camera which are already in the synchronization cache.
+    The cache is only valid if it covers the first files of the camera, new files being appended after them.
+
+    INPUTS:
+    - cam_state: dict. Cached state of the camera (see read_sync_cache)
+    - json_files_names: list of str. Sorted names of the json files of the camera
+
+    OUTPUTS:
+    - nb_files: int. 0 if the cache does not match
+    '''
+
+    nb_files = cam_state.get('nb_files', 0) if cam_state else 0
+    if nb_files == 0 or nb_files > len(json_files_names) \
+        or json_files_names[0] != cam_state.get('first_file') or json_files_names[nb_files-1] != cam_state.get('last_file'):
+        return 0
+    return nb_files
+
+
+def drift_detected(sum_speeds_ref, sum_speeds_cam, offset_section, new_section_start, tolerance):
+    '''
+    Check whether a cached offset still holds on newly appended frames.
+    The correlation is only computed on the new section of the reference camera, 
+    for lags within tolerance of the cached offset. Drift is detected if the best 
+    lag is more than one frame away from the cached one.
+
+    INPUTS:
+    - sum_speeds_ref: pandas series. Speed signal of the reference camera
+    - sum_speeds_cam: pandas series. Speed signal of the camera to check
+    - offset_section: float. Cached offset of the camera, in frames of the speed signals
+    - new_section_start: int. First new frame of the reference camera
+    - tolerance: int. Searched lags on each side of the cached one
+
+    OUTPUTS:
+    - drift: bool. True if the offset should be re-estimated
+    - best_offset: int. Offset with the highest correlation on the new section
+    '''
+
+    cached_lag = -int(round(offset_section))
+    lags = np.arange(cached_lag - tolerance, cached_lag + tolerance + 1)
+    pearson_r = normalized_cross_corr(sum_speeds_ref.iloc[new_section_start:], sum_speeds_cam, lags)
+    if np.isnan(pearson_r).all():
+        return True, offset_section
+    best_offset = -int(lags[np.nanargmax(pearson_r)])
+    return abs(best_offset - offset_section) > 1, best_offset
+
+
 def synchronize_cams_all(config_dict):
     '''
     Post-synchronize your cameras in case they are not natively synchronized.
@@ -1326,7 +2163,8 @@ def synchronize_cams_all(config_dict):
     - a skeleton model
 
     OUTPUTS: 
-    - synchronized json files for each camera
+    - synchronized json files for each camera, 
+      or only a manifest of their offsets if sync_output = 'manifest'
     '''
     
     # Get parameters from Config.toml
@@ -1341,10 +2179,20 @@ def synchronize_cams_all(config_dict):
     approx_time_maxspeed = config_dict.get('synchronization').get('approx_time_maxspeed') 
     time_range_around_maxspeed = config_dict.get('synchronization').get('time_range_around_maxspeed')
     synchronization_gui = config_dict.get('synchronization').get('synchronization_gui')
+    gui_max_size = config_dict.get('synchronization').get('gui_max_size', 0)
 
     likelihood_threshold = config_dict.get('synchronization').get('likelihood_threshold')
     filter_cutoff = int(config_dict.get('synchronization').get('filter_cutoff'))
     filter_order = int(config_dict.get('synchronization').get('filter_order'))
+    sync_output = config_dict.get('synchronization').get('sync_output', 'copy')
+    coarse_to_fine = config_dict.get('synchronization').get('coarse_to_fine', False)
+    all_pairs = config_dict.get('synchronization').get('all_pairs', False)
+    sub_frame = config_dict.get('synchronization').get('sub_frame', False)
+    incremental = config_dict.get('synchronization').get('incremental', False)
+    drift_window = config_dict.get('synchronization').get('drift_window', 0)
+    if sync_output not in ('copy', 'manifest'):
+        logging.warning(f"sync_output {sync_output} not recognized. Copying synchronized json files.")
+        sync_output = 'copy'
 
     # Determine frame rate
     video_dir = os.path.join(project_dir, 'videos')
@@ -1389,16 +2237,15 @@ def synchronize_cams_all(config_dict):
 
     # List json files
     try:
-        pose_listdirs_names = next(os.walk(pose_dir))[1]
-        os.listdir(os.path.join(pose_dir, pose_listdirs_names[0]))[0]
+        json_dirs_names = list_json_dirs(pose_dir)
+        list_json_files(os.path.join(pose_dir, json_dirs_names[0]))[0]
     except:
         raise ValueError(f'No json files found in {pose_dir} subdirectories. Make sure you run Pose2Sim.poseEstimation() first.')
-    pose_listdirs_names = sort_stringlist_by_last_number(pose_listdirs_names)
-    json_dirs_names = [k for k in pose_listdirs_names if 'json' in k]
+    json_dirs_names = sort_stringlist_by_last_number(json_dirs_names)
     json_dirs = [os.path.join(pose_dir, j_d) for j_d in json_dirs_names] # list of json directories in pose_dir
-    json_files_names = [fnmatch.filter(os.listdir(os.path.join(pose_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+    json_files_names = [list_json_files(os.path.join(pose_dir, js_dir)) for js_dir in json_dirs_names]
     json_files_names = [sort_stringlist_by_last_number(j) for j in json_files_names]
-    nb_frames_per_cam = [len(fnmatch.filter(os.listdir(os.path.join(json_dir)), '*.json')) for json_dir in json_dirs]
+    nb_frames_per_cam = [len(j) for j in json_files_names]
     cam_nb = len(json_dirs)
     cam_list = list(range(cam_nb))
     cam_names = [os.path.basename(j_dir).split('_')[0] for j_dir in json_dirs]
@@ -1415,7 +2262,6 @@ def synchronize_cams_all(config_dict):
             approx_time_maxspeed *= cam_nb
 
         approx_frame_maxspeed = [int(fps * t) for t in approx_time_maxspeed]
-        nb_frames_per_cam = [len(fnmatch.filter(os.listdir(os.path.join(json_dir)), '*.json')) for json_dir in json_dirs]
 
         search_around_frames = []
         for i, frame in enumerate(approx_frame_maxspeed):
@@ -1454,8 +2300,7 @@ def synchronize_cams_all(config_dict):
 
     # Extract, interpolate, and filter keypoint coordinates
     logging.info('Synchronizing...')
-    df_coords = []
-    b, a = signal.butter(int(filter_order/2), filter_cutoff/(fps/2), 'low', analog = False)
+    sos = signal.butter(int(filter_order/2), filter_cutoff/(fps/2), 'low', analog = False, output='sos')
     json_files_names_range = [[j for j in json_files_cam if int(re.split(r'(\d+)',j)[-2]) in range(*frames_cam)] for (json_files_cam, frames_cam) in zip(json_files_names,search_around_frames)]
     
     if np.array([j==[] for j in json_files_names_range]).any():
@@ -1463,13 +2308,13 @@ def synchronize_cams_all(config_dict):
     
     json_files_range = [[os.path.join(pose_dir, j_dir, j_file) for j_file in json_files_names_range[j]] for j, j_dir in enumerate(json_dirs_names)]
     kpt_indices = [i for i,k in zip(keypoints_ids, keypoints_names) if k in keypoints_to_consider]
-    kpt_id_in_df = np.array([[keypoints_ids.index(k)*2,keypoints_ids.index(k)*2+1]  for k in kpt_indices]).ravel()
+    kpt_id_in_json = [keypoints_ids.index(k) for k in kpt_indices]
     
     # Handle manual selection if synchronization_gui is True
     if synchronization_gui:
         selected_id_list, keypoints_to_consider, approx_time_maxspeed, time_RAM_list = select_person(
             vid_or_img_files, cam_names, json_files_names_range, search_around_frames, 
-            pose_dir, json_dirs_names, keypoints_names, keypoints_to_consider, time_range_around_maxspeed, fps)
+            pose_dir, json_dirs_names, keypoints_names, keypoints_to_consider, time_range_around_maxspeed, fps, display_max_size=gui_max_size)
         
         # Calculate lag_ranges using time_RAM_list
         lag_ranges = [int(dt * fps) for dt in time_RAM_list]
@@ -1490,72 +2335,144 @@ def synchronize_cams_all(config_dict):
     else:
         selected_id_list = [None] * cam_nb
 
-    padlen = 3 * (max(len(a), len(b)) - 1)
-    
+    # Incremental synchronization: only read json files appended since the last run
+    if incremental and (synchronization_gui or approx_time_maxspeed != 'auto'):
+        logging.warning('Incremental synchronization requires synchronization_gui = false and approx_time_maxspeed = "auto". Synchronizing from scratch.')
+        incremental = False
+    sync_settings = {'pose_model': str(pose_model), 'keypoints': [str(k) for k in kpt_indices], 'likelihood_threshold': float(likelihood_threshold), 
+                     'filter_cutoff': filter_cutoff, 'filter_order': filter_order, 'fps': float(fps), 'frame_range': list(frame_range), 'sub_frame': bool(sub_frame)}
+    sync_state, sync_cache = read_sync_cache(pose_dir, sync_settings) if incremental else ({}, {})
+    nb_cached = [nb_cached_files(sync_state.get(json_dirs_names[i]), json_files_names_range[i]) if json_dirs_names[i] in sync_cache else 0 for i in range(cam_nb)]
+    if incremental:
+        logging.info(f'Incremental synchronization: {sum(nb_cached)} json files read from cache, {sum([len(j) for j in json_files_range]) - sum(nb_cached)} new ones.')
+
+    # (cams, frames, keypoints, 2) array of coordinates, padded with NaN
+    nb_frames_range = [len(json_files_range[i]) for i in range(cam_nb)]
+    coords = np.full((cam_nb, max(nb_frames_range), len(kpt_id_in_json), 2), np.nan)
     for i in range(cam_nb):
-        df_coords.append(convert_json2pandas(json_files_range[i], likelihood_threshold=likelihood_threshold, keypoints_ids=keypoints_ids, synchronization_gui=synchronization_gui, selected_id=selected_id_list[i]))
-        df_coords[i] = drop_col(df_coords[i],3) # drop likelihood
-        df_coords[i] = df_coords[i][kpt_id_in_df]
-        df_coords[i] = df_coords[i].apply(interpolate_zeros_nans, axis=0, args=['linear'])
-        df_coords[i] = df_coords[i].bfill().ffill()
-        if df_coords[i].shape[0] > padlen:
-            df_coords[i] = pd.DataFrame(signal.filtfilt(b, a, df_coords[i], axis=0))
-        else:
-            logging.warning(
-                f"Camera {i}: insufficient number of samples ({df_coords[i].shape[0]} < {padlen + 1}) to apply the Butterworth filter. "
-                "Data will remain unfiltered."
-            )
+        if nb_cached[i] > 0:
+            coords[i, :nb_cached[i]] = sync_cache[json_dirs_names[i]][:nb_cached[i]]
+        if nb_cached[i] < nb_frames_range[i]:
+            try:
+                df_coords = convert_json2pandas(json_files_range[i][nb_cached[i]:], likelihood_threshold=likelihood_threshold, keypoints_ids=keypoints_ids, synchronization_gui=synchronization_gui, selected_id=selected_id_list[i])
+            except ValueError:
+                if nb_cached[i] == 0:
+                    raise
+                continue # no valid coordinates in the new files only
+            coords[i, nb_cached[i]:nb_frames_range[i]] = df_coords.to_numpy().reshape(len(df_coords), -1, 3)[:, kpt_id_in_json, :2]
     
-    # Compute sum of speeds
-    df_speed = []
-    sum_speeds = []
-    for i in range(cam_nb):
-        df_speed.append(vert_speed(df_coords[i]))
-        sum_speeds.append(abs(df_speed[i]).sum(axis=1))
-        # nb_coords = df_speed[i].shape[1]
-        # sum_speeds[i][ sum_speeds[i]>vmax*nb_coords ] = 0
-
-        # # Replace 0 by random values, otherwise 0 padding may lead to unreliable correlations
-        # sum_speeds[i].loc[sum_speeds[i] < 1] = sum_speeds[i].loc[sum_speeds[i] < 1].apply(lambda x: np.random.normal(0,1))
-
-        if sum_speeds[i].shape[0] > padlen:
-            sum_speeds[i] = pd.DataFrame(signal.filtfilt(b, a, sum_speeds[i], axis=0)).squeeze()
-        else:
-            logging.warning(
-                f"Camera {i}: insufficient number of samples ({sum_speeds[i].shape[0]} < {padlen + 1}) to apply the Butterworth filter. "
-                "Data will remain unfiltered."
-            )
+    # Compute sum of vertical speeds
+    sum_speeds = sum_of_speeds(coords, nb_frames_range, sos, axis='y', nb_workers=min(cam_nb, os.cpu_count() or 1))
 
     # Compute offset for best synchronization:
     # Highest correlation of sum of absolute speeds for each cam compared to reference cam
     ref_cam_id = nb_frames_per_cam.index(min(nb_frames_per_cam)) # ref cam: least amount of frames
     ref_cam_name = cam_names[ref_cam_id]
-    ref_frame_nb = len(df_coords[ref_cam_id])
+    ref_frame_nb = len(sum_speeds[ref_cam_id])
     lag_range = int(ref_frame_nb/2)
-    cam_list.pop(ref_cam_id)
-    cam_names.pop(ref_cam_id)
-    offset = []
+    if coarse_to_fine:
+        # signals are low-pass filtered at filter_cutoff, so they can be decimated down to about 2.5*filter_cutoff Hz
+        decimation = max(2, int(fps / (2.5*filter_cutoff)))
+        logging.info(f'Coarse-to-fine search: lags are first searched at 1/{decimation} of the frame rate, then refined at full frame rate.')
     logging.info('')
-    for cam_id, cam_name in zip(cam_list, cam_names):
-        offset_cam_section, max_corr_cam = time_lagged_cross_corr(sum_speeds[ref_cam_id], sum_speeds[cam_id], lag_range, show=display_sync_plots, ref_cam_name=ref_cam_name, cam_name=cam_name)
-        offset_cam = offset_cam_section - (search_around_frames[ref_cam_id][0] - search_around_frames[cam_id][0])
-        if isinstance(approx_time_maxspeed, list):
-            logging.info(f'--> Camera {ref_cam_name} and {cam_name}: {offset_cam} frames offset ({offset_cam_section} on the selected section), correlation {round(max_corr_cam, 2)}.')
+    cached_offsets = {cam_name: sync_state[j_dir]['offset'] for cam_name, j_dir in zip(cam_names, json_dirs_names) if j_dir in sync_state}
+    reuse_offsets = incremental and all(nb_cached) and len(cached_offsets) == cam_nb
+    if reuse_offsets:
+        # Only re-estimate offsets if they do not hold on the new frames
+        new_section_start = max(0, nb_cached[ref_cam_id] - 2*int(fps))
+        tolerance = max(2, int(fps/10))
+        for cam_id, cam_name in enumerate(cam_names):
+            if cam_id == ref_cam_id or nb_cached[cam_id] == nb_frames_range[cam_id] and nb_cached[ref_cam_id] == nb_frames_range[ref_cam_id]:
+                continue
+            cached_drift = sync_state[json_dirs_names[cam_id]].get('drift', 0) - sync_state[json_dirs_names[ref_cam_id]].get('drift', 0)
+            offset_section = cached_offsets[cam_name] - cached_offsets[ref_cam_name] + cached_drift * (new_section_start + search_around_frames[ref_cam_id][0]) \
+                            + (search_around_frames[ref_cam_id][0] - search_around_frames[cam_id][0])
+            drift, best_offset = drift_detected(sum_speeds[ref_cam_id], sum_speeds[cam_id], offset_section, new_section_start, tolerance)
+            if drift:
+                logging.info(f'Camera {cam_name}: the offset on new frames ({best_offset} frames on the speed signals) differs from the cached one ({offset_section}). Offsets are re-estimated.')
+                reuse_offsets = False
+                break
+
+    if reuse_offsets:
+        offset = [cached_offsets[cam_name] - cached_offsets[ref_cam_name] for cam_name in cam_names]
+        logging.info(f'No drift detected on new frames. Cached offsets are kept, relative to camera {ref_cam_name}:')
+        for cam_name, offset_cam in zip(cam_names, offset):
+            logging.info(f'--> Camera {cam_name}: {offset_cam} frames offset.')
+    elif all_pairs:
+        # Correlate all camera pairs, and solve for the offsets which agree best with all of them
+        correlate = (lambda *args, **kwargs: coarse_to_fine_cross_corr(*args, decimation=decimation, sub_frame=sub_frame, **kwargs)) if coarse_to_fine \
+               else (lambda *args, **kwargs: time_lagged_cross_corr(*args, sub_frame=sub_frame, **kwargs))
+        pairs = all_pairs_offsets(sum_speeds, [s[0] for s in search_around_frames], correlate=correlate, nb_workers=min(cam_nb*(cam_nb-1)//2, os.cpu_count() or 1), show=display_sync_plots, cam_names=cam_names)
+        offset, residuals = solve_global_offsets(cam_nb, pairs, ref_cam_id=ref_cam_id, sub_frame=sub_frame)
+        logging.info(f'Offsets solved from all {len(pairs)} camera pairs, relative to camera {ref_cam_name}:')
+        for (i, j, offset_pair, max_corr_pair), residual in zip(pairs, residuals):
+            logging.info(f'--> Camera {cam_names[i]} and {cam_names[j]}: {offset_pair} frames offset, correlation {round(max_corr_pair, 2)}, residual {round(residual, 1)} frames.')
+        for cam_name, offset_cam in zip(cam_names, offset):
+            logging.info(f'--> Camera {cam_name}: {offset_cam} frames offset.')
+        logging.info(f'Residual (root mean square): {round(np.sqrt(np.mean(residuals**2)), 1)} frames.')
+    else:
+        cam_list.pop(ref_cam_id)
+        cam_names.pop(ref_cam_id)
+        offset = []
+        for cam_id, cam_name in zip(cam_list, cam_names):
+            if coarse_to_fine:
+                offset_cam_section, max_corr_cam = coarse_to_fine_cross_corr(sum_speeds[ref_cam_id], sum_speeds[cam_id], lag_range, decimation=decimation, show=display_sync_plots, ref_cam_name=ref_cam_name, cam_name=cam_name, sub_frame=sub_frame)
+            else:
+                offset_cam_section, max_corr_cam = time_lagged_cross_corr(sum_speeds[ref_cam_id], sum_speeds[cam_id], lag_range, show=display_sync_plots, ref_cam_name=ref_cam_name, cam_name=cam_name, sub_frame=sub_frame)
+            offset_cam = offset_cam_section - (search_around_frames[ref_cam_id][0] - search_around_frames[cam_id][0])
+            if sub_frame:
+                offset_cam = round(offset_cam, 2)
+            if isinstance(approx_time_maxspeed, list):
+                logging.info(f'--> Camera {ref_cam_name} and {cam_name}: {offset_cam} frames offset ({offset_cam_section} on the selected section), correlation {round(max_corr_cam, 2)}.')
+            else:
+                logging.info(f'--> Camera {ref_cam_name} and {cam_name}: {offset_cam} frames offset, correlation {round(max_corr_cam, 2)}.')
+            offset.append(offset_cam)
+        offset.insert(ref_cam_id, 0)
+
+    # Clock drift: offsets on sliding windows, and linear drift model for each camera
+    drift = [0.] * cam_nb
+    if drift_window > 0:
+        if approx_time_maxspeed != 'auto':
+            logging.warning('Clock drift can only be estimated with approx_time_maxspeed = "auto". Using constant offsets.')
         else:
-            logging.info(f'--> Camera {ref_cam_name} and {cam_name}: {offset_cam} frames offset, correlation {round(max_corr_cam, 2)}.')
-        offset.append(offset_cam)
-    offset.insert(ref_cam_id, 0)
-
-    # rename json files according to the offset and copy them to pose-sync
+            window = int(drift_window*fps)
+            logging.info(f'\nClock drift: offsets estimated on {drift_window} s windows, every {drift_window/2} s, within 1 s of the global offset.')
+            for cam_id, j_dir in enumerate(json_dirs_names):
+                if cam_id == ref_cam_id:
+                    continue
+                cam_name = j_dir.split('_')[0]
+                section_shift = search_around_frames[ref_cam_id][0] - search_around_frames[cam_id][0]
+                window_centers, window_offsets, window_corr = windowed_offsets(sum_speeds[ref_cam_id], sum_speeds[cam_id], offset[cam_id] + section_shift, window, step=max(1, window//2), search=int(fps))
+                try:
+                    intercept, drift_cam, residuals = fit_drift(window_centers + search_around_frames[ref_cam_id][0], window_offsets - section_shift, window_corr)
+                except ValueError as e:
+                    logging.warning(f'Camera {cam_name}: {e} Keeping a constant offset.')
+                    continue
+                offset[cam_id], drift[cam_id] = round(float(intercept), 2), float(drift_cam)
+                logging.info(f'--> Camera {cam_name}: {offset[cam_id]} frames offset at frame 0, drift {round(drift_cam*fps*60, 2)} frames per minute ({len(window_centers)} windows, residual {round(np.sqrt(np.mean(residuals**2)), 2)} frames).')
+
+    # rename json files according to the offset, only write their offsets, or resample keypoints
     sync_dir = os.path.abspath(os.path.join(pose_dir, '..', 'pose-sync'))
     os.makedirs(sync_dir, exist_ok=True)
-    for d, j_dir in enumerate(json_dirs):
-        os.makedirs(os.path.join(sync_dir, os.path.basename(j_dir)), exist_ok=True)
-        for j_file in json_files_names[d]:
-            j_split = re.split(r'(\d+)',j_file)
-            j_split[-2] = f'{int(j_split[-2])-offset[d]:06d}'
-            if int(j_split[-2]) > 0:
-                json_offset_name = ''.join(j_split)
-                shutil.copy(os.path.join(pose_dir, os.path.basename(j_dir), j_file), os.path.join(sync_dir, os.path.basename(j_dir), json_offset_name))
-
-    logging.info(f'Synchronized json files saved in {sync_dir}.')
+    if any(drift):
+        write_sync_resampled(sync_dir, json_dirs, json_files_names, offset, drift=drift, interpolate=sub_frame)
+        logging.info(f'2D keypoints remapped according to clock drift, and saved in {sync_dir}.')
+    elif sub_frame:
+        write_sync_resampled(sync_dir, json_dirs, json_files_names, offset)
+        logging.info(f'2D keypoints resampled with sub-frame offsets, and saved in {sync_dir}.')
+    elif sync_output == 'manifest':
+        write_sync_manifest(sync_dir, json_dirs, offset)
+        logging.info(f'Synchronization offsets saved in {os.path.join(sync_dir, sync_manifest_name)}. Json files are read from {pose_dir}.')
+    else:
+        write_sync_copy(sync_dir, json_dirs, json_files_names, offset)
+        logging.info(f'Synchronized json files saved in {sync_dir}.')
+
+    # Save processed json range, offsets, and coordinates for the next incremental run
+    if incremental:
+        frame_nb = lambda j_file: int(re.split(r'(\d+)', j_file)[-2])
+        sync_state = {j_dir: {'first_file': json_files_names_range[i][0], 'last_file': json_files_names_range[i][-1], 'nb_files': nb_frames_range[i],
+                              'processed_frames': [frame_nb(json_files_names_range[i][0]), frame_nb(json_files_names_range[i][-1])],
+                              'offset': float(offset[i]) if sub_frame or any(drift) else int(offset[i]), 'drift': drift[i]} 
+                      for i, j_dir in enumerate(json_dirs_names)}
+        write_sync_cache(pose_dir, sync_settings, sync_state, {j_dir: coords[i, :nb_frames_range[i]] for i, j_dir in enumerate(json_dirs_names)})
+        logging.info(f'Processed json range and offsets saved in {os.path.join(pose_dir, sync_state_name)}.')
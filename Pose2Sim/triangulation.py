@@ -35,10 +35,8 @@ OUTPUTS:
 ## INIT
 import os
 import glob
-import fnmatch
 import re
 import numpy as np
-import json
 import itertools as it
 import pandas as pd
 import cv2
@@ -51,7 +49,7 @@ import logging
 
 from Pose2Sim.common import retrieve_calib_params, computeP, weighted_triangulation, \
     reprojection, euclidean_distance, sort_people_sports2d, interpolate_zeros_nans, \
-    sort_stringlist_by_last_number, zup2yup, convert_to_c3d
+    sort_stringlist_by_last_number, zup2yup, convert_to_c3d, list_json_dirs, list_json_files, read_pose_json, write_trc_array
 from Pose2Sim.skeletons import *
 
 
@@ -68,9 +66,8 @@ __status__ = "Development"
 
 ## FUNCTIONS
 def count_persons_in_json(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-        return len(data.get('people', []))
+    data = read_pose_json(file_path)
+    return len(data.get('people', []))
     
 
 def make_trc(config_dict, Q, keypoints_names, f_range, id_person=-1):
@@ -126,17 +123,14 @@ def make_trc(config_dict, Q, keypoints_names, f_range, id_person=-1):
     # Zup to Yup coordinate system
     Q = zup2yup(Q)
     
-    #Add Frame# and Time columns
-    Q.index = np.array(range(f_range[0], f_range[1]))
-    Q.insert(0, 't', Q.index/ frame_rate)
-    # Q = Q.fillna(' ')
+    #Frame# and Time columns
+    frames = np.array(range(f_range[0], f_range[1]))
+    times = frames / frame_rate
 
     #Write file
     if not os.path.exists(pose3d_dir): os.mkdir(pose3d_dir)
     trc_path = os.path.realpath(os.path.join(pose3d_dir, trc_f))
-    with open(trc_path, 'w') as trc_o:
-        [trc_o.write(line+'\n') for line in header_trc]
-        Q.to_csv(trc_o, sep='\t', index=True, header=None, lineterminator='\n')
+    write_trc_array(trc_path, [line+'\n' for line in header_trc], frames, times, Q.to_numpy())
 
     return trc_path
 
@@ -544,17 +538,16 @@ def extract_files_frame_f(json_tracked_files_f, keypoints_ids, nb_persons_to_det
         for cam_nb in range(n_cams):
             x_files_cam, y_files_cam, likelihood_files_cam = [], [], []
             try:
-                with open(json_tracked_files_f[cam_nb], 'r') as json_f:
-                    js = json.load(json_f)
-                    for keypoint_id in keypoints_ids:
-                        try:
-                            x_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3] )
-                            y_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3+1] )
-                            likelihood_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3+2] )
-                        except:
-                            x_files_cam.append( np.nan )
-                            y_files_cam.append( np.nan )
-                            likelihood_files_cam.append( np.nan )
+                js = read_pose_json(json_tracked_files_f[cam_nb])
+                for keypoint_id in keypoints_ids:
+                    try:
+                        x_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3] )
+                        y_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3+1] )
+                        likelihood_files_cam.append( js['people'][n]['pose_keypoints_2d'][keypoint_id*3+2] )
+                    except:
+                        x_files_cam.append( np.nan )
+                        y_files_cam.append( np.nan )
+                        likelihood_files_cam.append( np.nan )
             except:
                 x_files_cam = [np.nan] * len(keypoints_ids)
                 y_files_cam = [np.nan] * len(keypoints_ids)
@@ -657,26 +650,25 @@ def triangulate_all(config_dict):
     
     # 2d-pose files selection
     try:
-        pose_listdirs_names = next(os.walk(pose_dir))[1]
-        os.listdir(os.path.join(pose_dir, pose_listdirs_names[0]))[0]
+        json_dirs_names = sort_stringlist_by_last_number(list_json_dirs(pose_dir))
+        list_json_files(os.path.join(pose_dir, json_dirs_names[0]))[0]
     except:
         raise ValueError(f'No json files found in {pose_dir} subdirectories. Make sure you run Pose2Sim.poseEstimation() first.')
-    pose_listdirs_names = sort_stringlist_by_last_number(pose_listdirs_names)
-    json_dirs_names = [k for k in pose_listdirs_names if 'json' in k]
     n_cams = len(json_dirs_names)
     try: 
-        json_files_names = [fnmatch.filter(os.listdir(os.path.join(poseTracked_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+        json_files_names = [list_json_files(os.path.join(poseTracked_dir, js_dir)) for js_dir in json_dirs_names]
         pose_dir = poseTracked_dir
     except:
         try: 
-            json_files_names = [fnmatch.filter(os.listdir(os.path.join(poseSync_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+            json_files_names = [list_json_files(os.path.join(poseSync_dir, js_dir)) for js_dir in json_dirs_names]
             pose_dir = poseSync_dir
         except:
             try:
-                json_files_names = [fnmatch.filter(os.listdir(os.path.join(pose_dir, js_dir)), '*.json') for js_dir in json_dirs_names]
+                json_files_names = [list_json_files(os.path.join(pose_dir, js_dir)) for js_dir in json_dirs_names]
             except:
                 raise Exception(f'No json files found in {pose_dir}, {poseSync_dir}, nor {poseTracked_dir} subdirectories. Make sure you run Pose2Sim.poseEstimation() first.')
     json_files_names = [sort_stringlist_by_last_number(js) for js in json_files_names]    
+    json_files_by_frame = [{int(re.split(r'(\d+)',j)[-2]): j for j in reversed(json_files_names[c])} for c in range(n_cams)]
 
     # frame range selection
     f_range = [[0,min([len(j) for j in json_files_names])] if frame_range==[] else frame_range][0]
@@ -701,8 +693,7 @@ def triangulate_all(config_dict):
     for f in tqdm(range(*f_range)):
         # print(f'\nFrame {f}:')        
         # Get x,y,likelihood values from files
-        json_files_names_f = [[j for j in json_files_names[c] if int(re.split(r'(\d+)',j)[-2])==f] for c in range(n_cams)]
-        json_files_names_f = [j for j_list in json_files_names_f for j in (j_list or ['none'])]
+        json_files_names_f = [json_files_by_frame[c].get(f, 'none') for c in range(n_cams)]
         json_files_f = [os.path.join(pose_dir, json_dirs_names[c], json_files_names_f[c]) for c in range(n_cams)]
 
         x_files, y_files, likelihood_files = extract_files_frame_f(json_files_f, keypoints_ids, nb_persons_to_detect)